@@ -1,4 +1,6 @@
 from django.contrib import admin
 from .models import *
 # Register your models here.
-admin.site.register(PurchaseOrder)
\ No newline at end of file
+admin.site.register(PurchaseOrder)
+admin.site.register(DirtyVendor)
+admin.site.register(ImportCheckpoint)
\ No newline at end of file
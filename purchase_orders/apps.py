@@ -5,4 +5,8 @@ class PurchaseOrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'purchase_orders'
     def ready(self):
-        from . import signals
\ No newline at end of file
+        from . import signals
+        from .metrics_queue import queue_stats
+        from vms.instrumentation import registry
+        registry.register_gauge('vms_metrics_queue_depth', 'Vendors waiting in the deferred metrics queue.', lambda: queue_stats()['depth'])
+        registry.register_gauge('vms_metrics_queue_lag_seconds', 'Age of the oldest deferred metrics queue entry.', lambda: queue_stats()['lag_seconds'])
\ No newline at end of file
@@ -0,0 +1,7 @@
+from django.urls import path
+from .async_views import *
+
+urlpatterns = [
+  path('', AsyncPurchaseOrderListView.as_view(), name='async-pos-list'),
+  path('<int:pk>/', AsyncPurchaseOrderDetailView.as_view(), name='async-pos-detail'),
+]
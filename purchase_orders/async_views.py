@@ -0,0 +1,48 @@
+from rest_framework import status
+from vms.async_views import AsyncAPIView, render
+from vms.conditional import ETAG_FIELDS, etag, not_modified, with_etag
+from vms.fast_serializers import FastSerializer
+from vms.pagination import KeysetPagination, wants_stream, astreaming_response
+from .filters import PurchaseOrderFilter
+from .models import PurchaseOrder
+from .serializers import PurchaseOrderSerializer
+from .views import PurchaseOrderListCreateView
+
+# Async versions of the purchase order read endpoints (see purchase_orders.views)
+
+# api/async/purchase_orders
+class AsyncPurchaseOrderListView(AsyncAPIView):
+    cursor_orderings = PurchaseOrderListCreateView.cursor_orderings
+
+    # GET Request to fetch Purchase Orders, one page at a time, same parameters as GET api/purchase_orders
+    # Headers - Authorization : Token {auth_token}
+    # Usage : GET http://localhost:5000/api/async/purchase_orders?page_size=100&ordering=-issue_date[&stream=1][&vendor=1&status=pending]
+    async def get(self, request):
+        paginator = KeysetPagination()
+        filterset = PurchaseOrderFilter(request.query_params, queryset=PurchaseOrder.objects.all())
+        if not filterset.is_valid():
+            return render(filterset.errors, status.HTTP_400_BAD_REQUEST)
+        serializer = FastSerializer(PurchaseOrderSerializer, PurchaseOrderSerializer.sparse_fields(request))
+        rows = serializer.values(filterset.qs, paginator.get_ordering(request, None, self))
+        if wants_stream(request):
+            return astreaming_response(paginator.get_ordered_queryset(rows, request, self), serializer)
+        page = await paginator.apaginate_queryset(rows, request, view=self)
+        return render(paginator.get_paginated_response(serializer.serialize(page)).data)
+
+# api/async/purchase_orders/{id}
+class AsyncPurchaseOrderDetailView(AsyncAPIView):
+    # GET Request to fetch Purchase Order using ID
+    # Headers - Authorization : Token {auth_token}
+    #           If-None-Match : {etag} (optional, 304 when unchanged)
+    # Usage : GET http://localhost:5000/api/async/purchase_orders/{id}/[?fields=id,status]
+    async def get(self, request, pk):
+        fields = PurchaseOrderSerializer.sparse_fields(request)
+        try:
+            purchase_order = await PurchaseOrderSerializer.narrow_queryset(PurchaseOrder.objects.all(), fields, ETAG_FIELDS).aget(pk=pk)
+        except PurchaseOrder.DoesNotExist:
+            return render({"message": "Purchase order not found"}, status.HTTP_404_NOT_FOUND)
+        unchanged = not_modified(request, etag(purchase_order))
+        if unchanged:
+            return unchanged
+        serializer = PurchaseOrderSerializer(purchase_order, fields=fields)
+        return with_etag(render(serializer.data), etag(purchase_order))
@@ -0,0 +1,32 @@
+from django.db.models import F
+from django_filters import rest_framework as filters
+from .models import PurchaseOrder
+
+# Server side filters of the purchase order list
+# Usage : GET /api/purchase_orders/?vendor=3&status=pending,acknowledged&order_date_after=2024-01-01
+# Every filter is backed by an index of PurchaseOrder (see Meta.indexes),
+# purchase_orders.query_plans checks the plans of the supported combinations.
+
+class ChoiceInFilter(filters.BaseInFilter, filters.ChoiceFilter):
+  pass
+
+class PurchaseOrderFilter(filters.FilterSet):
+  vendor = filters.NumberFilter(field_name='vendor_id')
+  status = ChoiceInFilter(choices=PurchaseOrder._meta.get_field('status').choices)
+  # ?{field}_after= / ?{field}_before= (ISO 8601, inclusive)
+  order_date = filters.IsoDateTimeFromToRangeFilter()
+  delivery_date = filters.IsoDateTimeFromToRangeFilter()
+  issue_date = filters.IsoDateTimeFromToRangeFilter()
+  # ?quality_rating_min= / ?quality_rating_max=
+  quality_rating = filters.RangeFilter()
+  # ?late=true: completed after the delivery date, ?late=false: completed on time (partial indexes)
+  late = filters.BooleanFilter(method='filter_late')
+
+  class Meta:
+    model = PurchaseOrder
+    fields = []
+
+  def filter_late(self, queryset, name, value):
+    if value:
+      return queryset.filter(completed_at__gt=F('delivery_date'))
+    return queryset.filter(completed_at__lte=F('delivery_date'))
@@ -0,0 +1,188 @@
+import csv
+import datetime
+import json
+import time
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from sequences.allocator import advance, highest_number, next_values
+from vendors.cache import invalidate_vendor
+from vendors.models import Vendor
+from .models import PurchaseOrder, ImportCheckpoint
+from .metrics import rebuild_vendor_metrics
+
+# Streaming import of vendors and purchase orders (manage.py import_vms)
+#
+# Records are read one at a time from CSV or JSONL, validated with the model
+# field validators (no per-row queries) and inserted with bulk_create in
+# batches. bulk_create sends no signals: vendor metrics are rebuilt once at
+# the end for every vendor the purchase orders reference, with one snapshot
+# each. With a checkpoint name, each batch commits together with the number
+# of records consumed so far, and a re-run skips the records already imported.
+
+VENDOR_FIELDS = ('vendor_code', 'name', 'mobile_number', 'address', 'email')
+PURCHASE_ORDER_FIELDS = (
+  'po_number', 'vendor_code', 'order_date', 'delivery_date', 'items', 'quantity', 'status',
+  'quality_rating', 'issue_date', 'acknowledgment_date', 'completed_at',
+)
+
+def read_records(stream, fmt):
+  """Dicts from a CSV (header row) or JSONL text stream."""
+  if fmt == 'csv':
+    yield from csv.DictReader(stream)
+    return
+  for line in stream:
+    if line.strip():
+      yield json.loads(line)
+
+def _errors(e):
+  return '; '.join(f'{field}: {" ".join(messages)}' for field, messages in e.message_dict.items())
+
+def _build(model, record, fields, exclude=()):
+  values = {}
+  for name in fields:
+    field = model._meta.get_field(name)
+    value = record.get(name)
+    if value == '' and field.null:  # CSV has no null
+      value = None
+    if value is None and not field.null:
+      value = field.get_default()
+    values[name] = value
+  instance = model(**values)
+  instance.clean_fields(exclude=list(exclude))
+  for field in model._meta.concrete_fields:
+    value = getattr(instance, field.attname)
+    if isinstance(value, datetime.datetime) and timezone.is_naive(value):
+      setattr(instance, field.attname, timezone.make_aware(value))
+  return instance
+
+def build_vendor(record, vendor_codes):
+  """Unsaved Vendor from a record, raises ValidationError. vendor_codes holds the codes already taken."""
+  vendor = _build(Vendor, record, VENDOR_FIELDS, exclude=['vendor_code'])
+  if vendor.vendor_code:
+    if vendor.vendor_code in vendor_codes:
+      raise ValidationError({'vendor_code': ['Vendor with this vendor code already exists.']})
+    vendor_codes.add(vendor.vendor_code)
+  return vendor
+
+def build_purchase_order(record, vendor_ids):
+  """Unsaved PurchaseOrder from a record, the vendor resolved through vendor_ids (vendor_code -> id)."""
+  record = dict(record)
+  vendor_id = vendor_ids.get(record.pop('vendor_code', None) or '')
+  if vendor_id is None:
+    raise ValidationError({'vendor_code': ['Unknown vendor code.']})
+  if isinstance(record.get('items'), str):  # JSON encoded column of a CSV file
+    try:
+      record['items'] = json.loads(record['items'])
+    except ValueError:
+      raise ValidationError({'items': ['Enter valid JSON.']})
+  fields = [field for field in PURCHASE_ORDER_FIELDS if field != 'vendor_code']
+  purchase_order = _build(PurchaseOrder, {**record, 'vendor_id': vendor_id}, fields + ['vendor_id'], exclude=['vendor'])
+  # Historical orders: without an issue date the order was issued when it was placed
+  purchase_order.issue_date = purchase_order.issue_date or purchase_order.order_date
+  return purchase_order
+
+class Importer:
+  def __init__(self, batch_size=5000, checkpoint=None, progress=None, on_error=None, max_errors=None):
+    self.batch_size = batch_size
+    self.checkpoint = checkpoint
+    self.progress = progress
+    self.on_error = on_error
+    self.max_errors = max_errors
+    self.rejected = 0
+
+  def reject(self, position, e):
+    self.rejected += 1
+    if self.on_error:
+      self.on_error(position, _errors(e))
+    if self.max_errors is not None and self.rejected > self.max_errors:
+      raise ValidationError(f'More than {self.max_errors} rejected records, import stopped.')
+
+  def run(self, kind, records, build, insert, skipped=None):
+    """Build and insert records in batches. Records already behind the checkpoint go to skipped instead."""
+    name = f'{self.checkpoint}:{kind}' if self.checkpoint else None
+    start = 0
+    if name:
+      start = ImportCheckpoint.objects.filter(name=name).values_list('position', flat=True).first() or 0
+    started = time.perf_counter()
+    imported = position = 0
+    batch = []
+    for position, record in enumerate(records, 1):
+      if position <= start:
+        if skipped:
+          skipped(record)
+        continue
+      try:
+        batch.append(build(record))
+      except ValidationError as e:
+        self.reject(position, e)
+      if len(batch) >= self.batch_size:
+        imported += self.flush(name, batch, insert, position)
+        batch = []
+        if self.progress:
+          self.progress(kind, imported, time.perf_counter() - started)
+    imported += self.flush(name, batch, insert, position)
+    if self.progress:
+      self.progress(kind, imported, time.perf_counter() - started)
+    return imported
+
+  def flush(self, name, batch, insert, position):
+    with transaction.atomic():
+      if batch:
+        insert(batch)
+      if name:
+        ImportCheckpoint.objects.update_or_create(name=name, defaults={'position': position})
+    return len(batch)
+
+  def import_vendors(self, records):
+    vendor_codes = set(Vendor.objects.values_list('vendor_code', flat=True))
+    def insert(vendors):
+      insert_vendors(vendors)
+      vendor_codes.update(vendor.vendor_code for vendor in vendors)  # Generated ones too
+    return self.run('vendors', records, lambda record: build_vendor(record, vendor_codes), insert)
+
+  def import_purchase_orders(self, records):
+    vendor_ids = dict(Vendor.objects.values_list('vendor_code', 'pk'))
+    referenced = set()
+    def build(record):
+      purchase_order = build_purchase_order(record, vendor_ids)
+      referenced.add(purchase_order.vendor_id)
+      return purchase_order
+    def skipped(record):  # Imported by an earlier run, its vendor still needs the rebuild
+      vendor_id = vendor_ids.get(record.get('vendor_code') or '')
+      if vendor_id is not None:
+        referenced.add(vendor_id)
+    imported = self.run('purchase_orders', records, build, insert_purchase_orders, skipped)
+    rebuild_vendor_metrics(referenced, snapshot=True)
+    return imported, len(referenced)
+
+def insert_vendors(vendors):
+  missing = [vendor for vendor in vendors if not vendor.vendor_code]
+  numbers = iter(next_values('vendor_code', len(missing), initial=Vendor.last_vendor_number)) if missing else None
+  for vendor in missing:
+    vendor.vendor_code = f'VN{next(numbers):03d}'
+  Vendor.objects.bulk_create(vendors, batch_size=1000)
+  advance('vendor_code', highest_number((vendor.vendor_code for vendor in vendors), 'VN'), initial=Vendor.last_vendor_number)
+  for vendor in vendors:
+    invalidate_vendor(vendor.pk)
+
+def insert_purchase_orders(purchase_orders):
+  missing = [po for po in purchase_orders if not po.po_number]
+  numbers = iter(PurchaseOrder.allocate_po_numbers(len(missing))) if missing else None
+  for po in missing:
+    po.po_number = next(numbers)
+  issue_dates = [po.issue_date for po in purchase_orders]
+  purchase_orders = PurchaseOrder.objects.bulk_create(purchase_orders, batch_size=1000)
+  # issue_date is auto_now_add, put the imported dates back: with one UPDATE
+  # where it is the order date (the default), row by row where it was given
+  explicit = []
+  for po, issue_date in zip(purchase_orders, issue_dates):
+    po.issue_date = issue_date
+    if issue_date != po.order_date:
+      explicit.append(po)
+  for start in range(0, len(purchase_orders), 1000):
+    pks = [po.pk for po in purchase_orders[start:start + 1000] if po.issue_date == po.order_date]
+    PurchaseOrder.objects.filter(pk__in=pks).update(issue_date=F('order_date'))
+  PurchaseOrder.objects.bulk_update(explicit, ['issue_date'], batch_size=1000)
+  advance('po_number', highest_number((po.po_number for po in purchase_orders), 'PO-'), initial=PurchaseOrder.last_po_number)
@@ -0,0 +1,342 @@
+import asyncio
+import collections
+import datetime
+import math
+import random
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import OperationalError, connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from vendors.models import Vendor
+from .models import PurchaseOrder
+
+# In-process load driver. N threads issue a weighted mix of API calls through
+# django.test.Client, i.e. the full middleware / URLconf / view stack of
+# vms/urls.py without a network server in front. Latencies are recorded per
+# operation and summarised as percentiles and requests per second.
+#
+# Writes are kept valid by drawing targets from shared pools: created
+# purchase orders join the pending pool, acknowledged ones move to the
+# acknowledged pool, completed ones leave both.
+
+DEFAULT_MIX = {
+  'list': 30,
+  'detail': 25,
+  'performance': 20,
+  'acknowledge': 10,
+  'complete': 10,
+  'create': 5,
+}
+
+# Rows fetched to seed each target pool
+POOL_SIZE = 10000
+
+class Workload:
+  def __init__(self, vendor_ids, po_ids, pending_ids, acknowledged_ids, page_size=100):
+    if not vendor_ids:
+      raise ValueError('No vendors to load test, seed some first.')
+    self.vendor_ids = vendor_ids
+    self.po_ids = po_ids
+    self.pending = collections.deque(pending_ids)
+    self.acknowledged = collections.deque(acknowledged_ids)
+    self.page_size = page_size
+    self.lock = threading.Lock()
+
+  @classmethod
+  def from_database(cls, page_size=100):
+    purchase_orders = PurchaseOrder.objects.order_by('-id').values_list('id', flat=True)
+    return cls(
+      list(Vendor.objects.order_by('id').values_list('id', flat=True)[:POOL_SIZE]),
+      list(purchase_orders[:POOL_SIZE]),
+      list(purchase_orders.filter(status='pending', acknowledgment_date__isnull=True)[:POOL_SIZE]),
+      list(purchase_orders.filter(status='acknowledged')[:POOL_SIZE]),
+      page_size,
+    )
+
+  def take(self, pool):
+    with self.lock:
+      return pool.popleft() if pool else None
+
+  def put(self, pool, po_id):
+    with self.lock:
+      pool.append(po_id)
+
+  # Operation actually run for the requested one, falling back to the step
+  # that refills an empty pool
+  def resolve(self, operation):
+    if operation == 'complete' and not self.acknowledged:
+      operation = 'acknowledge'
+    if operation == 'acknowledge' and not self.pending:
+      operation = 'create'
+    if operation == 'detail' and not self.po_ids:
+      operation = 'create'
+    return operation
+
+  def execute(self, client, operation, rng):
+    """Run one operation, returns (operation, status code, latency in seconds, response)."""
+    operation = self.resolve(operation)
+    if operation == 'list':
+      return self.timed(client.get, operation, reverse('pos-list-create'), {'page_size': self.page_size})
+    if operation == 'detail':
+      return self.timed(client.get, operation, reverse('pos-retrieve-update-destroy', args=[rng.choice(self.po_ids)]))
+    if operation == 'performance':
+      return self.timed(client.get, operation, reverse('vendor-performance', args=[rng.choice(self.vendor_ids)]))
+    if operation == 'acknowledge':
+      po_id = self.take(self.pending)
+      if po_id is None:  # Drained by another client meanwhile
+        return self.execute(client, 'create', rng)
+      result = self.timed(client.post, operation, reverse('pos-acknowledge', args=[po_id]))
+      if result[1] == 200:
+        self.put(self.acknowledged, po_id)
+      return result
+    if operation == 'complete':
+      po_id = self.take(self.acknowledged)
+      if po_id is None:
+        return self.execute(client, 'acknowledge', rng)
+      return self.timed(client.post, operation, reverse('pos-completion', args=[po_id]), {'quality_rating': round(rng.uniform(1, 5), 1)}, content_type='application/json')
+    if operation == 'create':
+      now = timezone.now()
+      payload = {
+        'vendor': rng.choice(self.vendor_ids),
+        'order_date': now.isoformat(),
+        'delivery_date': (now + datetime.timedelta(days=rng.uniform(1, 14))).isoformat(),
+        'items': {'item1': rng.randint(1, 20)},
+        'quantity': rng.randint(1, 100),
+      }
+      result = self.timed(client.post, operation, reverse('pos-list-create'), payload, content_type='application/json')
+      if result[1] == 201:
+        self.put(self.pending, result[3].json()['data']['id'])
+      return result
+    raise ValueError(f'Unknown operation {operation!r}')
+
+  @staticmethod
+  def timed(method, operation, *args, **kwargs):
+    started = time.perf_counter()
+    response = method(*args, **kwargs)
+    return operation, response.status_code, time.perf_counter() - started, response
+
+def loadtest_token(username='loadtest'):
+  user, _ = User.objects.get_or_create(username=username)
+  token, _ = Token.objects.get_or_create(user=user)
+  return token.key
+
+# A host the request validation accepts (DEBUG allows localhost when ALLOWED_HOSTS is empty)
+def request_host():
+  return next((host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')), 'localhost')
+
+def run_load(clients=4, duration=10.0, requests=None, mix=None, seed=0, page_size=100, workload=None):
+  """Drive the API with `clients` threads for `duration` seconds (or `requests` calls in total)."""
+  mix = mix or DEFAULT_MIX
+  operations, weights = zip(*mix.items())
+  workload = workload or Workload.from_database(page_size)
+  token = loadtest_token()
+  host = request_host()
+  remaining = [requests]
+  remaining_lock = threading.Lock()
+  samples = []
+  samples_lock = threading.Lock()
+
+  def claim():
+    if remaining[0] is None:
+      return time.perf_counter() < deadline
+    with remaining_lock:
+      if remaining[0] <= 0:
+        return False
+      remaining[0] -= 1
+      return True
+
+  def worker(index):
+    rng = random.Random(seed + index)
+    client = Client(HTTP_AUTHORIZATION=f'Token {token}', SERVER_NAME=host, raise_request_exception=False)
+    recorded = []
+    try:
+      while claim():
+        operation, status_code, latency, _ = workload.execute(client, rng.choices(operations, weights)[0], rng)
+        recorded.append((operation, status_code, latency))
+    finally:
+      connections.close_all()
+      with samples_lock:
+        samples.extend(recorded)
+
+  threads = [threading.Thread(target=worker, args=(index,), name=f'loadtest-{index}') for index in range(clients)]
+  started = time.perf_counter()
+  deadline = started + duration
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - started
+  return summarize(samples, elapsed, clients)
+
+# Read endpoints compared by run_reads(): (sync URL name, async URL name, path argument)
+READ_ENDPOINTS = {
+  'vendor-list': ('vendor-list-create', 'async-vendor-list', None),
+  'vendor-detail': ('vendor-retrieve-update-destroy', 'async-vendor-detail', 'vendor'),
+  'performance': ('vendor-performance', 'async-vendor-performance', 'vendor'),
+  'vendor-pos': ('vendor-pos', 'async-vendor-pos', 'vendor'),
+  'historical': ('vendor-historical', 'async-vendor-historical', 'vendor'),
+  'po-list': ('pos-list-create', 'async-pos-list', None),
+  'po-detail': ('pos-retrieve-update-destroy', 'async-pos-detail', 'po'),
+}
+
+def read_path(workload, endpoint, mode, rng):
+  sync_name, async_name, argument = READ_ENDPOINTS[endpoint]
+  args = []
+  if argument == 'vendor':
+    args = [rng.choice(workload.vendor_ids)]
+  elif argument == 'po':
+    args = [rng.choice(workload.po_ids)]
+  return reverse(async_name if mode == 'async' else sync_name, args=args)
+
+def run_reads(clients=8, requests=500, mode='sync', seed=0, page_size=100, workload=None):
+  """Spread `requests` read calls, evenly over READ_ENDPOINTS, across `clients` concurrent clients.
+
+  mode 'sync' runs one thread per client against the synchronous views
+  through the WSGI handler, 'async' one task per client on a single event
+  loop against the async views through the ASGI handler.
+  """
+  workload = workload or Workload.from_database(page_size)
+  token = loadtest_token()
+  endpoints = list(READ_ENDPOINTS)
+  remaining = [requests]
+  lock = threading.Lock()
+  samples = []
+  params = {'page_size': page_size}
+
+  def claim():
+    with lock:
+      if remaining[0] <= 0:
+        return False
+      remaining[0] -= 1
+      return True
+
+  def worker(index):
+    rng = random.Random(seed + index)
+    client = Client(HTTP_AUTHORIZATION=f'Token {token}', raise_request_exception=False)
+    recorded = []
+    try:
+      while claim():
+        endpoint = rng.choice(endpoints)
+        _, status_code, latency, _ = workload.timed(client.get, endpoint, read_path(workload, endpoint, mode, rng), params)
+        recorded.append((endpoint, status_code, latency))
+    finally:
+      connections.close_all()
+      with lock:
+        samples.extend(recorded)
+
+  async def async_worker(index):
+    rng = random.Random(seed + index)
+    client = AsyncClient(raise_request_exception=False)
+    headers = {'Authorization': f'Token {token}'}
+    while claim():
+      endpoint = rng.choice(endpoints)
+      started = time.perf_counter()
+      response = await client.get(read_path(workload, endpoint, mode, rng), params, headers=headers)
+      samples.append((endpoint, response.status_code, time.perf_counter() - started))
+
+  async def run_tasks():
+    await asyncio.gather(*(async_worker(index) for index in range(clients)))
+
+  # The test clients send Host: testserver
+  with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+    started = time.perf_counter()
+    if mode == 'async':
+      asyncio.run(run_tasks())
+    else:
+      threads = [threading.Thread(target=worker, args=(index,), name=f'reads-{index}') for index in range(clients)]
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+  return summarize(samples, elapsed, clients)
+
+# Write throughput of the configured database: `writers` threads each create
+# and then acknowledge `writes` purchase orders through the ORM, so the
+# signals, metric counters and PO numbering run as they do behind the API.
+# Failed writes (e.g. "database is locked") are counted, not retried.
+def run_writes(writers=4, writes=50):
+  vendor = Vendor.objects.create(name='Write benchmark', mobile_number='0000000000', address='benchmark_db_writes')
+  latencies = []
+  errors = collections.Counter()
+  lock = threading.Lock()
+
+  def worker():
+    recorded = []
+    failed = collections.Counter()
+    try:
+      for _ in range(writes):
+        started = time.perf_counter()
+        try:
+          now = timezone.now()
+          po = PurchaseOrder.objects.create(vendor_id=vendor.pk, order_date=now, delivery_date=now + datetime.timedelta(days=7), items={'item1': 1}, quantity=1)
+          po.acknowledgment_date = timezone.now()
+          po.save()
+        except OperationalError as e:
+          failed[str(e)] += 1
+          continue
+        recorded.append(time.perf_counter() - started)
+    finally:
+      connections.close_all()
+      with lock:
+        latencies.extend(recorded)
+        errors.update(failed)
+
+  threads = [threading.Thread(target=worker, name=f'writes-{index}') for index in range(writers)]
+  started = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - started
+  vendor.delete()
+  latencies.sort()
+  return {
+    'writers': writers,
+    'elapsed_s': round(elapsed, 3),
+    'writes': len(latencies),
+    'errors': sum(errors.values()),
+    'error_messages': dict(errors),
+    'writes_per_s': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+    'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+    'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+  }
+
+def percentile(sorted_values, percent):
+  """Nearest-rank percentile of an ascending list."""
+  if not sorted_values:
+    return 0.0
+  return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+def _summary(latencies, statuses, elapsed):
+  latencies = sorted(latencies)
+  return {
+    'requests': len(latencies),
+    'errors': sum(count for code, count in statuses.items() if code >= 400),
+    'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+    'rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+    'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+    'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+    'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+  }
+
+def summarize(samples, elapsed, clients):
+  latencies = collections.defaultdict(list)
+  statuses = collections.defaultdict(collections.Counter)
+  for operation, status_code, latency in samples:
+    latencies[operation].append(latency)
+    statuses[operation][status_code] += 1
+  return {
+    'clients': clients,
+    'elapsed_s': round(elapsed, 3),
+    'total': _summary([latency for _, _, latency in samples], sum(statuses.values(), collections.Counter()), elapsed),
+    'endpoints': {operation: _summary(latencies[operation], statuses[operation], elapsed) for operation in sorted(latencies)},
+  }
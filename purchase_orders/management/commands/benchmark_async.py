@@ -0,0 +1,59 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from purchase_orders.loadtest import READ_ENDPOINTS, Workload, run_reads
+
+# Read throughput of the synchronous (WSGI) against the async (ASGI) views
+# Usage : python manage.py benchmark_async --clients 1,8,32 --requests 1000
+# Both run in-process, sync clients as threads through the WSGI handler and
+# async clients as tasks on one event loop through the ASGI handler, over the
+# same mix of READ_ENDPOINTS.
+class Command(BaseCommand):
+  help = 'Compare read throughput and latency of the sync (WSGI) and async (ASGI) endpoints at several concurrency levels.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--clients', default='1,8,32', help='Comma separated concurrency levels.')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per mode and concurrency level.')
+    parser.add_argument('--page-size', type=int, default=100, help='Page size of the list calls.')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the vendor response cache so every call queries the database.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Write the reports as JSON to this file ("-" for stdout).')
+
+  def handle(self, *args, **options):
+    try:
+      levels = [int(value) for value in options['clients'].split(',') if value.strip()]
+    except ValueError:
+      raise CommandError(f"Invalid --clients {options['clients']!r}, expected e.g. 1,8,32.")
+    if not levels or min(levels) < 1:
+      raise CommandError('--clients needs positive concurrency levels.')
+    try:
+      workload = Workload.from_database(options['page_size'])
+    except ValueError as e:
+      raise CommandError(str(e))
+    if not workload.po_ids:
+      raise CommandError('No purchase orders to read, seed some first.')
+
+    reports = []
+    with override_settings(**({'VENDOR_CACHE_TIMEOUT': 0} if options['no_cache'] else {})):
+      for clients in levels:
+        for mode in ('sync', 'async'):
+          report = run_reads(clients, options['requests'], mode, options['seed'], options['page_size'], workload)
+          reports.append({'mode': mode, **report})
+
+    if options['json'] == '-':
+      self.stdout.write(json.dumps(reports, indent=2))
+      return
+    if options['json']:
+      with open(options['json'], 'w') as f:
+        json.dump(reports, f, indent=2)
+    self.print_reports(reports)
+
+  def print_reports(self, reports):
+    self.stdout.write(f"Endpoints: {', '.join(READ_ENDPOINTS)}")
+    self.stdout.write(f"{'mode':<6} {'clients':>7} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for report in reports:
+      stats = report['total']
+      self.stdout.write(
+        f"{report['mode']:<6} {report['clients']:>7} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>9.1f} "
+        f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+      )
@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from purchase_orders.loadtest import run_writes
+
+# Concurrent write throughput per database profile (settings.DATABASE_PROFILES)
+# Usage : python manage.py benchmark_db_writes --profiles sqlite-plain,sqlite --writers 8 --writes 100
+# Every profile runs in its own `manage.py` process with VMS_DB set. SQLite
+# profiles get a freshly migrated scratch database, the postgres profile
+# writes to the configured database (the benchmark vendor and its purchase
+# orders are deleted afterwards).
+class Command(BaseCommand):
+  help = 'Compare concurrent purchase order write throughput across database profiles.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--profiles', default='sqlite-plain,sqlite', help='Comma separated VMS_DB profiles to compare.')
+    parser.add_argument('--writers', type=int, default=4, help='Concurrent writer threads.')
+    parser.add_argument('--writes', type=int, default=50, help='Purchase orders created and acknowledged per writer.')
+    parser.add_argument('--json', help='Write the report as JSON to this file ("-" for stdout).')
+    # Measure the current profile in this process, used by the child processes
+    parser.add_argument('--in-process', action='store_true', help=argparse.SUPPRESS)
+
+  def handle(self, *args, **options):
+    if options['writers'] < 1 or options['writes'] < 1:
+      raise CommandError('--writers and --writes must be at least 1.')
+    if options['in_process']:
+      self.stdout.write(json.dumps(run_writes(options['writers'], options['writes'])))
+      return
+
+    profiles = [name.strip() for name in options['profiles'].split(',') if name.strip()]
+    unknown = [name for name in profiles if name not in settings.DATABASE_PROFILES]
+    if unknown:
+      raise CommandError(f"Unknown profile(s) {', '.join(unknown)}, expected one of {', '.join(settings.DATABASE_PROFILES)}.")
+    report = {name: self.run_profile(name, options['writers'], options['writes']) for name in profiles}
+
+    if options['json'] == '-':
+      self.stdout.write(json.dumps(report, indent=2))
+      return
+    if options['json']:
+      with open(options['json'], 'w') as f:
+        json.dump(report, f, indent=2)
+    self.print_report(report)
+
+  def run_profile(self, profile, writers, writes):
+    manage = [sys.executable, str(settings.BASE_DIR / 'manage.py')]
+    env = {**os.environ, 'VMS_DB': profile}
+    with tempfile.TemporaryDirectory() as directory:
+      if settings.DATABASE_PROFILES[profile]['ENGINE'].endswith('sqlite3'):
+        env['VMS_DB_NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        migrate = subprocess.run(manage + ['migrate', '--no-input', '-v', '0'], env=env, capture_output=True, text=True)
+        if migrate.returncode:
+          return {'failed': migrate.stderr.strip().splitlines()[-1:]}
+      run = subprocess.run(
+        manage + ['benchmark_db_writes', '--in-process', '--writers', str(writers), '--writes', str(writes)],
+        env=env, capture_output=True, text=True,
+      )
+    if run.returncode:
+      return {'failed': run.stderr.strip().splitlines()[-1:]}
+    return json.loads(run.stdout.strip().splitlines()[-1])
+
+  def print_report(self, report):
+    self.stdout.write(f"{'profile':<14} {'writes':>7} {'errors':>7} {'writes/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in report.items():
+      if 'failed' in stats:
+        self.stdout.write(f"{name:<14} failed: {' '.join(stats['failed'])}")
+        continue
+      self.stdout.write(
+        f"{name:<14} {stats['writes']:>7} {stats['errors']:>7} {stats['writes_per_s']:>9.1f} "
+        f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+      )
+    for name, stats in report.items():
+      for message, count in stats.get('error_messages', {}).items():
+        self.stdout.write(f'{name}: {count} x {message}')
@@ -0,0 +1,53 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from vendors.models import Vendor
+from purchase_orders.models import PurchaseOrder
+from purchase_orders.query_plans import hot_queries, full_scans
+from purchase_orders.seed import seed_vendors, seed_purchase_orders
+
+# Scale benchmark for the signal and vendor view queries
+# Usage : python manage.py benchmark_query_plans --pos 1000000
+# Seeds the configured database (use a scratch one), then prints the plan and
+# timing of each hot query and fails if any of them needs a full table scan.
+class Command(BaseCommand):
+  help = 'Seed purchase orders, capture EXPLAIN plans of the hot queries and fail on full table scans.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--vendors', type=int, default=100, help='Vendors to create when seeding.')
+    parser.add_argument('--pos', type=int, default=0, help='Purchase orders to seed before checking (e.g. 1000000).')
+    parser.add_argument('--batch-size', type=int, default=5000)
+
+  def handle(self, *args, **options):
+    if options['pos']:
+      vendor_ids = [vendor.pk for vendor in seed_vendors(options['vendors'])]
+      started = time.perf_counter()
+      seed_purchase_orders(
+        vendor_ids, options['pos'], batch_size=options['batch_size'],
+        progress=lambda created: self.stdout.write(f'seeded {created} purchase orders', ending='\r'),
+      )
+      self.stdout.write(f"\nSeeded {options['pos']} purchase orders in {time.perf_counter() - started:.1f}s")
+
+    vendor = Vendor.objects.order_by('-total_pos').first()
+    purchase_order = PurchaseOrder.objects.filter(vendor=vendor).order_by('id').first() if vendor else None
+    if purchase_order is None:
+      raise CommandError('No purchase orders to benchmark, seed some with --pos.')
+    with connection.cursor() as cursor:
+      cursor.execute('ANALYZE')  # Give the planner real statistics
+
+    failures = []
+    for label, queryset in hot_queries(vendor.pk, purchase_order.pk):
+      plan = queryset.explain()
+      started = time.perf_counter()
+      list(queryset)
+      elapsed = (time.perf_counter() - started) * 1000
+      scans = full_scans(plan)
+      self.stdout.write(f'{label} ({elapsed:.2f} ms)')
+      for line in plan.splitlines():
+        self.stdout.write(f'    {line}')
+      if scans:
+        failures.append(f"{label}: full scan of {', '.join(scans)}")
+
+    if failures:
+      raise CommandError('Queries falling back to a full table scan:\n' + '\n'.join(failures))
+    self.stdout.write(self.style.SUCCESS('All hot queries use an index.'))
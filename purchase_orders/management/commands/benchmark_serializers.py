@@ -0,0 +1,53 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from purchase_orders.models import PurchaseOrder
+from purchase_orders.serializers import PurchaseOrderSerializer
+from purchase_orders.seed import seed_vendors, seed_purchase_orders
+from vms.fast_serializers import FastSerializer
+from vms.renderers import FastJSONRenderer
+
+# Rows per second of the DRF serializer path against the values() fast path
+# Usage : python manage.py benchmark_serializers --rows 10000 [--fields id,po_number,status]
+# Both paths query, serialize and render the same rows; the rendered bytes must be identical.
+class Command(BaseCommand):
+  help = 'Compare ModelSerializer and FastSerializer throughput on purchase orders and check their output is byte-identical.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--rows', type=int, default=10000, help='Purchase orders serialized per run, seeded when the table has fewer.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per path, the best one is reported.')
+    parser.add_argument('--fields', help='Comma separated sparse fieldset, as in ?fields=.')
+
+  def handle(self, *args, **options):
+    rows = options['rows']
+    missing = rows - PurchaseOrder.objects.count()
+    if missing > 0:
+      vendor_ids = [vendor.pk for vendor in seed_vendors(10)]
+      seed_purchase_orders(vendor_ids, missing)
+      self.stdout.write(f'Seeded {missing} purchase orders')
+    fields = tuple(options['fields'].split(',')) if options['fields'] else None
+    queryset = PurchaseOrder.objects.order_by('id')
+
+    def drf_path():
+      purchase_orders = PurchaseOrderSerializer.narrow_queryset(queryset, fields)[:rows]
+      return JSONRenderer().render(PurchaseOrderSerializer(purchase_orders, many=True, fields=fields).data)
+
+    def fast_path():
+      serializer = FastSerializer(PurchaseOrderSerializer, fields)
+      return FastJSONRenderer().render(serializer.serialize(serializer.values(queryset)[:rows]))
+
+    results = {}
+    for label, path in (('ModelSerializer + JSONRenderer', drf_path), ('FastSerializer + FastJSONRenderer', fast_path)):
+      best = None
+      for _ in range(options['repeat']):
+        started = time.perf_counter()
+        output = path()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+      results[label] = (best, output)
+      self.stdout.write(f'{label:<36} {rows / best:>12,.0f} rows/s ({best * 1000:.1f} ms)')
+
+    (drf_time, drf_output), (fast_time, fast_output) = results.values()
+    if drf_output != fast_output:
+      raise CommandError('Fast path output differs from the ModelSerializer output.')
+    self.stdout.write(self.style.SUCCESS(f'Byte-identical output, {drf_time / fast_time:.1f}x faster.'))
@@ -0,0 +1,56 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from purchase_orders.filters import PurchaseOrderFilter
+from purchase_orders.models import PurchaseOrder
+from purchase_orders.views import PurchaseOrderExportView
+from vendors.filters import HistoricalPerformanceFilter
+from vendors.models import HistoricalPerformance
+from vendors.views import HistoricalPerformanceExportView
+from vms.exports import FORMATS, export_rows, gzip_chunks
+
+# Dump purchase orders or historical performance as CSV / NDJSON, same output as the export endpoints
+# Usage : python manage.py export_vms purchase_orders --output ndjson --filter vendor=1 --filter status=completed --gzip -o pos.ndjson.gz
+EXPORTS = {
+  'purchase_orders': (PurchaseOrderFilter, PurchaseOrder.objects.order_by('id'), PurchaseOrderExportView.columns),
+  'historical_performance': (HistoricalPerformanceFilter, HistoricalPerformance.objects.order_by('vendor_id', 'date'), HistoricalPerformanceExportView.columns),
+}
+
+class Command(BaseCommand):
+  help = 'Stream purchase orders or historical performance snapshots to a CSV or NDJSON file.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('table', choices=EXPORTS)
+    parser.add_argument('--output', choices=FORMATS, default='csv', help='Output format.')
+    parser.add_argument('--filter', action='append', default=[], metavar='NAME=VALUE',
+                        help='Filter of the matching export endpoint, e.g. vendor=1, status=completed, order_date_after=2024-01-01. Repeatable.')
+    parser.add_argument('--gzip', action='store_true', help='Compress the output.')
+    parser.add_argument('-o', '--file', help='Output file, stdout by default.')
+
+  def handle(self, *args, **options):
+    filterset_class, queryset, columns = EXPORTS[options['table']]
+    params = QueryDict(mutable=True)
+    for item in options['filter']:
+      name, sep, value = item.partition('=')
+      if not sep:
+        raise CommandError(f'Invalid filter {item!r}, expected NAME=VALUE.')
+      params.appendlist(name, value)
+    unknown = set(params) - set(filterset_class.base_filters) - {f'{name}_{suffix}' for name in filterset_class.base_filters for suffix in ('after', 'before', 'min', 'max')}
+    if unknown:
+      raise CommandError(f"Unknown filter(s): {', '.join(sorted(unknown))}.")
+    filterset = filterset_class(params, queryset=queryset)
+    if not filterset.is_valid():
+      raise CommandError('; '.join(f"{name}: {' '.join(errors)}" for name, errors in filterset.errors.items()))
+    chunks = export_rows(filterset.qs, columns, options['output'])
+    if options['gzip']:
+      chunks = gzip_chunks(chunks)
+    if options['file']:
+      stream = open(options['file'], 'wb') if options['gzip'] else open(options['file'], 'w', encoding='utf-8', newline='')
+    else:
+      stream = sys.stdout.buffer if options['gzip'] else self.stdout
+    try:
+      for chunk in chunks:
+        stream.write(chunk)
+    finally:
+      if options['file']:
+        stream.close()
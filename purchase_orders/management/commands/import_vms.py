@@ -0,0 +1,61 @@
+import sys
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from purchase_orders.importer import Importer, read_records
+
+# Bulk import of vendors and historical purchase orders
+# Usage : python manage.py import_vms --vendors vendors.csv --purchase-orders pos.jsonl [--checkpoint onboarding]
+# Purchase orders reference their vendor by vendor_code; items is a JSON column in CSV files.
+class Command(BaseCommand):
+  help = 'Import vendors and purchase orders from CSV or JSONL files with batched inserts and one metric rebuild.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--vendors', help='Vendors file (vendor_code, name, mobile_number, address, email), - for stdin.')
+    parser.add_argument('--purchase-orders', help='Purchase orders file (po_number, vendor_code, order_date, delivery_date, items, quantity, status, quality_rating, issue_date, acknowledgment_date, completed_at), - for stdin.')
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help='Input format, guessed from the file extension by default.')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--checkpoint', help='Record progress under this name, a re-run with the same name resumes after the last imported batch.')
+    parser.add_argument('--max-errors', type=int, help='Stop after this many rejected records (default: no limit).')
+
+  def handle(self, *args, **options):
+    if not options['vendors'] and not options['purchase_orders']:
+      raise CommandError('Nothing to import, pass --vendors and/or --purchase-orders.')
+    if options['batch_size'] < 1:
+      raise CommandError('--batch-size must be at least 1.')
+    importer = Importer(
+      batch_size=options['batch_size'],
+      checkpoint=options['checkpoint'],
+      progress=lambda kind, imported, elapsed: self.stdout.write(
+        f'{kind}: imported {imported} ({imported / elapsed if elapsed else 0:.0f}/s)', ending='\r'
+      ),
+      on_error=lambda position, message: self.stderr.write(f'record {position}: {message}'),
+      max_errors=options['max_errors'],
+    )
+    try:
+      if options['vendors']:
+        with self.open(options['vendors']) as stream:
+          imported = importer.import_vendors(read_records(stream, self.format(options['vendors'], options['format'])))
+        self.stdout.write(f'\nImported {imported} vendors')
+      if options['purchase_orders']:
+        with self.open(options['purchase_orders']) as stream:
+          imported, vendors = importer.import_purchase_orders(read_records(stream, self.format(options['purchase_orders'], options['format'])))
+        self.stdout.write(f'\nImported {imported} purchase orders, rebuilt the metrics of {vendors} vendors')
+    except ValidationError as e:
+      raise CommandError(e.messages[0])
+    except ValueError as e:  # Malformed JSON line
+      raise CommandError(f'Unreadable input: {e}')
+    if importer.rejected:
+      self.stdout.write(self.style.WARNING(f'{importer.rejected} record(s) rejected.'))
+
+  def open(self, path):
+    if path == '-':
+      return open(sys.stdin.fileno(), encoding='utf-8', newline='', closefd=False)
+    try:
+      return open(path, encoding='utf-8', newline='')
+    except OSError as e:
+      raise CommandError(str(e))
+
+  def format(self, path, fmt):
+    if fmt:
+      return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
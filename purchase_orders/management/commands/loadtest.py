@@ -0,0 +1,81 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from purchase_orders.loadtest import DEFAULT_MIX, run_load
+
+# Mixed API workload against vms/urls.py with N concurrent in-process clients
+# Usage : python manage.py loadtest --clients 8 --duration 30 --json after.json --baseline before.json
+# Run it against a seeded scratch database (see seed_vms): acknowledge,
+# complete and create calls write to it.
+class Command(BaseCommand):
+  help = 'Run a mixed list/detail/performance/acknowledge/complete/create workload and report latency percentiles and throughput.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--clients', type=int, default=4, help='Concurrent client threads.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run for.')
+    parser.add_argument('--requests', type=int, help='Stop after this many requests in total instead of after --duration.')
+    parser.add_argument('--mix', help='Operation weights, e.g. "list=30,detail=25,performance=20,acknowledge=10,complete=10,create=5".')
+    parser.add_argument('--page-size', type=int, default=100, help='Page size of the list calls.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Write the report as JSON to this file ("-" for stdout).')
+    parser.add_argument('--baseline', help='JSON report of a previous run to compare against.')
+
+  def handle(self, *args, **options):
+    if options['clients'] < 1:
+      raise CommandError('--clients must be at least 1.')
+    try:
+      report = run_load(
+        clients=options['clients'], duration=options['duration'], requests=options['requests'],
+        mix=self.parse_mix(options['mix']), seed=options['seed'], page_size=options['page_size'],
+      )
+    except ValueError as e:
+      raise CommandError(str(e))
+
+    baseline = None
+    if options['baseline']:
+      with open(options['baseline']) as f:
+        baseline = json.load(f)
+    if options['json'] == '-':
+      self.stdout.write(json.dumps(report, indent=2))
+      return
+    if options['json']:
+      with open(options['json'], 'w') as f:
+        json.dump(report, f, indent=2)
+    self.print_report(report, baseline)
+
+  def parse_mix(self, value):
+    if not value:
+      return DEFAULT_MIX
+    mix = {}
+    for part in value.split(','):
+      name, _, weight = part.partition('=')
+      name = name.strip()
+      if name not in DEFAULT_MIX:
+        raise CommandError(f"Unknown operation {name!r}, expected one of {', '.join(DEFAULT_MIX)}.")
+      try:
+        mix[name] = float(weight)
+      except ValueError:
+        raise CommandError(f'Invalid weight for {name!r}: {weight!r}')
+    if not any(mix.values()):
+      raise CommandError('--mix needs at least one positive weight.')
+    return mix
+
+  def print_report(self, report, baseline=None):
+    self.stdout.write(f"{report['clients']} client(s), {report['elapsed_s']}s")
+    self.stdout.write(f"{'endpoint':<12} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = list(report['endpoints'].items()) + [('total', report['total'])]
+    for name, stats in rows:
+      self.stdout.write(
+        f"{name:<12} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>9.1f} "
+        f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+      )
+    if baseline is None:
+      return
+    self.stdout.write('\nChange against baseline (rps, p95):')
+    for name, stats in rows:
+      before = baseline['total'] if name == 'total' else baseline['endpoints'].get(name)
+      if not before or not before['rps'] or not before['p95_ms']:
+        continue
+      self.stdout.write(
+        f"{name:<12} rps {(stats['rps'] / before['rps'] - 1) * 100:+.1f}%  "
+        f"p95 {(stats['p95_ms'] / before['p95_ms'] - 1) * 100:+.1f}%"
+      )
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from purchase_orders.metrics_queue import drain_batch, queue_stats
+
+# Worker draining the deferred vendor metrics queue
+# Usage : python manage.py process_metrics_queue [--once] [--workers 4]
+class Command(BaseCommand):
+  help = 'Recompute metrics of vendors marked dirty while VENDOR_METRICS_MODE is "deferred".'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--batch-size', type=int, default=500, help='Maximum number of vendors claimed per batch.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of threads recomputing a batch.')
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty.')
+    parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of polling.')
+    parser.add_argument('--stats', action='store_true', help='Print queue depth and lag and exit.')
+
+  def handle(self, *args, **options):
+    if options['stats']:
+      self.print_stats()
+      return
+    while True:
+      processed = drain_batch(options['batch_size'], options['workers'])
+      if processed:
+        self.stdout.write(f'Recomputed {processed} vendor(s).')
+        self.print_stats()
+        continue
+      if options['once']:
+        return
+      time.sleep(options['interval'])
+
+  def print_stats(self):
+    stats = queue_stats()
+    self.stdout.write(f"queue depth={stats['depth']} lag={stats['lag_seconds']:.1f}s")
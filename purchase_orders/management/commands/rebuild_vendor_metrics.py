@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from vendors.models import Vendor
+from purchase_orders.metrics import rebuild_vendor_range
+
+# Full set-based rebuild of every vendor's counters, metrics and score
+# Usage : python manage.py rebuild_vendor_metrics [--dry-run] [--workers 4] [--chunk-size 1000] [--start-id 1 --end-id 5001]
+# Vendors are processed in id ranges of --chunk-size vendors, each with one
+# GROUP BY over its purchase orders and one bulk_update of the vendors whose
+# stored values drifted. With --workers, the id range is split into that many
+# contiguous shards, each rebuilt by its own `manage.py` process.
+class Command(BaseCommand):
+  help = "Rebuild every vendor's metric counters and metrics from its purchase orders."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--dry-run', action='store_true', help='Print the differences without writing anything.')
+    parser.add_argument('--start-id', type=int, help='First vendor id to rebuild.')
+    parser.add_argument('--end-id', type=int, help='Vendor id to stop before.')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Vendors per aggregate query and transaction.')
+    parser.add_argument('--workers', type=int, default=1, help='Processes rebuilding disjoint vendor id ranges.')
+    # Report the totals as JSON on the last line, used by the worker processes
+    parser.add_argument('--in-process', action='store_true', help=argparse.SUPPRESS)
+
+  def handle(self, *args, **options):
+    if options['chunk_size'] < 1 or options['workers'] < 1:
+      raise CommandError('--chunk-size and --workers must be at least 1.')
+    started = time.perf_counter()
+    if options['workers'] > 1 and not options['in_process']:
+      totals = self.run_workers(options)
+    else:
+      totals = self.rebuild(options['start_id'], options['end_id'], options['chunk_size'], options['dry_run'])
+    if options['in_process']:
+      self.stdout.write(json.dumps(totals))
+      return
+
+    elapsed = time.perf_counter() - started
+    action = 'would be rebuilt (dry run)' if options['dry_run'] else 'rebuilt'
+    self.stdout.write(self.style.SUCCESS(
+      f"{totals['vendors']} vendor(s) checked in {elapsed:.1f}s "
+      f"({totals['vendors'] / elapsed if elapsed else 0:.0f}/s), {totals['drifted']} {action}."
+    ))
+
+  def rebuild(self, start_id, end_id, chunk_size, dry_run):
+    totals = {'vendors': 0, 'drifted': 0}
+    for start, end, count in vendor_chunks(start_id, end_id, chunk_size):
+      drifted = rebuild_vendor_range(start, end, dry_run=dry_run)
+      for vendor_code, changes in drifted.values():
+        for field, (stored, expected) in changes.items():
+          self.stdout.write(f'{vendor_code}: {field} stored={stored} expected={expected}')
+      totals['vendors'] += count
+      totals['drifted'] += len(drifted)
+    return totals
+
+  def run_workers(self, options):
+    chunks = list(vendor_chunks(options['start_id'], options['end_id'], options['chunk_size']))
+    per_worker = -(-len(chunks) // options['workers'])  # Ceiling division
+    manage = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'rebuild_vendor_metrics', '--in-process']
+    workers = []
+    for index in range(0, len(chunks), per_worker):
+      shard = chunks[index:index + per_worker]
+      command = manage + ['--start-id', str(shard[0][0]), '--end-id', str(shard[-1][1]), '--chunk-size', str(options['chunk_size'])]
+      if options['dry_run']:
+        command.append('--dry-run')
+      workers.append(subprocess.Popen(command, env=os.environ, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True))
+
+    totals = {'vendors': 0, 'drifted': 0}
+    failed = []
+    for worker in workers:
+      stdout, stderr = worker.communicate()
+      lines = stdout.strip().splitlines()
+      if worker.returncode or not lines:
+        failed.append(' '.join(stderr.strip().splitlines()[-1:]))
+        continue
+      for line in lines[:-1]:
+        self.stdout.write(line)
+      for key, value in json.loads(lines[-1]).items():
+        totals[key] += value
+    if failed:
+      raise CommandError(f"{len(failed)} worker(s) failed: {'; '.join(failed)}")
+    return totals
+
+def vendor_chunks(start_id=None, end_id=None, size=1000):
+  """(start, end, count) vendor id ranges of at most size vendors each, end exclusive."""
+  ids = Vendor.objects.order_by('pk').values_list('pk', flat=True)
+  if start_id is not None:
+    ids = ids.filter(pk__gte=start_id)
+  if end_id is not None:
+    ids = ids.filter(pk__lt=end_id)
+  start = count = last = None
+  for pk in ids.iterator(chunk_size=10000):
+    if count == size:
+      yield start, pk, count
+      start = count = None
+    if start is None:
+      start, count = pk, 0
+    count += 1
+    last = pk
+  if start is not None:
+    yield start, last + 1, count
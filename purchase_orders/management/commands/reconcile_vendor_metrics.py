@@ -0,0 +1,38 @@
+import math
+from django.core.management.base import BaseCommand, CommandError
+from vendors.models import Vendor, METRIC_COUNTER_FIELDS
+from purchase_orders.models import PurchaseOrder
+from purchase_orders.metrics import METRIC_AGGREGATES, normalize_counters, derive_metrics, write_vendor_metrics
+
+# Verify the incrementally maintained vendor counters against a full recompute
+# Usage : python manage.py reconcile_vendor_metrics [--fix]
+class Command(BaseCommand):
+  help = "Compare each vendor's metric counters with a full recompute from its purchase orders."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--fix', action='store_true', help='Overwrite drifted counters and metrics with the recomputed values.')
+
+  def handle(self, *args, **options):
+    recomputed = {
+      row['vendor']: normalize_counters(row)
+      for row in PurchaseOrder.objects.order_by().values('vendor').annotate(**METRIC_AGGREGATES)
+    }
+    empty = normalize_counters({})
+    drifted = 0
+    for vendor in Vendor.objects.only('id', 'vendor_code', *METRIC_COUNTER_FIELDS).iterator():
+      expected = recomputed.get(vendor.pk, empty)
+      mismatches = [
+        field for field in METRIC_COUNTER_FIELDS
+        if not math.isclose(getattr(vendor, field), expected[field], rel_tol=1e-9, abs_tol=1e-6)
+      ]
+      if not mismatches:
+        continue
+      drifted += 1
+      for field in mismatches:
+        self.stdout.write(f'{vendor.vendor_code}: {field} stored={getattr(vendor, field)} expected={expected[field]}')
+      if options['fix']:
+        write_vendor_metrics({vendor.pk: {**expected, **derive_metrics(expected)}})
+
+    if drifted and not options['fix']:
+      raise CommandError(f'{drifted} vendor(s) have drifted metric counters. Re-run with --fix to repair them.')
+    self.stdout.write(self.style.SUCCESS(f'{drifted} vendor(s) repaired.' if drifted else 'All vendor metric counters are consistent.'))
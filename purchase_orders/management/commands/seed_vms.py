@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from purchase_orders.seed import seed_vendors, seed_purchase_orders, seed_history
+
+# Synthetic data for benchmarks and load tests
+# Usage : python manage.py seed_vms --vendors 100 --pos 100000 --history 365
+# Inserts with bulk_create into the configured database (use a scratch one).
+class Command(BaseCommand):
+  help = 'Seed vendors, purchase orders in a realistic status mix and historical performance snapshots.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--vendors', type=int, default=100, help='Vendors to create.')
+    parser.add_argument('--pos', type=int, default=10000, help='Purchase orders to create, spread over the vendors.')
+    parser.add_argument('--history', type=int, default=0, help='Historical performance snapshots per vendor.')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same data.')
+
+  def handle(self, *args, **options):
+    if options['vendors'] < 1:
+      raise CommandError('--vendors must be at least 1.')
+    started = time.perf_counter()
+    vendor_ids = [vendor.pk for vendor in seed_vendors(options['vendors'])]
+    self.stdout.write(f'Seeded {len(vendor_ids)} vendors in {time.perf_counter() - started:.1f}s')
+
+    if options['pos']:
+      started = time.perf_counter()
+      seed_purchase_orders(
+        vendor_ids, options['pos'], batch_size=options['batch_size'], seed=options['seed'],
+        progress=lambda created: self.stdout.write(f'seeded {created} purchase orders', ending='\r'),
+      )
+      self.stdout.write(f"\nSeeded {options['pos']} purchase orders in {time.perf_counter() - started:.1f}s")
+
+    if options['history']:
+      started = time.perf_counter()
+      created = seed_history(vendor_ids, options['history'], batch_size=options['batch_size'], seed=options['seed'])
+      self.stdout.write(f'Seeded {created} historical performance snapshots in {time.perf_counter() - started:.1f}s')
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+# Copy the primary SQLite database to the replica, standing in for
+# replication when trying the read replica routing locally
+# Usage : VMS_DB_REPLICA_NAME=replica.sqlite3 python manage.py sync_replica
+class Command(BaseCommand):
+  help = 'Copy the primary SQLite database into the read replica (local testing of replica routing).'
+
+  def handle(self, *args, **options):
+    alias = settings.REPLICA_DATABASE
+    if alias is None:
+      raise CommandError('No replica configured, set VMS_DB_REPLICA_NAME.')
+    primary, replica = connections['default'], connections[alias]
+    if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+      raise CommandError('sync_replica only copies SQLite databases, use the server\'s replication otherwise.')
+    primary.ensure_connection()
+    replica.ensure_connection()
+    primary.connection.backup(replica.connection)
+    self.stdout.write(f"Copied {primary.settings_dict['NAME']} to {replica.settings_dict['NAME']}.")
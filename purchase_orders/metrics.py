@@ -0,0 +1,227 @@
+import math
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+from vendors.models import Vendor, HistoricalPerformance, METRIC_FIELDS, METRIC_COUNTER_FIELDS
+from vendors.cache import invalidate_vendor
+from vendors.rollups import add_snapshot
+from vendors.ranking import ranking_score, current_weights, compute_score
+from .models import PurchaseOrder
+
+# Vendor performance metrics are derived from running counters stored on the
+# Vendor row. Each purchase order contributes a fixed set of counter values
+# depending on its state, so a save only has to apply the difference between
+# the old and the new contribution instead of re-scanning the vendor's POs.
+
+# Purchase order fields the counters depend on
+STATE_FIELDS = (
+  'vendor_id',
+  'status',
+  'delivery_date',
+  'completed_at',
+  'quality_rating',
+  'issue_date',
+  'acknowledgment_date',
+)
+
+RATED = Q(status='completed', quality_rating__isnull=False)
+ACKNOWLEDGED = Q(acknowledgment_date__isnull=False)
+RESPONSE_TIME = ExpressionWrapper(F('acknowledgment_date') - F('issue_date'), output_field=DurationField())
+
+# Full recompute of the counters, usable with aggregate() or values().annotate()
+METRIC_AGGREGATES = {
+  'total_pos': Count('id'),
+  'completed_pos': Count('id', filter=Q(status='completed')),
+  'on_time_pos': Count('id', filter=Q(status='completed', delivery_date__gte=F('completed_at'))),
+  'quality_rating_sum': Sum('quality_rating', filter=RATED),
+  'quality_rating_count': Count('id', filter=RATED),
+  'response_time_sum': Sum(RESPONSE_TIME, filter=ACKNOWLEDGED),
+  'response_time_count': Count('id', filter=ACKNOWLEDGED),
+}
+
+def po_state(purchase_order):
+  """Snapshot of the fields of a purchase order that feed the vendor counters."""
+  return {field: getattr(purchase_order, field) for field in STATE_FIELDS}
+
+def po_counters(state):
+  """Counter contribution of a single purchase order state."""
+  counters = dict.fromkeys(METRIC_COUNTER_FIELDS, 0)
+  counters['total_pos'] = 1
+  if state['status'] == 'completed':
+    counters['completed_pos'] = 1
+    if state['completed_at'] and state['delivery_date'] >= state['completed_at']:
+      counters['on_time_pos'] = 1
+    if state['quality_rating'] is not None:
+      counters['quality_rating_sum'] = float(state['quality_rating'])
+      counters['quality_rating_count'] = 1
+  if state['acknowledgment_date'] and state['issue_date']:
+    response_time = state['acknowledgment_date'] - state['issue_date']
+    counters['response_time_sum'] = response_time.total_seconds() / 60
+    counters['response_time_count'] = 1
+  return counters
+
+def metric_deltas(old_state, new_state):
+  """Per-vendor counter deltas for a purchase order moving from old_state to new_state.
+
+  Either state may be None (creation / deletion). Vendors whose counters do
+  not change are left out of the result.
+  """
+  deltas = {}
+  for state, sign in ((old_state, -1), (new_state, 1)):
+    if state is None:
+      continue
+    vendor_deltas = deltas.setdefault(state['vendor_id'], dict.fromkeys(METRIC_COUNTER_FIELDS, 0))
+    for field, value in po_counters(state).items():
+      vendor_deltas[field] += sign * value
+  return {vendor_id: d for vendor_id, d in deltas.items() if any(d.values())}
+
+def merge_metric_deltas(target, deltas):
+  """Add per-vendor deltas into target, used to batch many purchase order changes."""
+  for vendor_id, vendor_deltas in deltas.items():
+    merged = target.setdefault(vendor_id, dict.fromkeys(METRIC_COUNTER_FIELDS, 0))
+    for field, value in vendor_deltas.items():
+      merged[field] += value
+  return target
+
+def derive_metrics(counters):
+  """Performance metrics of a vendor computed from its counters."""
+  total, completed = counters['total_pos'], counters['completed_pos']
+  rated, acknowledged = counters['quality_rating_count'], counters['response_time_count']
+  return {
+    'on_time_delivery_rate': counters['on_time_pos'] / completed if completed else 0.0,
+    'quality_rating_avg': counters['quality_rating_sum'] / rated if rated else 0.0,
+    'average_response_time': counters['response_time_sum'] / acknowledged if acknowledged else 0.0,
+    'fulfillment_rate': completed / total if total else 0.0,
+  }
+
+def normalize_counters(row):
+  """Convert a METRIC_AGGREGATES result into counter values."""
+  counters = {field: row.get(field) or 0 for field in METRIC_COUNTER_FIELDS}
+  response_time_sum = counters['response_time_sum']
+  if response_time_sum:
+    counters['response_time_sum'] = response_time_sum.total_seconds() / 60
+  counters['quality_rating_sum'] = float(counters['quality_rating_sum'])
+  counters['response_time_sum'] = float(counters['response_time_sum'])
+  return counters
+
+def compute_vendor_counters(vendor_id):
+  """Recompute a vendor's counters from scratch with a single aggregate query."""
+  row = PurchaseOrder.objects.filter(vendor_id=vendor_id).aggregate(**METRIC_AGGREGATES)
+  return normalize_counters(row)
+
+# Apply counter deltas to a vendor and refresh its derived metrics
+def apply_metric_deltas(vendor_id, deltas):
+  updated_at = timezone.now()
+  with transaction.atomic():
+    updated = Vendor.objects.filter(pk=vendor_id).update(
+      **{field: F(field) + value for field, value in deltas.items()},
+      version=F('version') + 1, updated_at=updated_at,
+    )
+    if not updated:
+      return None
+    counters = Vendor.objects.filter(pk=vendor_id).values(*METRIC_COUNTER_FIELDS, 'version').get()
+    version = counters.pop('version')
+    metrics = derive_metrics(counters)
+    Vendor.objects.filter(pk=vendor_id).update(**metrics, score=ranking_score({**counters, **metrics}))
+    invalidate_vendor(vendor_id)
+  return {**counters, **metrics, 'version': version, 'updated_at': updated_at}
+
+# Recompute a vendor's counters and metrics from its purchase orders
+def recompute_vendor_metrics(vendor_id):
+  with transaction.atomic():
+    counters = compute_vendor_counters(vendor_id)
+    metrics = derive_metrics(counters)
+    Vendor.objects.filter(pk=vendor_id).update(
+      **counters, **metrics, score=ranking_score({**counters, **metrics}),
+      version=F('version') + 1, updated_at=timezone.now(),
+    )
+    invalidate_vendor(vendor_id)
+  return {**counters, **metrics}
+
+# Counters of every vendor with purchase orders in the queryset, one GROUP BY query
+def recompute_counters(purchase_orders):
+  rows = purchase_orders.order_by().values('vendor').annotate(**METRIC_AGGREGATES)
+  return {row['vendor']: normalize_counters(row) for row in rows}
+
+# Write {vendor_id: counters and metrics} with bulk_update and refresh the
+# scores of those vendors, returns the unsaved Vendor instances written
+def write_vendor_metrics(values, batch_size=1000):
+  now = timezone.now()
+  vendors = [
+    Vendor(pk=vendor_id, **fields, version=F('version') + 1, updated_at=now)
+    for vendor_id, fields in values.items()
+  ]
+  with transaction.atomic():
+    Vendor.objects.bulk_update(vendors, [*METRIC_COUNTER_FIELDS, *METRIC_FIELDS, 'version', 'updated_at'], batch_size=batch_size)
+    for start in range(0, len(vendors), batch_size):
+      Vendor.objects.filter(pk__in=[vendor.pk for vendor in vendors[start:start + batch_size]]).update(score=ranking_score())
+    for vendor in vendors:
+      invalidate_vendor(vendor.pk)
+  return vendors
+
+# Recompute the counters and metrics of many vendors with one grouped aggregate
+# and one bulk UPDATE per batch, optionally recording a snapshot for each
+def rebuild_vendor_metrics(vendor_ids, snapshot=False, batch_size=1000):
+  vendor_ids = sorted(set(vendor_ids))
+  results = {}
+  for start in range(0, len(vendor_ids), batch_size):
+    batch = vendor_ids[start:start + batch_size]
+    recomputed = recompute_counters(PurchaseOrder.objects.filter(vendor_id__in=batch))
+    with transaction.atomic():
+      values = {}
+      for vendor_id in Vendor.objects.filter(pk__in=batch).values_list('pk', flat=True):
+        counters = recomputed.get(vendor_id) or normalize_counters({})
+        values[vendor_id] = {**counters, **derive_metrics(counters)}
+      vendors = write_vendor_metrics(values, batch_size)
+      results.update(values)
+      if snapshot:
+        now = timezone.now()
+        snapshots = HistoricalPerformance.objects.bulk_create([
+          HistoricalPerformance(vendor_id=vendor.pk, date=now, **{field: getattr(vendor, field) for field in METRIC_FIELDS})
+          for vendor in vendors
+        ], batch_size=batch_size)
+        for performance in snapshots:  # bulk_create sends no post_save, fold them into the rollups here
+          add_snapshot(performance)
+  return results
+
+# Full rebuild of the vendors with start <= id < end: one grouped aggregate
+# over their purchase orders, compared with the stored values and score, and
+# one bulk_update of the vendors that drifted (unless dry_run). The vendor rows are
+# locked first, so a concurrent PO save either lands in the aggregate or
+# applies its counter delta after the rebuilt values are written.
+# Returns {vendor_id: (vendor_code, {field: (stored, expected)})} of the drifted vendors.
+def rebuild_vendor_range(start, end, dry_run=False):
+  fields = (*METRIC_COUNTER_FIELDS, *METRIC_FIELDS)
+  with transaction.atomic():
+    vendors = Vendor.objects.filter(pk__gte=start, pk__lt=end).order_by('pk')
+    if not dry_run:
+      vendors = vendors.select_for_update()
+    stored = list(vendors.values('pk', 'vendor_code', *fields, 'score'))
+    if not stored:
+      return {}
+    recomputed = recompute_counters(PurchaseOrder.objects.filter(vendor_id__gte=start, vendor_id__lt=end))
+    weights = current_weights()
+    drifted, values = {}, {}
+    for vendor in stored:
+      counters = recomputed.get(vendor['pk']) or normalize_counters({})
+      expected = {**counters, **derive_metrics(counters)}
+      expected['score'] = compute_score(expected, weights)
+      changes = {
+        field: (vendor[field], expected[field]) for field in (*fields, 'score')
+        if not math.isclose(vendor[field], expected[field], rel_tol=1e-9, abs_tol=1e-6)
+      }
+      if changes:
+        drifted[vendor['pk']] = (vendor['vendor_code'], changes)
+        values[vendor['pk']] = {field: expected[field] for field in fields}  # write_vendor_metrics() sets the score
+    if values and not dry_run:
+      write_vendor_metrics(values)
+  return drifted
+
+# Store a snapshot of the vendor's current metrics
+def record_historical_performance(vendor_id, metrics=None):
+  if metrics is None:
+    metrics = Vendor.objects.filter(pk=vendor_id).values(*METRIC_FIELDS).get()
+  return HistoricalPerformance.objects.create(
+    vendor_id=vendor_id,
+    **{field: metrics[field] for field in METRIC_FIELDS}
+  )
@@ -0,0 +1,79 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from .models import DirtyVendor
+from .metrics import recompute_vendor_metrics, record_historical_performance
+
+# Deferred metric recomputation. Writers only mark a vendor dirty; the worker
+# (manage.py process_metrics_queue) recomputes every dirty vendor once per
+# batch no matter how many purchase order writes hit it in the meantime.
+
+logger = logging.getLogger(__name__)
+
+def deferred_metrics():
+  return getattr(settings, 'VENDOR_METRICS_MODE', 'sync') == 'deferred'
+
+# Mark vendors dirty once the surrounding transaction commits, so the worker
+# always sees the writes that caused the marker
+def enqueue_vendors(vendor_ids, snapshot_vendor_ids=()):
+  vendor_ids = set(vendor_ids) | set(snapshot_vendor_ids)
+  if vendor_ids:
+    transaction.on_commit(lambda: _mark_dirty(vendor_ids, set(snapshot_vendor_ids)))
+
+def _mark_dirty(vendor_ids, snapshot_vendor_ids):
+  now = timezone.now()
+  DirtyVendor.objects.bulk_create(
+    [DirtyVendor(vendor_id=vendor_id, enqueued_at=now) for vendor_id in vendor_ids],
+    ignore_conflicts=True,
+  )
+  if snapshot_vendor_ids:
+    DirtyVendor.objects.filter(vendor_id__in=snapshot_vendor_ids, needs_snapshot=False).update(needs_snapshot=True)
+
+# Queue depth and age of the oldest marker
+def queue_stats():
+  stats = DirtyVendor.objects.aggregate(depth=Count('pk'), oldest=Min('enqueued_at'))
+  oldest = stats['oldest']
+  return {
+    'depth': stats['depth'],
+    'oldest_enqueued_at': oldest,
+    'lag_seconds': (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+  }
+
+# Claim up to batch_size dirty vendors, oldest first
+def claim_batch(batch_size):
+  with transaction.atomic():
+    entries = list(
+      DirtyVendor.objects.select_for_update(skip_locked=True).order_by('enqueued_at')[:batch_size]
+    )
+    DirtyVendor.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+  return entries
+
+def process_entry(entry):
+  try:
+    metrics = recompute_vendor_metrics(entry.vendor_id)
+    if entry.needs_snapshot:
+      record_historical_performance(entry.vendor_id, metrics)
+  except Exception:
+    logger.exception('Recomputing metrics for vendor %s failed, re-queueing', entry.vendor_id)
+    DirtyVendor.objects.bulk_create([entry], ignore_conflicts=True)
+    return False
+  return True
+
+def _process_in_thread(entry):
+  try:
+    return process_entry(entry)
+  finally:
+    connection.close()
+
+# Process one batch of the queue, returns the number of vendors recomputed
+def drain_batch(batch_size=500, workers=1):
+  entries = claim_batch(batch_size)
+  if workers > 1 and len(entries) > 1:
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+      results = list(executor.map(_process_in_thread, entries))
+  else:
+    results = [process_entry(entry) for entry in entries]
+  return sum(results)
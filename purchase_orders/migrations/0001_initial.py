@@ -0,0 +1,33 @@
+# Generated by Django 5.0.4 on 2026-10-18 15:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('vendors', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchaseOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('po_number', models.CharField(blank=True, default='', max_length=100)),
+                ('order_date', models.DateTimeField()),
+                ('delivery_date', models.DateTimeField()),
+                ('items', models.JSONField()),
+                ('quantity', models.IntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('acknowledged', 'Acknowledged by Vendor'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('quality_rating', models.FloatField(blank=True, null=True)),
+                ('issue_date', models.DateTimeField(auto_now_add=True)),
+                ('acknowledgment_date', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vendors.vendor')),
+            ],
+        ),
+    ]
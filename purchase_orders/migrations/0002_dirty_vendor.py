@@ -0,0 +1,24 @@
+# Generated by Django 5.0.4 on 2026-10-18 15:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchase_orders', '0001_initial'),
+        ('vendors', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyVendor',
+            fields=[
+                ('vendor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='vendors.vendor')),
+                ('enqueued_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('needs_snapshot', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from vendors.models import Vendor
 from django.utils import timezone
+from sequences.allocator import advance, next_values, highest_number
 
 # Purchase Order Model
 class PurchaseOrder(models.Model):
@@ -20,30 +21,106 @@ class PurchaseOrder(models.Model):
   issue_date = models.DateTimeField(auto_now_add=True)
   acknowledgment_date = models.DateTimeField(null=True, blank=True)
   completed_at = models.DateTimeField(blank=True, null=True)
+  # Bumped on every write, the ETag is derived from it (vms.conditional)
+  version = models.PositiveIntegerField(default=1, editable=False)
+  updated_at = models.DateTimeField(auto_now=True)
+
+  class Meta:
+    indexes = [
+      # Completed / on-time counts per vendor, its (vendor, status) prefix serves the status filters
+      models.Index(fields=['vendor', 'status', 'completed_at', 'delivery_date'], name='po_vendor_status_idx'),
+      # Acknowledged POs and response times per vendor
+      models.Index(fields=['vendor', 'acknowledgment_date'], name='po_vendor_ack_idx'),
+      # List filters and orderings (purchase_orders.filters)
+      models.Index(fields=['status', 'issue_date'], name='po_status_issue_idx'),
+      models.Index(fields=['issue_date'], name='po_issue_date_idx'),
+      models.Index(fields=['order_date'], name='po_order_date_idx'),
+      models.Index(fields=['delivery_date'], name='po_delivery_date_idx'),
+      models.Index(fields=['quality_rating'], name='po_quality_rating_idx'),
+      # ?late=true / ?late=false (with ?ordering=completed_at), partial indexes over late and on-time completions
+      models.Index(fields=['completed_at'], condition=models.Q(completed_at__gt=models.F('delivery_date')), name='po_late_idx'),
+      models.Index(fields=['completed_at'], condition=models.Q(completed_at__lte=models.F('delivery_date')), name='po_on_time_idx'),
+    ]
+
+  # Keep the values read from the database, the signals compare them with the
+  # saved ones instead of re-reading the row (purchase_orders.signals)
+  @classmethod
+  def from_db(cls, db, field_names, values):
+    instance = super().from_db(db, field_names, values)
+    instance._loaded_values = dict(zip(field_names, values))
+    return instance
+
+  def refresh_from_db(self, using=None, fields=None, **kwargs):
+    super().refresh_from_db(using, fields, **kwargs)
+    loaded = getattr(self, '_loaded_values', {})
+    for field in self._meta.concrete_fields:
+      if field.attname in self.__dict__ and (fields is None or field.name in fields or field.attname in fields):
+        loaded[field.attname] = getattr(self, field.attname)
+    self._loaded_values = loaded
 
   # On Save method
   def save(self, *args, **kwargs):
     if not self.po_number:
-      last_po_number = PurchaseOrder.objects.order_by('-id').first()
-      if last_po_number:
-        last_po_number = int(last_po_number.po_number.split('-')[1])
-      else:
-        last_po_number = 0
-      self.po_number = f'PO-{str(last_po_number + 1).zfill(3)}'
-    super().save(*args, **kwargs)
-
-  def complete_order(self):
+      self.po_number = PurchaseOrder.allocate_po_numbers(1)[0]
+    elif self._state.adding or 'po_number' in (kwargs.get('update_fields') or ['po_number']):
+      # An explicit number in the generated format must never be generated again
+      number = highest_number([self.po_number], 'PO-')
+      if number:
+        advance('po_number', number, initial=PurchaseOrder.last_po_number)
+    if not self._state.adding:
+      self.version += 1
+      if kwargs.get('update_fields') is not None:
+        kwargs['update_fields'] = {*kwargs['update_fields'], 'version', 'updated_at'}
+    # The metric signals lock the stored row before it is overwritten and apply
+    # the vendor counter deltas after, in the same transaction as the write
+    with transaction.atomic():
+      super().save(*args, **kwargs)
+
+  # Allocate the next `count` PO numbers from the po_number sequence
+  @staticmethod
+  def allocate_po_numbers(count):
+    numbers = next_values('po_number', count, initial=PurchaseOrder.last_po_number)
+    return [f'PO-{str(number).zfill(3)}' for number in numbers]
+
+  # Highest PO number in use, seeds the sequence the first time it is used
+  @staticmethod
+  def last_po_number():
+    return highest_number(PurchaseOrder.objects.values_list('po_number', flat=True).iterator(), 'PO-')
+
+  def complete_order(self, quality_rating=None):
     """Method to mark a purchase order as completed and update completed_at."""
+    if quality_rating is not None:
+      self.quality_rating = quality_rating
     self.status = 'completed'
     self.completed_at = timezone.now()
-    self.save()
+    self.save(update_fields=['status', 'completed_at', 'quality_rating'])
   
   def cancel_order(self):
     """Method to mark a purchase order as completed and update completed_at."""
     self.status = 'cancelled'
     self.completed_at = timezone.now()
-    self.save()
+    self.save(update_fields=['status', 'completed_at'])
 
   def __str__(self):
     return f"PurchaseOrder #{self.po_number}"
 
+
+# Vendors whose metrics are waiting to be recomputed by the metrics queue worker
+class DirtyVendor(models.Model):
+  vendor = models.OneToOneField(Vendor, on_delete=models.CASCADE, primary_key=True)
+  enqueued_at = models.DateTimeField(default=timezone.now, db_index=True)
+  needs_snapshot = models.BooleanField(default=False)
+
+  def __str__(self):
+    return f"DirtyVendor #{self.vendor_id}"
+
+
+# Progress of a resumable import (manage.py import_vms --checkpoint), written
+# in the transaction of each imported batch
+class ImportCheckpoint(models.Model):
+  name = models.CharField(max_length=200, unique=True)
+  position = models.BigIntegerField(default=0)
+  updated_at = models.DateTimeField(auto_now=True)
+
+  def __str__(self):
+    return f"{self.name} @ {self.position}"
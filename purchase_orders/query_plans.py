@@ -0,0 +1,97 @@
+import datetime
+import re
+from django.apps import apps
+from django.http import QueryDict
+from django.utils import timezone
+from django.db import connection
+from django.db.models import Avg, Count, F
+from vendors.models import Vendor, HistoricalPerformance, HistoricalPerformanceRollup, METRIC_FIELDS, METRIC_COUNTER_FIELDS
+from .models import PurchaseOrder
+from .metrics import STATE_FIELDS, METRIC_AGGREGATES
+from .filters import PurchaseOrderFilter
+from vms.pagination import keyset_filter, order_expressions, reverse_ordering
+
+# Query plans of the hot queries issued by purchase_orders.signals / metrics
+# and vendors.views. Every query here must be answered through an index:
+# a plan falling back to a full table scan is reported as a failure.
+
+def hot_queries(vendor_id, purchase_order_id, page_size=100):
+  """(label, queryset) pairs mirroring the queries run by the signals and views."""
+  purchase_orders = PurchaseOrder.objects.filter(vendor_id=vendor_id)
+  history = HistoricalPerformance.objects.filter(vendor_id=vendor_id)
+  since = timezone.now() - datetime.timedelta(days=365)
+  return [
+    ('signals: stored state before save', PurchaseOrder.objects.filter(pk=purchase_order_id).values(*STATE_FIELDS)),
+    ('signals: vendor counters', Vendor.objects.filter(pk=vendor_id).values(*METRIC_COUNTER_FIELDS)),
+    ('signals: full metric recompute', purchase_orders.values('vendor').annotate(**METRIC_AGGREGATES)),
+    ('signals: completed POs', purchase_orders.filter(status='completed').values('vendor').annotate(n=Count('id'))),
+    ('signals: on-time POs', purchase_orders.filter(status='completed', delivery_date__gte=F('completed_at')).values('vendor').annotate(n=Count('id'))),
+    ('signals: acknowledged POs', purchase_orders.filter(acknowledgment_date__isnull=False).values('vendor').annotate(n=Count('id'))),
+    ('views: vendor list page', Vendor.objects.filter(pk__gt=vendor_id).order_by('id')[:page_size]),
+    ('views: vendor detail', Vendor.objects.filter(pk=vendor_id)),
+    ('views: vendor ranking page', Vendor.objects.filter(keyset_filter(Vendor, ('-score', 'id'), (0.5, vendor_id))).order_by('-score', 'id')[:page_size]),
+    ('views: vendor performance', history.values('vendor').annotate(**{field: Avg(field) for field in METRIC_FIELDS})),
+    ('views: vendor POs page', purchase_orders.filter(pk__gt=purchase_order_id).order_by('id')[:page_size]),
+    ('views: vendor POs count', purchase_orders.values('vendor').annotate(n=Count('id'))),
+    ('views: historical performance range', history.filter(date__gte=since).order_by('date')[:page_size]),
+    ('views: historical rollups', HistoricalPerformanceRollup.objects.filter(vendor_id=vendor_id, resolution='week').order_by('bucket_start')[:page_size]),
+    *list_filter_queries(vendor_id, page_size),
+  ]
+
+# Supported filter combinations of the purchase order list (purchase_orders.filters),
+# each with the ordering its index serves
+LIST_FILTERS = (
+  'vendor={vendor}&ordering=id',
+  'vendor={vendor}&status=completed&ordering=id',
+  'vendor={vendor}&status=pending,acknowledged&ordering=-id',
+  'vendor={vendor}&late=true&ordering=id',
+  'status=pending&ordering=-issue_date',
+  'status=acknowledged&issue_date_after={since}&ordering=issue_date',
+  'issue_date_after={since}&ordering=-issue_date',
+  'order_date_after={since}&order_date_before={until}&ordering=order_date',
+  'delivery_date_before={until}&ordering=-delivery_date',
+  'quality_rating_min=4.5&ordering=-quality_rating',
+  'quality_rating_min=1&quality_rating_max=2&ordering=quality_rating',
+  'late=true&ordering=-completed_at',
+  'late=false&ordering=completed_at',
+)
+
+def list_filter_queries(vendor_id, page_size=100):
+  """(label, queryset) pairs for the first page of every LIST_FILTERS combination."""
+  from .views import PurchaseOrderListCreateView
+  until = timezone.now()
+  since = until - datetime.timedelta(days=30)
+  params = {'vendor': vendor_id, 'since': since.strftime('%Y-%m-%dT%H:%M:%S'), 'until': until.strftime('%Y-%m-%dT%H:%M:%S')}
+  queries = []
+  for query in LIST_FILTERS:
+    query = query.format(**params)
+    data = QueryDict(query)
+    ordering = data['ordering']
+    fields = PurchaseOrderListCreateView.cursor_orderings[ordering.lstrip('-')]
+    if ordering.startswith('-'):
+      fields = reverse_ordering(fields)
+    queryset = PurchaseOrderFilter(data, queryset=PurchaseOrder.objects.all()).qs
+    queries.append((f'views: PO list ?{query}', queryset.order_by(*order_expressions(PurchaseOrder, fields))[:page_size]))
+  return queries
+
+def full_scans(plan):
+  """Tables read with a full scan according to an EXPLAIN output."""
+  if connection.vendor == 'postgresql':
+    return re.findall(r'Seq Scan on (\w+)', plan)
+  # SQLite: "SCAN table" (optionally "USING [COVERING] INDEX") reads every row,
+  # only "SEARCH table USING ..." seeks into an index. Scanning a partial index
+  # only reads the rows matching its condition and is fine.
+  partial = partial_indexes()
+  return [table for table, index in re.findall(r'\bSCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?', plan) if index not in partial]
+
+def partial_indexes():
+  """Names of the partial (conditional) indexes declared by the installed models."""
+  return {index.name for model in apps.get_models() for index in model._meta.indexes if index.condition is not None}
+
+def check_query_plans(vendor_id, purchase_order_id):
+  """[(label, plan, scanned tables)] for every hot query."""
+  results = []
+  for label, queryset in hot_queries(vendor_id, purchase_order_id):
+    plan = queryset.explain()
+    results.append((label, plan, full_scans(plan)))
+  return results
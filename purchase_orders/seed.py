@@ -0,0 +1,96 @@
+import datetime
+import random
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from vendors.models import Vendor, HistoricalPerformance
+from vendors.rollups import rebuild_rollups
+from .models import PurchaseOrder
+from .metrics import recompute_vendor_metrics
+
+# Synthetic data for benchmarks. Rows are inserted with bulk_create, so no
+# signals run; vendor metrics are recomputed once at the end.
+
+# Share of purchase orders per status
+STATUS_MIX = (
+  ('pending', 0.15),
+  ('acknowledged', 0.15),
+  ('completed', 0.65),
+  ('cancelled', 0.05),
+)
+
+def seed_vendors(count, batch_size=1000):
+  vendors = [
+    Vendor(name=f'Vendor {index}', mobile_number='1234567890', address=f'Address {index}', email=f'vendor{index}@example.com')
+    for index in range(count)
+  ]
+  for vendor in vendors:
+    vendor.vendor_code = vendor.generate_vendor_code()
+  return Vendor.objects.bulk_create(vendors, batch_size=batch_size)
+
+def random_purchase_order(vendor_id, rng, now):
+  order_date = now - datetime.timedelta(days=rng.uniform(1, 365))
+  delivery_date = order_date + datetime.timedelta(days=rng.uniform(1, 14))
+  status = rng.choices([name for name, _ in STATUS_MIX], [weight for _, weight in STATUS_MIX])[0]
+  po = PurchaseOrder(
+    vendor_id=vendor_id,
+    order_date=order_date,
+    delivery_date=delivery_date,
+    items={f'item{i}': rng.randint(1, 20) for i in range(rng.randint(1, 5))},
+    quantity=rng.randint(1, 100),
+    status=status,
+  )
+  if status != 'pending':
+    po.acknowledgment_date = order_date + datetime.timedelta(minutes=rng.uniform(5, 48 * 60))
+  if status in ('completed', 'cancelled'):
+    # Roughly 80% of completions arrive on time
+    po.completed_at = delivery_date + datetime.timedelta(days=rng.uniform(-3, 0.75))
+  if status == 'completed' and rng.random() < 0.8:
+    po.quality_rating = round(rng.uniform(1, 5), 1)
+  return po
+
+def seed_purchase_orders(vendor_ids, count, batch_size=5000, seed=0, progress=None):
+  rng = random.Random(seed)
+  now = timezone.now()
+  created = 0
+  while created < count:
+    size = min(batch_size, count - created)
+    numbers = PurchaseOrder.allocate_po_numbers(size)
+    batch = [random_purchase_order(rng.choice(vendor_ids), rng, now) for _ in range(size)]
+    for po, number in zip(batch, numbers):
+      po.po_number = number
+    with transaction.atomic():
+      batch = PurchaseOrder.objects.bulk_create(batch, batch_size=batch_size)
+      # issue_date is auto_now_add, backdate it to the order date afterwards
+      PurchaseOrder.objects.filter(pk__range=(batch[0].pk, batch[-1].pk)).update(issue_date=F('order_date'))
+    created += size
+    if progress:
+      progress(created)
+  for vendor_id in vendor_ids:
+    recompute_vendor_metrics(vendor_id)
+  return created
+
+# Daily-ish performance snapshots over the last year, drifting around a
+# per-vendor baseline. Rollups are rebuilt once for the seeded vendors.
+def seed_history(vendor_ids, per_vendor, batch_size=5000, seed=0):
+  rng = random.Random(seed)
+  now = timezone.now().replace(microsecond=0)
+  snapshots = []
+  created = 0
+  for vendor_id in vendor_ids:
+    on_time, rating, response = rng.uniform(0.6, 1), rng.uniform(2.5, 5), rng.uniform(30, 24 * 60)
+    for index in range(per_vendor):
+      snapshots.append(HistoricalPerformance(
+        vendor_id=vendor_id,
+        date=now - datetime.timedelta(days=365 * index / per_vendor),
+        on_time_delivery_rate=min(1.0, max(0.0, on_time + rng.uniform(-0.1, 0.1))),
+        quality_rating_avg=min(5.0, max(1.0, rating + rng.uniform(-0.5, 0.5))),
+        average_response_time=max(1.0, response * rng.uniform(0.7, 1.3)),
+        fulfillment_rate=rng.uniform(0.5, 0.9),
+      ))
+      if len(snapshots) >= batch_size:
+        created += len(HistoricalPerformance.objects.bulk_create(snapshots, batch_size=batch_size))
+        snapshots = []
+  created += len(HistoricalPerformance.objects.bulk_create(snapshots, batch_size=batch_size))
+  rebuild_rollups(vendor_ids)
+  return created
@@ -1,8 +1,46 @@
+from django.db import transaction
 from rest_framework import serializers
+from vms.serializers import SparseFieldsMixin
 from .models import PurchaseOrder
+from .metrics import po_state, metric_deltas, merge_metric_deltas
+from .signals import update_vendor_metrics
+from .transitions import ACTIONS
+
+# Bulk insert for PurchaseOrderSerializer(many=True)
+class PurchaseOrderListSerializer(serializers.ListSerializer):
+  batch_size = 500
+
+  def create(self, validated_data):
+    purchase_orders = [PurchaseOrder(**item) for item in validated_data]
+    with transaction.atomic():
+      # Allocate PO numbers for the whole batch at once
+      numbers = iter(PurchaseOrder.allocate_po_numbers(sum(1 for po in purchase_orders if not po.po_number)))
+      for po in purchase_orders:
+        if not po.po_number:
+          po.po_number = next(numbers)
+      purchase_orders = PurchaseOrder.objects.bulk_create(purchase_orders, batch_size=self.batch_size)
+      # bulk_create sends no signals, update each affected vendor once
+      deltas = {}
+      for po in purchase_orders:
+        merge_metric_deltas(deltas, metric_deltas(None, po_state(po)))
+      completed_vendor_ids = {po.vendor_id for po in purchase_orders if po.status == 'completed'}
+      update_vendor_metrics(deltas, sorted(completed_vendor_ids))
+    return purchase_orders
 
 # Purchase Order Serializer
-class PurchaseOrderSerializer(serializers.ModelSerializer):
+class PurchaseOrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
   class Meta:
     model = PurchaseOrder
-    fields = '__all__'
\ No newline at end of file
+    fields = '__all__'
+    list_serializer_class = PurchaseOrderListSerializer
+
+# Item of a POST api/purchase_orders/transitions/ batch
+class PurchaseOrderTransitionSerializer(serializers.Serializer):
+  id = serializers.IntegerField()
+  action = serializers.ChoiceField(choices=ACTIONS)
+  quality_rating = serializers.FloatField(required=False, allow_null=True)
+
+  def validate(self, data):
+    if data.get('quality_rating') is not None and data['action'] != 'complete':
+      raise serializers.ValidationError({'quality_rating': 'Only accepted with the complete action.'})
+    return data
@@ -1,80 +1,91 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from .models import PurchaseOrder
-from django.db.models import F, Avg
-from vendors.models import HistoricalPerformance
-import datetime
+from vendors.models import Vendor
+from .metrics import (
+  STATE_FIELDS, po_state, metric_deltas, apply_metric_deltas, record_historical_performance,
+)
+from .metrics_queue import deferred_metrics, enqueue_vendors
+from vendors.cache import invalidate_vendor
+from vms.instrumentation import timed_signal
 
 # Signal to update Vendor's performance metrics
 
-# Main function
-@receiver(post_save, sender=PurchaseOrder)
-def handle_purchase_order_save(sender, instance, created, **kwargs):
-  update_vendor_metrics(instance.vendor) # Update vendor metrics
-  if created and instance.status=="acknowledged":  # Process newly created purchase orders (acknowledgments)
-    update_response_time(instance)  # Update average response time
-  else:  # Process updated purchase orders (potentially completed)
-    if instance.status == 'completed':
-      update_on_time_delivery_rate(instance)  # Update on-time delivery rate
-      update_historical_performance(instance.vendor) # Update Historical performance of vendor
-      if instance.quality_rating is not None:  # Update quality rating if completed with rating
-        update_vendor_quality_rating(instance.vendor)
-    if instance.status == 'cancelled':
-      update_on_time_delivery_rate(instance)
-
-# Update avg response time
-def update_response_time(purchase_order):
-  vendor = purchase_order.vendor
-  # Calculate and update average response time (same logic as before)
-  vendor_pos = PurchaseOrder.objects.filter(vendor=vendor)
-  response_times = []
-  for po in vendor_pos:
-    if po.acknowledgment_date:
-      issue_date = po.issue_date
-      ack_date = po.acknowledgment_date
-      response_time = ack_date - issue_date
-      response_times.append(response_time.total_seconds() / 60)
-
-  if response_times:
-    average_response_time = sum(response_times) / len(response_times)
-    vendor.average_response_time = average_response_time
-    vendor.save()
+# Remember the stored state of a purchase order before it is overwritten.
+# A save that writes any of the state columns re-reads the row with a lock:
+# the instance may have been loaded before another writer changed it, and the
+# deltas have to be taken against what the UPDATE overwrites. The snapshot
+# taken when the instance was loaded (PurchaseOrder.from_db) only serves saves
+# whose update_fields leave the state columns alone.
+@receiver(pre_save, sender=PurchaseOrder)
+def capture_purchase_order_state(sender, instance, update_fields=None, **kwargs):
+  instance._previous_state = None
+  if instance._state.adding or instance.pk is None:
+    return
+  loaded = getattr(instance, '_loaded_values', {})
+  if update_fields is not None and not writes_state(update_fields) and all(field in loaded for field in STATE_FIELDS):
+    instance._previous_state = {field: loaded[field] for field in STATE_FIELDS}
+  else:
+    instance._previous_state = PurchaseOrder.objects.select_for_update().filter(pk=instance.pk).values(*STATE_FIELDS).first()
 
-# Update on time delivery rate
-def update_on_time_delivery_rate(purchase_order):
-  vendor = purchase_order.vendor
-  total_completed_orders = PurchaseOrder.objects.filter(vendor=vendor, status='completed').count()
-  on_time_deliveries = PurchaseOrder.objects.filter(vendor=vendor, status='completed', delivery_date__gte=F('completed_at')).count()
+def writes_state(update_fields):
+  return any(field in update_fields or field.removesuffix('_id') in update_fields for field in STATE_FIELDS)
 
-  on_time_delivery_rate = on_time_deliveries / total_completed_orders if total_completed_orders > 0 else 0.0
+# State written by a save, fields left out of update_fields keep their stored value
+def saved_state(instance, previous_state, update_fields):
+  state = po_state(instance)
+  if previous_state is not None and update_fields is not None:
+    for field in STATE_FIELDS:
+      if field not in update_fields and field.removesuffix('_id') not in update_fields:
+        state[field] = previous_state[field]
+  return state
 
-  vendor.on_time_delivery_rate = on_time_delivery_rate
-  vendor.save()
-
-# Update avg quality rating
-def update_vendor_quality_rating(vendor):
-  completed_pos = PurchaseOrder.objects.filter(vendor=vendor, status='completed', quality_rating__isnull=False)
-  average_rating = completed_pos.aggregate(Avg('quality_rating'))['quality_rating__avg']
-
-  if average_rating is not None:  # Handle cases where no completed orders with rating exist
-    vendor.quality_rating_avg = average_rating
-    vendor.save()
+# Main function
+@receiver(post_save, sender=PurchaseOrder)
+@timed_signal
+def handle_purchase_order_save(sender, instance, created, update_fields=None, **kwargs):
+  previous_state = getattr(instance, '_previous_state', None)
+  instance._previous_state = None
+  state = saved_state(instance, previous_state, update_fields)
+  instance._loaded_values = {**getattr(instance, '_loaded_values', {}), **state}
+  touched_vendor_ids = {instance.vendor_id, previous_state['vendor_id'] if previous_state else instance.vendor_id}
+  if state == previous_state:
+    # Only fields the metrics do not depend on changed (items, quantity, ...),
+    # the vendor's cached PO pages are stale all the same
+    for vendor_id in touched_vendor_ids:
+      invalidate_vendor(vendor_id)
+    return
+  deltas = metric_deltas(previous_state, state)
+  snapshot_vendor_ids = [instance.vendor_id] if state['status'] == 'completed' else []
+  results = update_vendor_metrics(deltas, snapshot_vendor_ids)
+  # The vendor's cached PO pages are stale even when its metrics did not change
+  for vendor_id in touched_vendor_ids - deltas.keys():
+    invalidate_vendor(vendor_id)
+  # Keep an already loaded vendor instance in sync with the database
+  if instance.vendor_id in results and PurchaseOrder.vendor.is_cached(instance):
+    for field, value in results[instance.vendor_id].items():
+      setattr(instance.vendor, field, value)
 
-# Update Vendor Metrics & Fulfillment rate
-def update_vendor_metrics(vendor):
-  total_pos = PurchaseOrder.objects.filter(vendor=vendor).count()
-  completed_pos = PurchaseOrder.objects.filter(vendor=vendor, status='completed').count()
-  fulfillment_rate = completed_pos / total_pos if total_pos > 0 else 0.0
+@receiver(post_delete, sender=PurchaseOrder)
+@timed_signal
+def handle_purchase_order_delete(sender, instance, origin=None, **kwargs):
+  if isinstance(origin, Vendor):  # The vendor and its counters are being deleted too
+    return
+  update_vendor_metrics(metric_deltas(po_state(instance), None))
 
-  vendor.fulfillment_rate = fulfillment_rate
-  vendor.save()
-  
-def update_historical_performance(vendor):
-  performance_record = HistoricalPerformance(
-    vendor=vendor,
-    on_time_delivery_rate=vendor.on_time_delivery_rate,
-    quality_rating_avg=vendor.quality_rating_avg,
-    average_response_time=vendor.average_response_time,
-    fulfillment_rate=vendor.fulfillment_rate
-  )
-  performance_record.save()
\ No newline at end of file
+# Apply per-vendor counter deltas and record snapshots for the given vendors.
+# In deferred mode the vendors are only queued for the metrics worker.
+def update_vendor_metrics(deltas, snapshot_vendor_ids=()):
+  if deferred_metrics():
+    enqueue_vendors(deltas, snapshot_vendor_ids)
+    for vendor_id in deltas:
+      invalidate_vendor(vendor_id)  # Cached PO pages, the metrics follow when the worker runs
+    return {}
+  results = {}
+  for vendor_id, vendor_deltas in deltas.items():
+    metrics = apply_metric_deltas(vendor_id, vendor_deltas)
+    if metrics is not None:
+      results[vendor_id] = metrics
+  for vendor_id in snapshot_vendor_ids:
+    record_historical_performance(vendor_id, results.get(vendor_id))  # Update Historical performance of vendor
+  return results
@@ -1,7 +1,9 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.utils import timezone
 from .models import PurchaseOrder
-from vendors.models import Vendor
+from vendors.models import Vendor, HistoricalPerformance
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.urls import reverse
@@ -9,6 +11,23 @@ from .models import PurchaseOrder
 from datetime import datetime, timedelta
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import StringIO
+import csv
+import gzip
+import json
+import os
+import tempfile
+from rest_framework.utils.encoders import JSONEncoder
+from .serializers import PurchaseOrderSerializer
+from .metrics import compute_vendor_counters
+from .transitions import apply_transitions
+from .metrics_queue import drain_batch, queue_stats
+from sequences import allocator
+from .query_plans import check_query_plans
+from .loadtest import run_load, run_reads, run_writes, percentile
+from vendors.models import HistoricalPerformanceRollup
 
 class PurchaseOrderModelTestCase(TestCase):
   def setUp(self):
@@ -35,6 +54,12 @@ class PurchaseOrderModelTestCase(TestCase):
     self.assertEqual(self.purchase_order.status, 'completed')
     self.assertIsNotNone(self.purchase_order.completed_at)
 
+  def test_po_number_after_explicit_number(self):
+    for po_number in ('PO-003', '', ''):
+      PurchaseOrder.objects.create(vendor=self.vendor, po_number=po_number, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1)
+    numbers = list(PurchaseOrder.objects.order_by('id').values_list('po_number', flat=True))
+    self.assertEqual(numbers, ['PO-001', 'PO-003', 'PO-004', 'PO-005'])
+
   def test_str_representation(self):
     """Test string representation of a PurchaseOrder instance."""
     expected_string = f"PurchaseOrder #{self.purchase_order.po_number}"
@@ -72,7 +97,135 @@ class PurchaseOrderListCreateViewTestCase(TestCase):
     url = reverse('pos-list-create')
     response = self.client.get(url)
     self.assertEqual(response.status_code, status.HTTP_200_OK)
-    self.assertEqual(len(response.data), 1)
+    self.assertEqual(len(response.data['results']), 1)
+
+  def test_cursor_pagination(self):
+    for _ in range(3):
+      PurchaseOrder.objects.create(vendor=self.vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1)
+    url = reverse('pos-list-create')
+    response = self.client.get(url, {'page_size': 2, 'ordering': '-issue_date'})
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    first_page = [po['po_number'] for po in response.data['results']]
+    self.assertEqual(first_page, ['PO-003', 'PO-002'])
+    response = self.client.get(response.data['next'])
+    self.assertEqual([po['po_number'] for po in response.data['results']], ['PO-001'])
+    self.assertIsNone(response.data['next'])
+
+    response = self.client.get(url, {'ordering': 'quantity'})
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+  def follow(self, params):
+    """Ids of every page reached through the next links, then back through the previous links."""
+    response = self.client.get(reverse('pos-list-create'), params)
+    pages = [[po['id'] for po in response.data['results']]]
+    while response.data['next']:
+      self.assertLess(len(pages), 100)
+      response = self.client.get(response.data['next'])
+      pages.append([po['id'] for po in response.data['results']])
+    backwards = [pages[-1]]
+    while response.data['previous']:
+      response = self.client.get(response.data['previous'])
+      backwards.insert(0, [po['id'] for po in response.data['results']])
+    self.assertEqual(backwards, pages)
+    return [pk for page in pages for pk in page]
+
+  def test_cursor_pagination_through_ties(self):
+    now = timezone.now()
+    PurchaseOrder.objects.bulk_create([
+      PurchaseOrder(vendor=self.vendor, po_number=f'PO-{n}', order_date=now, delivery_date=now, items={'item1': 1}, quantity=1)
+      for n in range(1310)  # More equal values than DRF's offset_cutoff (1000)
+    ])
+    PurchaseOrder.objects.update(issue_date=now)
+    ids = list(PurchaseOrder.objects.order_by('id').values_list('id', flat=True))
+    self.assertEqual(self.follow({'page_size': 100, 'ordering': 'issue_date'}), ids)
+    self.assertEqual(self.follow({'page_size': 100, 'ordering': '-issue_date'}), ids[::-1])
+
+  def test_cursor_pagination_through_nulls(self):
+    now = timezone.now()
+    PurchaseOrder.objects.bulk_create([
+      PurchaseOrder(vendor=self.vendor, po_number=f'PO-{n}', order_date=now, delivery_date=now, items={'item1': 1}, quantity=1,
+        quality_rating=None if n % 10 else n % 3)
+      for n in range(1300)
+    ])
+    rated = list(PurchaseOrder.objects.filter(quality_rating__isnull=False).order_by('quality_rating', 'id').values_list('id', flat=True))
+    unrated = list(PurchaseOrder.objects.filter(quality_rating__isnull=True).order_by('id').values_list('id', flat=True))
+    self.assertGreater(len(unrated), 1000)
+    # NULLs last ascending, first descending
+    self.assertEqual(self.follow({'page_size': 100, 'ordering': 'quality_rating'}), rated + unrated)
+    self.assertEqual(self.follow({'page_size': 100, 'ordering': '-quality_rating'}), unrated[::-1] + rated[::-1])
+    self.assertEqual(self.follow({'page_size': 500, 'ordering': 'completed_at'}), sorted(rated + unrated))
+
+  def test_sparse_fields(self):
+    for _ in range(2):
+      PurchaseOrder.objects.create(vendor=self.vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1)
+    url = reverse('pos-list-create')
+    with CaptureQueriesContext(connection) as queries:
+      response = self.client.get(url, {'fields': 'po_number,status', 'ordering': '-issue_date'})
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    self.assertEqual(response.data['results'][0], {'po_number': 'PO-002', 'status': 'pending'})
+    po_queries = [query['sql'] for query in queries.captured_queries if 'purchase_orders_purchaseorder' in query['sql']]
+    self.assertEqual(len(po_queries), 1)
+    self.assertNotIn('"items"', po_queries[0])
+
+    response = self.client.get(url, {'exclude': 'items'})
+    self.assertNotIn('items', response.data['results'][0])
+    self.assertIn('quantity', response.data['results'][0])
+    response = self.client.get(url, {'exclude': 'items', 'stream': 1})
+    data = json.loads(b''.join(response.streaming_content))
+    self.assertEqual(len(data), 2)
+    self.assertTrue(all('items' not in po and 'quantity' in po for po in data))
+    response = self.client.get(url, {'fields': 'po_number,bogus'})
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    self.assertIn('bogus', str(response.data['fields']))
+
+  def test_filters(self):
+    other = Vendor.objects.create(name='Other Vendor', mobile_number='1234567891', address='Other Address')
+    now = timezone.now()
+    pending = PurchaseOrder.objects.create(vendor=self.vendor, order_date=now - timedelta(days=10), delivery_date=now, items={'item1': 1}, quantity=1)
+    late = PurchaseOrder.objects.create(vendor=self.vendor, order_date=now - timedelta(days=5), delivery_date=now - timedelta(days=1), items={'item1': 1}, quantity=1,
+      status='completed', completed_at=now, quality_rating=2.0)
+    on_time = PurchaseOrder.objects.create(vendor=other, order_date=now, delivery_date=now + timedelta(days=1), items={'item1': 1}, quantity=1,
+      status='completed', completed_at=now, quality_rating=4.5)
+    url = reverse('pos-list-create')
+
+    def ids(**params):
+      response = self.client.get(url, params)
+      self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+      return [po['id'] for po in response.data['results']]
+
+    self.assertEqual(ids(vendor=self.vendor.pk), [pending.pk, late.pk])
+    self.assertEqual(ids(status='completed'), [late.pk, on_time.pk])
+    self.assertEqual(ids(status='pending,completed', vendor=other.pk), [on_time.pk])
+    self.assertEqual(ids(order_date_after=(now - timedelta(days=6)).isoformat(), ordering='-order_date'), [on_time.pk, late.pk])
+    self.assertEqual(ids(delivery_date_before=now.isoformat()), [pending.pk, late.pk])
+    self.assertEqual(ids(quality_rating_min=3), [on_time.pk])
+    self.assertEqual(ids(quality_rating_min=1, quality_rating_max=3, ordering='quality_rating'), [late.pk])
+    self.assertEqual(ids(late='true'), [late.pk])
+    self.assertEqual(ids(late='false', ordering='completed_at'), [on_time.pk])
+
+    response = self.client.get(url, {'status': 'shipped'})
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    self.assertIn('status', response.data)
+    response = self.client.get(url, {'order_date_after': 'yesterday'})
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+  def test_sparse_fields_detail(self):
+    po = PurchaseOrder.objects.create(vendor=self.vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1)
+    response = self.client.get(reverse('pos-retrieve-update-destroy', kwargs={'pk': po.pk}), {'fields': 'id,quantity'})
+    self.assertEqual(response.data, {'id': po.pk, 'quantity': 1})
+    self.assertIn('ETag', response)
+
+  def test_stream_purchase_orders(self):
+    for _ in range(3):
+      PurchaseOrder.objects.create(vendor=self.vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1)
+    url = reverse('pos-list-create')
+    response = self.client.get(url, {'stream': 1})
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    self.assertTrue(response.streaming)
+    data = json.loads(b''.join(response.streaming_content))
+    self.assertEqual([po['po_number'] for po in data], ['PO-001', 'PO-002', 'PO-003'])
+    expected = PurchaseOrderSerializer(PurchaseOrder.objects.order_by('id'), many=True).data
+    self.assertEqual(data, json.loads(json.dumps(expected, cls=JSONEncoder)))
 
 class PurchaseOrderRetrieveUpdateDestroyViewTestCase(TestCase):
   def setUp(self):
@@ -105,6 +258,26 @@ class PurchaseOrderRetrieveUpdateDestroyViewTestCase(TestCase):
     self.assertEqual(response.status_code, status.HTTP_200_OK)
     self.assertEqual(response.data['status'], 'completed')
 
+  def test_conditional_get(self):
+    url = reverse('pos-retrieve-update-destroy', kwargs={'pk': self.purchase_order.pk})
+    etag = self.client.get(url)['ETag']
+    self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=f'"other", W/{etag}').status_code, status.HTTP_304_NOT_MODIFIED)
+    self.client.post(reverse('pos-acknowledge', kwargs={'pk': self.purchase_order.pk}))
+    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    self.assertNotEqual(response['ETag'], etag)
+
+  def test_update_with_stale_if_match(self):
+    url = reverse('pos-retrieve-update-destroy', kwargs={'pk': self.purchase_order.pk})
+    etag = self.client.get(url)['ETag']
+    self.purchase_order.quantity = 5
+    self.purchase_order.save()
+    response = self.client.put(url, {'quantity': 2}, format='json', HTTP_IF_MATCH=etag)
+    self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+    response = self.client.put(url, {'quantity': 2}, format='json', HTTP_IF_MATCH=response['ETag'])
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    self.assertEqual(response.data['quantity'], 2)
+
   def test_delete_purchase_order(self):
     url = reverse('pos-retrieve-update-destroy', kwargs={'pk': self.purchase_order.pk})
     response = self.client.delete(url)
@@ -156,4 +329,467 @@ class PurchaseOrderCompletionViewTestCase(TestCase):
     url = reverse('pos-completion', kwargs={'pk': self.purchase_order.pk})
     response = self.client.post(url)
     self.assertEqual(response.status_code, status.HTTP_200_OK)
-    self.assertEqual(PurchaseOrder.objects.get(pk=self.purchase_order.pk).status, 'completed')
\ No newline at end of file
+    self.assertEqual(PurchaseOrder.objects.get(pk=self.purchase_order.pk).status, 'completed')
+
+  def test_complete_with_quality_rating_writes_once(self):
+    url = reverse('pos-completion', kwargs={'pk': self.purchase_order.pk})
+    with CaptureQueriesContext(connection) as queries:
+      response = self.client.post(url, {'quality_rating': 4}, format='json')
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    sql = [query['sql'] for query in queries.captured_queries]
+    self.assertEqual(len([q for q in sql if q.startswith('UPDATE "purchase_orders_purchaseorder"')]), 1)
+    self.assertEqual(len([q for q in sql if q.startswith('UPDATE "vendors_vendor" SET "total_pos"')]), 1)
+    self.assertEqual(HistoricalPerformance.objects.filter(vendor=self.vendor).count(), 1)
+    self.assertEqual(PurchaseOrder.objects.get(pk=self.purchase_order.pk).quality_rating, 4)
+
+class VendorMetricCountersTestCase(TestCase):
+  def setUp(self):
+    self.vendor = Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address')
+    self.now = timezone.now()
+
+  def create_po(self, **kwargs):
+    data = dict(vendor=self.vendor, order_date=self.now, delivery_date=self.now + timedelta(days=7), items={'item1': 1}, quantity=1)
+    data.update(kwargs)
+    return PurchaseOrder.objects.create(**data)
+
+  def test_counters_follow_state_transitions(self):
+    on_time = self.create_po()
+    late = self.create_po(delivery_date=self.now - timedelta(days=1))
+    self.create_po()
+    for po in (on_time, late):
+      po.acknowledgment_date = po.issue_date + timedelta(minutes=30)
+      po.status = 'acknowledged'
+      po.save()
+    on_time.quality_rating = 4
+    on_time.complete_order()
+    late.quality_rating = 2
+    late.complete_order()
+
+    self.vendor.refresh_from_db()
+    self.assertEqual(self.vendor.total_pos, 3)
+    self.assertEqual(self.vendor.completed_pos, 2)
+    self.assertEqual(self.vendor.on_time_pos, 1)
+    self.assertAlmostEqual(self.vendor.fulfillment_rate, 2 / 3)
+    self.assertAlmostEqual(self.vendor.on_time_delivery_rate, 0.5)
+    self.assertAlmostEqual(self.vendor.quality_rating_avg, 3)
+    self.assertAlmostEqual(self.vendor.average_response_time, 30)
+
+    expected = compute_vendor_counters(self.vendor.pk)
+    for field, value in expected.items():
+      self.assertAlmostEqual(getattr(self.vendor, field), value)
+
+  def test_delete_removes_contribution(self):
+    po = self.create_po(status='completed', completed_at=self.now)
+    self.create_po()
+    po.delete()
+    self.vendor.refresh_from_db()
+    self.assertEqual(self.vendor.total_pos, 1)
+    self.assertEqual(self.vendor.completed_pos, 0)
+    self.assertEqual(self.vendor.fulfillment_rate, 0)
+
+  def test_unrelated_changes_skip_metric_work(self):
+    po = self.create_po(status='completed', completed_at=self.now)
+    po = PurchaseOrder.objects.get(pk=po.pk)
+    po.quantity = 5
+    with CaptureQueriesContext(connection) as queries:
+      po.save(update_fields=['quantity'])
+    sql = [query['sql'] for query in queries.captured_queries]
+    self.assertEqual(len([q for q in sql if q.startswith('SELECT')]), 0)
+    self.assertEqual(len([q for q in sql if 'vendors_' in q]), 0)
+    # A full save re-reads the state it overwrites, the metrics are left alone all the same
+    po.quantity = 6
+    with CaptureQueriesContext(connection) as queries:
+      po.save()
+    self.assertEqual(len([query for query in queries.captured_queries if 'vendors_' in query['sql']]), 0)
+    self.assertEqual(HistoricalPerformance.objects.filter(vendor=self.vendor).count(), 1)
+
+    # Rows changed behind the instance's back are picked up by refresh_from_db()
+    PurchaseOrder.objects.filter(pk=po.pk).update(status='pending', completed_at=None)
+    Vendor.objects.filter(pk=self.vendor.pk).update(completed_pos=0)
+    po.refresh_from_db()
+    po.complete_order(quality_rating=5)
+    self.vendor.refresh_from_db()
+    self.assertEqual(self.vendor.completed_pos, 1)
+    self.assertEqual(self.vendor.quality_rating_count, 1)
+
+  def test_stale_instance_save_takes_deltas_from_stored_row(self):
+    po = self.create_po()
+    stale = PurchaseOrder.objects.get(pk=po.pk)
+    apply_transitions([{'id': po.pk, 'action': 'acknowledge'}])
+    self.vendor.refresh_from_db()
+    self.assertEqual(self.vendor.response_time_count, 1)
+    # Writes the pending state it was loaded with back over the acknowledgment
+    stale.quantity = 5
+    stale.save()
+    self.vendor.refresh_from_db()
+    expected = compute_vendor_counters(self.vendor.pk)
+    self.assertEqual(expected['response_time_count'], 0)
+    for field, value in expected.items():
+      self.assertAlmostEqual(getattr(self.vendor, field), value)
+
+  def test_reconcile_command_detects_and_fixes_drift(self):
+    self.create_po()
+    Vendor.objects.filter(pk=self.vendor.pk).update(total_pos=5)
+    with self.assertRaises(CommandError):
+      call_command('reconcile_vendor_metrics', stdout=StringIO())
+    version = Vendor.objects.get(pk=self.vendor.pk).version
+    call_command('reconcile_vendor_metrics', '--fix', stdout=StringIO())
+    self.vendor.refresh_from_db()
+    self.assertEqual(self.vendor.total_pos, 1)
+    self.assertEqual(self.vendor.version, version + 1)  # New ETag
+    call_command('reconcile_vendor_metrics', stdout=StringIO())
+
+  def test_rebuild_command_dry_run_and_repair(self):
+    po = self.create_po(status='completed', completed_at=self.now, quality_rating=4, acknowledgment_date=self.now + timedelta(minutes=90))
+    other = Vendor.objects.create(name='Other Vendor', mobile_number='1234567890', address='Test Address')
+    Vendor.objects.filter(pk__in=[self.vendor.pk, other.pk]).update(total_pos=7, quality_rating_avg=1, average_response_time=0, score=0)
+    out = StringIO()
+    call_command('rebuild_vendor_metrics', '--dry-run', '--chunk-size', '1', stdout=out)
+    self.assertIn(f'{self.vendor.vendor_code}: total_pos stored=7 expected=1', out.getvalue())
+    self.assertIn(f'{other.vendor_code}: total_pos stored=7 expected=0', out.getvalue())
+    self.assertIn('2 vendor(s) checked', out.getvalue())
+    self.assertEqual(Vendor.objects.get(pk=self.vendor.pk).total_pos, 7)
+
+    # Only the requested id range is rebuilt
+    call_command('rebuild_vendor_metrics', '--start-id', str(other.pk), stdout=StringIO())
+    self.assertEqual(Vendor.objects.get(pk=other.pk).total_pos, 0)
+    self.assertEqual(Vendor.objects.get(pk=self.vendor.pk).total_pos, 7)
+
+    call_command('rebuild_vendor_metrics', stdout=StringIO())
+    self.vendor.refresh_from_db()
+    self.assertEqual(self.vendor.total_pos, 1)
+    self.assertAlmostEqual(self.vendor.quality_rating_avg, 4)
+    self.assertAlmostEqual(self.vendor.average_response_time, (po.acknowledgment_date - po.issue_date).total_seconds() / 60)
+    self.assertGreater(self.vendor.score, 0)
+    out = StringIO()
+    call_command('rebuild_vendor_metrics', '--dry-run', stdout=out)
+    self.assertIn('0 would be rebuilt', out.getvalue())
+
+    # Right counters and metrics, stale score
+    score = self.vendor.score
+    Vendor.objects.filter(pk=self.vendor.pk).update(score=0)
+    out = StringIO()
+    call_command('rebuild_vendor_metrics', '--dry-run', stdout=out)
+    self.assertIn(f'{self.vendor.vendor_code}: score stored=0.0 expected=', out.getvalue())
+    self.assertIn('1 would be rebuilt', out.getvalue())
+    call_command('rebuild_vendor_metrics', stdout=StringIO())
+    self.assertAlmostEqual(Vendor.objects.get(pk=self.vendor.pk).score, score)
+
+
+@override_settings(VENDOR_METRICS_MODE='deferred')
+class DeferredMetricsQueueTestCase(TestCase):
+  def setUp(self):
+    self.vendor = Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address')
+
+  def tearDown(self):
+    allocator.reset()  # Blocks published by the executed on_commit callbacks
+
+  def test_writes_are_coalesced_per_vendor(self):
+    with self.captureOnCommitCallbacks(execute=True):
+      for _ in range(3):
+        PurchaseOrder.objects.create(vendor=self.vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1, status='completed', completed_at=timezone.now())
+    self.vendor.refresh_from_db()
+    self.assertEqual(self.vendor.total_pos, 0)
+    self.assertEqual(queue_stats()['depth'], 1)
+
+    self.assertEqual(drain_batch(), 1)
+    self.vendor.refresh_from_db()
+    self.assertEqual(self.vendor.total_pos, 3)
+    self.assertEqual(self.vendor.fulfillment_rate, 1)
+    self.assertEqual(HistoricalPerformance.objects.filter(vendor=self.vendor).count(), 1)
+    self.assertEqual(queue_stats(), {'depth': 0, 'oldest_enqueued_at': None, 'lag_seconds': 0.0})
+
+  def test_worker_command_drains_queue(self):
+    with self.captureOnCommitCallbacks(execute=True):
+      PurchaseOrder.objects.create(vendor=self.vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1)
+    out = StringIO()
+    call_command('process_metrics_queue', '--once', stdout=out)
+    self.assertIn('Recomputed 1 vendor(s).', out.getvalue())
+    self.assertEqual(Vendor.objects.get(pk=self.vendor.pk).total_pos, 1)
+
+
+class PurchaseOrderBulkCreateViewTestCase(TestCase):
+  def setUp(self):
+    self.client = APIClient()
+    self.vendor = Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address')
+    self.user = User.objects.create(username='testuser', password='testpassword')
+    self.token = Token.objects.create(user=self.user)
+    self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+    self.url = reverse('pos-bulk-create')
+
+  def po_data(self, **kwargs):
+    data = {'vendor': self.vendor.pk, 'order_date': timezone.now(), 'delivery_date': timezone.now() + timedelta(days=7), 'items': {'item1': 1}, 'quantity': 1}
+    data.update(kwargs)
+    return data
+
+  def test_bulk_create(self):
+    PurchaseOrder.objects.create(**dict(self.po_data(), vendor=self.vendor))
+    data = [self.po_data() for _ in range(20)] + [self.po_data(status='completed')]
+    response = self.client.post(self.url, data, format='json')
+    self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+    self.assertEqual(response.data['created'], 21)
+    self.assertEqual(response.data['data'][0]['po_number'], 'PO-002')
+    self.assertEqual(response.data['data'][-1]['po_number'], 'PO-022')
+    self.vendor.refresh_from_db()
+    self.assertEqual(self.vendor.total_pos, 22)
+    self.assertEqual(self.vendor.completed_pos, 1)
+    self.assertEqual(HistoricalPerformance.objects.filter(vendor=self.vendor).count(), 1)
+
+  def test_bulk_create_reports_item_errors(self):
+    data = [self.po_data(), {'vendor': self.vendor.pk}, self.po_data()]
+    response = self.client.post(self.url, data, format='json')
+    self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+    self.assertEqual(response.data['created'], 2)
+    self.assertEqual([error['index'] for error in response.data['errors']], [1])
+    self.assertEqual(PurchaseOrder.objects.count(), 2)
+
+  def test_bulk_create_atomic(self):
+    data = [self.po_data(), {'vendor': self.vendor.pk}]
+    response = self.client.post(f'{self.url}?atomic=1', data, format='json')
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    self.assertEqual(PurchaseOrder.objects.count(), 0)
+
+
+class PurchaseOrderBulkTransitionViewTestCase(TestCase):
+  def setUp(self):
+    self.client = APIClient()
+    self.vendor = Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address')
+    self.user = User.objects.create(username='testuser', password='testpassword')
+    self.token = Token.objects.create(user=self.user)
+    self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+    self.url = reverse('pos-bulk-transition')
+    self.pos = [
+      PurchaseOrder.objects.create(vendor=self.vendor, order_date=timezone.now(), delivery_date=timezone.now() + timedelta(days=7), items={'item1': 1}, quantity=1)
+      for _ in range(5)
+    ]
+
+  def test_bulk_transitions(self):
+    ids = [po.pk for po in self.pos]
+    data = [{'id': pk, 'action': 'acknowledge'} for pk in ids]
+    data += [{'id': pk, 'action': 'complete', 'quality_rating': 4} for pk in ids[:3]]
+    data += [{'id': ids[3], 'action': 'cancel'}]
+    with CaptureQueriesContext(connection) as queries:
+      response = self.client.post(self.url, data, format='json')
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    self.assertEqual(response.data['applied'], 9)
+    # One UPDATE per distinct new state, one counter update and one snapshot for the vendor
+    sql = [query['sql'] for query in queries.captured_queries]
+    self.assertEqual(sum(1 for q in sql if q.startswith('UPDATE "purchase_orders_purchaseorder"')), 3)
+    self.assertEqual(sum(1 for q in sql if q.startswith('UPDATE "vendors_vendor" SET "total_pos"')), 1)
+    self.assertEqual(sum(1 for q in sql if q.startswith('INSERT INTO "vendors_historicalperformance"')), 1)
+    self.assertEqual(
+      dict(PurchaseOrder.objects.values_list('pk', 'status')),
+      {ids[0]: 'completed', ids[1]: 'completed', ids[2]: 'completed', ids[3]: 'cancelled', ids[4]: 'acknowledged'},
+    )
+    self.assertEqual(PurchaseOrder.objects.get(pk=ids[0]).version, 2)
+    self.vendor.refresh_from_db()
+    self.assertEqual(self.vendor.completed_pos, 3)
+    self.assertEqual(self.vendor.quality_rating_avg, 4)
+    self.assertEqual(self.vendor.response_time_count, 5)
+    self.assertAlmostEqual(self.vendor.fulfillment_rate, 3 / 5)
+    self.assertEqual(HistoricalPerformance.objects.filter(vendor=self.vendor).count(), 1)
+    expected = compute_vendor_counters(self.vendor.pk)
+    for field, value in expected.items():
+      self.assertAlmostEqual(getattr(self.vendor, field), value)
+
+  def test_bulk_transitions_report_rejected_items(self):
+    data = [
+      {'id': self.pos[0].pk, 'action': 'acknowledge'},
+      {'id': self.pos[1].pk, 'action': 'complete'},
+      {'id': 0, 'action': 'cancel'},
+    ]
+    response = self.client.post(self.url, data, format='json')
+    self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+    self.assertEqual(response.data['applied'], 1)
+    self.assertEqual([result.get('error') for result in response.data['results']], [None, 'Purchase order is not acknowledged.', 'Purchase order not found'])
+    self.assertIsNotNone(PurchaseOrder.objects.get(pk=self.pos[0].pk).acknowledgment_date)
+
+  def test_bulk_transitions_atomic(self):
+    data = [{'id': self.pos[0].pk, 'action': 'acknowledge'}, {'id': self.pos[0].pk, 'action': 'acknowledge'}]
+    response = self.client.post(f'{self.url}?atomic=1', data, format='json')
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    self.assertEqual(response.data['results'][1]['error'], 'Purchase order already acknowledged')
+    self.assertIsNone(PurchaseOrder.objects.get(pk=self.pos[0].pk).acknowledgment_date)
+
+  def test_bulk_transitions_validation(self):
+    data = [{'id': self.pos[0].pk, 'action': 'ship'}, {'id': self.pos[1].pk, 'action': 'cancel', 'quality_rating': 3}]
+    response = self.client.post(self.url, data, format='json')
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    self.assertEqual([error['index'] for error in response.data['errors']], [0, 1])
+
+
+class ImportCommandTestCase(TestCase):
+  def setUp(self):
+    self.dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self.dir.cleanup)
+
+  def tearDown(self):
+    allocator.reset()
+
+  def write(self, name, content):
+    path = os.path.join(self.dir.name, name)
+    with open(path, 'w') as f:
+      f.write(content)
+    return path
+
+  def po_line(self, vendor_code, **kwargs):
+    data = {'vendor_code': vendor_code, 'order_date': '2024-01-01T00:00:00Z', 'delivery_date': '2024-01-08T00:00:00Z', 'items': {'item1': 1}, 'quantity': 1,
+            'status': 'completed', 'acknowledgment_date': '2024-01-01T01:00:00Z', 'completed_at': '2024-01-05T00:00:00Z', 'quality_rating': 4}
+    data.update(kwargs)
+    return json.dumps(data) + '\n'
+
+  def test_import(self):
+    vendors = self.write('vendors.csv', 'vendor_code,name,mobile_number,address,email\nVN010,Acme,1234567890,Somewhere,acme@example.com\n,Globex,1234567890,Elsewhere,\nVN011,Bad,12,Nowhere,\n')
+    pos = self.write('pos.jsonl', self.po_line('VN010', po_number='PO-100') + self.po_line('VN010', status='pending', acknowledgment_date=None, completed_at=None, quality_rating=None) + self.po_line('VN999'))
+    out, err = StringIO(), StringIO()
+    call_command('import_vms', vendors=vendors, purchase_orders=pos, batch_size=1, stdout=out, stderr=err)
+    self.assertIn('Imported 2 vendors', out.getvalue())
+    self.assertIn('Imported 2 purchase orders, rebuilt the metrics of 1 vendors', out.getvalue())
+    self.assertIn('record 3: mobile_number', err.getvalue())
+    self.assertIn('record 3: vendor_code: Unknown vendor code.', err.getvalue())
+    self.assertEqual(Vendor.objects.get(name='Globex').vendor_code, 'VN011')
+    acme = Vendor.objects.get(vendor_code='VN010')
+    self.assertEqual((acme.total_pos, acme.completed_pos, acme.on_time_pos, acme.quality_rating_avg), (2, 1, 1, 4))
+    self.assertAlmostEqual(acme.average_response_time, 60)
+    self.assertEqual(HistoricalPerformance.objects.filter(vendor=acme).count(), 1)
+    self.assertEqual(HistoricalPerformanceRollup.objects.filter(vendor=acme).count(), 3)
+    self.assertEqual(PurchaseOrder.objects.get(po_number='PO-100').issue_date, datetime.fromisoformat('2024-01-01T00:00:00+00:00'))
+    self.assertEqual(PurchaseOrder.objects.exclude(po_number='PO-100').get().po_number, 'PO-101')
+    self.assertEqual(Vendor.objects.create(name='Next', mobile_number='1234567890', address='Test').vendor_code, 'VN012')
+
+  def test_resume_from_checkpoint(self):
+    Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address', vendor_code='VN001')
+    lines = [self.po_line('VN001') for _ in range(5)]
+    broken = self.write('broken.jsonl', ''.join(lines[:3]) + self.po_line('VN001', quantity='many') + lines[4])
+    with self.assertRaises(CommandError):
+      call_command('import_vms', purchase_orders=broken, batch_size=2, checkpoint='onboarding', max_errors=0, stdout=StringIO(), stderr=StringIO())
+    self.assertEqual(PurchaseOrder.objects.count(), 2)
+
+    fixed = self.write('fixed.jsonl', ''.join(lines))
+    out = StringIO()
+    call_command('import_vms', purchase_orders=fixed, batch_size=2, checkpoint='onboarding', stdout=out, stderr=StringIO())
+    self.assertIn('Imported 3 purchase orders', out.getvalue())
+    self.assertEqual(PurchaseOrder.objects.count(), 5)
+    self.assertEqual(Vendor.objects.get(vendor_code='VN001').total_pos, 5)
+
+
+class ExportTestCase(TestCase):
+  def setUp(self):
+    self.client = APIClient()
+    self.vendor = Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address')
+    self.other = Vendor.objects.create(name='Other Vendor', mobile_number='1234567890', address='Test Address')
+    self.user = User.objects.create(username='testuser', password='testpassword')
+    self.token = Token.objects.create(user=self.user)
+    self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+    for vendor in (self.vendor, self.vendor, self.other):
+      PurchaseOrder.objects.create(vendor=vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1, 'note': 'a,b'}, quantity=1, status='completed', completed_at=timezone.now(), quality_rating=4)
+    PurchaseOrder.objects.create(vendor=self.vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1)
+
+  def test_export_csv(self):
+    response = self.client.get(reverse('pos-export'), {'vendor': self.vendor.pk, 'status': 'completed'})
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    self.assertEqual(response['Content-Type'], 'text/csv')
+    self.assertIn('filename="purchase_orders.csv"', response['Content-Disposition'])
+    rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+    self.assertEqual(len(rows), 2)
+    po = PurchaseOrder.objects.filter(vendor=self.vendor).order_by('id').first()
+    api = self.client.get(reverse('pos-retrieve-update-destroy', kwargs={'pk': po.pk})).data
+    self.assertEqual(json.loads(rows[0]['items']), api['items'])
+    self.assertEqual(rows[0]['order_date'], api['order_date'])
+    self.assertEqual(rows[0]['vendor'], str(self.vendor.pk))
+    self.assertEqual(rows[0]['acknowledgment_date'], '')
+
+  def test_export_ndjson_gzip(self):
+    response = self.client.get(reverse('pos-export'), {'output': 'ndjson', 'compress': 'gzip'})
+    self.assertEqual(response['Content-Type'], 'application/gzip')
+    self.assertIn('filename="purchase_orders.ndjson.gz"', response['Content-Disposition'])
+    lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+    self.assertEqual([json.loads(line)['id'] for line in lines], list(PurchaseOrder.objects.order_by('id').values_list('id', flat=True)))
+
+  def test_export_historical_performance(self):
+    response = self.client.get(reverse('vendor-historical-export'), {'vendor': self.other.pk, 'output': 'ndjson'})
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    self.assertEqual(len(lines), 1)
+    self.assertEqual(json.loads(lines[0])['quality_rating_avg'], 4)
+
+  def test_export_invalid_parameters(self):
+    self.assertEqual(self.client.get(reverse('pos-export'), {'output': 'xml'}).status_code, status.HTTP_400_BAD_REQUEST)
+    self.assertEqual(self.client.get(reverse('pos-export'), {'status': 'lost'}).status_code, status.HTTP_400_BAD_REQUEST)
+    self.assertEqual(self.client.get(reverse('vendor-historical-export'), {'date_after': 'soon'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+  def test_export_command(self):
+    out = StringIO()
+    call_command('export_vms', 'purchase_orders', '--output', 'ndjson', '--filter', 'status=pending', stdout=out)
+    self.assertEqual([json.loads(line)['status'] for line in out.getvalue().splitlines()], ['pending'])
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'history.csv.gz')
+      call_command('export_vms', 'historical_performance', '--gzip', '-o', path)
+      with gzip.open(path, 'rt') as f:
+        self.assertEqual(len(list(csv.DictReader(f))), 3)
+    with self.assertRaises(CommandError):
+      call_command('export_vms', 'purchase_orders', '--filter', 'colour=red')
+
+
+class QueryPlanTestCase(TestCase):
+  def test_hot_queries_use_indexes(self):
+    vendor = Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address')
+    po = PurchaseOrder.objects.create(vendor=vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1)
+    for label, plan, scans in check_query_plans(vendor.pk, po.pk):
+      self.assertEqual(scans, [], f'{label}:\n{plan}')
+
+  def test_benchmark_command(self):
+    out = StringIO()
+    call_command('benchmark_query_plans', '--vendors', '3', '--pos', '200', stdout=out)
+    self.assertIn('All hot queries use an index.', out.getvalue())
+    self.assertEqual(PurchaseOrder.objects.count(), 200)
+    self.assertEqual(sum(Vendor.objects.values_list('total_pos', flat=True)), 200)
+
+  def test_serializer_benchmark_command(self):
+    out = StringIO()
+    call_command('benchmark_serializers', '--rows', '50', '--repeat', '1', stdout=out)
+    self.assertIn('Byte-identical output', out.getvalue())
+
+
+class SeedAndLoadTestCase(TransactionTestCase):
+  def test_seed_command(self):
+    out = StringIO()
+    call_command('seed_vms', '--vendors', '3', '--pos', '150', '--history', '10', stdout=out)
+    self.assertEqual(Vendor.objects.count(), 3)
+    self.assertEqual(PurchaseOrder.objects.count(), 150)
+    self.assertEqual(HistoricalPerformance.objects.count(), 30)
+    self.assertEqual(HistoricalPerformanceRollup.objects.filter(resolution='day').count(), 30)
+    self.assertEqual(sum(Vendor.objects.values_list('total_pos', flat=True)), 150)
+
+  def test_run_load(self):
+    call_command('seed_vms', '--vendors', '2', '--pos', '50', stdout=StringIO())
+    # One client: busy_timeout does not cover the shared-cache table locks of the in-memory test database
+    report = run_load(clients=1, requests=40)
+    self.assertEqual(report['total']['requests'], 40)
+    self.assertEqual(report['total']['errors'], 0, report)
+    self.assertLessEqual(set(report['endpoints']), {'list', 'detail', 'performance', 'acknowledge', 'complete', 'create'})
+    for stats in report['endpoints'].values():
+      self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+      self.assertLessEqual(stats['p95_ms'], stats['p99_ms'])
+    self.assertEqual(sum(Vendor.objects.values_list('total_pos', flat=True)), PurchaseOrder.objects.count())
+
+  def test_run_reads(self):
+    call_command('seed_vms', '--vendors', '2', '--pos', '50', '--history', '5', stdout=StringIO())
+    for mode in ('sync', 'async'):
+      report = run_reads(clients=2, requests=30, mode=mode)
+      self.assertEqual(report['total']['requests'], 30)
+      self.assertEqual(report['total']['errors'], 0, report)
+
+  def test_run_writes(self):
+    report = run_writes(writers=1, writes=5)
+    self.assertEqual(report['writes'], 5)
+    self.assertEqual(report['errors'], 0, report)
+    self.assertLessEqual(report['p50_ms'], report['p99_ms'])
+    # The benchmark vendor and its purchase orders are removed afterwards
+    self.assertFalse(Vendor.objects.exists())
+    self.assertFalse(PurchaseOrder.objects.exists())
+
+  def test_percentile(self):
+    values = list(range(1, 101))
+    self.assertEqual(percentile(values, 50), 50)
+    self.assertEqual(percentile(values, 99), 99)
+    self.assertEqual(percentile([], 95), 0.0)
@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from vendors.cache import invalidate_vendor
+from .metrics import STATE_FIELDS, metric_deltas, merge_metric_deltas
+from .models import PurchaseOrder
+from .signals import update_vendor_metrics
+
+# Batched acknowledge / complete / cancel
+#
+# The per-PO views load, save and recompute the vendor metrics once per
+# purchase order. apply_transitions() checks a whole batch against the same
+# rules in memory, writes the changed purchase orders with one UPDATE per
+# distinct set of new values, then applies the merged counter deltas and
+# records a HistoricalPerformance snapshot once per affected vendor.
+
+ACTIONS = ('acknowledge', 'complete', 'cancel')
+
+# Columns a transition writes
+TRANSITION_FIELDS = ('status', 'acknowledgment_date', 'completed_at', 'quality_rating')
+
+# Same checks and messages as PurchaseOrderAcknowledgeView, PurchaseOrderCompletionView
+# and PurchaseOrderCancellationView. Returns the error or applies the transition to state.
+def transition(state, action, now, quality_rating=None):
+  if action == 'acknowledge':
+    if state['acknowledgment_date']:
+      return 'Purchase order already acknowledged'
+    state.update(acknowledgment_date=now, status='acknowledged')
+  elif action == 'complete':
+    if state['acknowledgment_date'] is None:
+      return 'Purchase order is not acknowledged.'
+    if state['status'] == 'completed':
+      return 'Purchase order already completed.'
+    if quality_rating is not None:
+      state['quality_rating'] = quality_rating
+    state.update(status='completed', completed_at=now)
+  elif action == 'cancel':
+    if state['acknowledgment_date'] is None:
+      return 'Purchase order is not acknowledged.'
+    if state['status'] == 'completed':
+      return 'Purchase order is completed.'
+    if state['status'] == 'cancelled':
+      return 'Purchase order already cancelled.'
+    state.update(status='cancelled', completed_at=now)
+  return None
+
+def apply_transitions(items, atomic=False):
+  """Apply validated {id, action, quality_rating} items in order.
+
+  Returns one result per item: {index, id, action, ok} plus `error` for the
+  rejected ones. Items of the same purchase order see each other's effect
+  (acknowledge then complete works). With atomic, nothing is written when any
+  item is rejected.
+  """
+  now = timezone.now()
+  with transaction.atomic():
+    ids = {item['id'] for item in items}
+    stored = {
+      row['id']: row
+      for row in PurchaseOrder.objects.select_for_update().filter(pk__in=ids).values('id', *STATE_FIELDS)
+    }
+    states = {pk: dict(row) for pk, row in stored.items()}
+    results = []
+    for index, item in enumerate(items):
+      result = {'index': index, 'id': item['id'], 'action': item['action'], 'ok': True}
+      state = states.get(item['id'])
+      error = 'Purchase order not found' if state is None else transition(state, item['action'], now, item.get('quality_rating'))
+      if error:
+        result.update(ok=False, error=error)
+      results.append(result)
+    if atomic and not all(result['ok'] for result in results):
+      return results
+    write_states(stored, states, now)
+  return results
+
+# One UPDATE per distinct set of changed values, then the vendor counters
+def write_states(stored, states, now):
+  groups = {}
+  deltas = {}
+  snapshot_vendor_ids = set()
+  touched_vendor_ids = set()
+  for pk, state in states.items():
+    changes = {field: state[field] for field in TRANSITION_FIELDS if state[field] != stored[pk][field]}
+    if not changes:
+      continue
+    groups.setdefault(tuple(sorted(changes.items())), []).append(pk)
+    merge_metric_deltas(deltas, metric_deltas(stored[pk], state))
+    touched_vendor_ids.add(state['vendor_id'])
+    if state['status'] == 'completed':
+      snapshot_vendor_ids.add(state['vendor_id'])
+  for changes, pks in groups.items():
+    PurchaseOrder.objects.filter(pk__in=pks).update(**dict(changes), version=F('version') + 1, updated_at=now)
+  update_vendor_metrics(deltas, sorted(snapshot_vendor_ids))
+  # Cached PO pages of vendors whose counters did not move (e.g. cancellations)
+  for vendor_id in touched_vendor_ids - deltas.keys():
+    invalidate_vendor(vendor_id)
@@ -3,6 +3,9 @@ from .views import *
 
 urlpatterns = [
   path('', PurchaseOrderListCreateView.as_view(), name='pos-list-create'),
+  path('export/', PurchaseOrderExportView.as_view(), name='pos-export'),
+  path('bulk/', PurchaseOrderBulkCreateView.as_view(), name='pos-bulk-create'),
+  path('transitions/', PurchaseOrderBulkTransitionView.as_view(), name='pos-bulk-transition'),
   path('<int:pk>/', PurchaseOrderRetrieveUpdateDestroyView.as_view(), name='pos-retrieve-update-destroy'),
   path('<int:pk>/acknowledge/',PurchaseOrderAcknowledgeView.as_view(), name='pos-acknowledge'),
   path('<int:pk>/complete/',PurchaseOrderCompletionView.as_view(), name='pos-completion'),
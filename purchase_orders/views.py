@@ -2,19 +2,48 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from .models import PurchaseOrder
-from .serializers import PurchaseOrderSerializer
+from .serializers import PurchaseOrderSerializer, PurchaseOrderTransitionSerializer
+from .transitions import apply_transitions
+from .filters import PurchaseOrderFilter
 from django.utils import timezone
+from django.db import transaction
+from vms.pagination import KeysetPagination, wants_stream, streaming_response
+from vms.fast_serializers import FastSerializer
+from vms.conditional import ETAG_FIELDS, etag, not_modified, precondition_failed, with_etag
+from vms.exports import export_options, export_response
 
 # api/purchase_orders
 class PurchaseOrderListCreateView(APIView):
-    # GET Request to fetch all Purchase Orders
+    # Orderings on indexed columns, id breaks ties. NULL quality ratings and
+    # completion dates sort last, or first with a descending ordering (vms.pagination)
+    cursor_orderings = {
+        'id': ('id',),
+        'issue_date': ('issue_date', 'id'),
+        'order_date': ('order_date', 'id'),
+        'delivery_date': ('delivery_date', 'id'),
+        'quality_rating': ('quality_rating', 'id'),
+        'completed_at': ('completed_at', 'id'),
+    }
+
+    # GET Request to fetch Purchase Orders, one page at a time
     # Headers - Authorization : Token {auth_token}
-    # Usage : GET http://localhost:5000/api/purchase_orders
+    # Usage : GET http://localhost:5000/api/purchase_orders?page_size=100&ordering=-issue_date
+    #         GET http://localhost:5000/api/purchase_orders?stream=1 (whole table as a streamed JSON array)
+    #         GET http://localhost:5000/api/purchase_orders?fields=id,po_number,status (or ?exclude=items)
+    #         GET http://localhost:5000/api/purchase_orders?vendor=1&status=pending,acknowledged&late=true&quality_rating_min=3
+    #             &order_date_after=2024-01-01&order_date_before=2024-02-01 (also delivery_date_*, issue_date_*)
     def get(self, request):
-        # Retrieve all purchase orders
-        purchase_orders = PurchaseOrder.objects.all()
-        serializer = PurchaseOrderSerializer(purchase_orders, many=True)
-        return Response(serializer.data)
+        paginator = KeysetPagination()
+        filterset = PurchaseOrderFilter(request.query_params, queryset=PurchaseOrder.objects.all())
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        # Read-only fast path: values() rows instead of model instances, same output as PurchaseOrderSerializer
+        serializer = FastSerializer(PurchaseOrderSerializer, PurchaseOrderSerializer.sparse_fields(request))
+        rows = serializer.values(filterset.qs, paginator.get_ordering(request, None, self))
+        if wants_stream(request):
+            return streaming_response(paginator.get_ordered_queryset(rows, request, self), serializer)
+        page = paginator.paginate_queryset(rows, request, view=self)
+        return paginator.get_paginated_response(serializer.serialize(page))
     
     # POST Request to create a new Purchase Order
     # Headers - Authorization : Token {auth_token}
@@ -28,39 +57,127 @@ class PurchaseOrderListCreateView(APIView):
             return Response(res, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# api/purchase_orders/export
+class PurchaseOrderExportView(APIView):
+    columns = (
+        'id', 'po_number', 'vendor', 'order_date', 'delivery_date', 'items', 'quantity', 'status',
+        'quality_rating', 'issue_date', 'acknowledgment_date', 'completed_at',
+    )
+
+    # GET Request to download Purchase Orders as CSV or NDJSON, streamed, same filters as GET api/purchase_orders
+    # Headers - Authorization : Token {auth_token}
+    # Usage : GET http://localhost:5000/api/purchase_orders/export/?output=csv|ndjson[&compress=gzip][&vendor=1&status=completed&order_date_after=2024-01-01]
+    def get(self, request):
+        try:
+            fmt, compress = export_options(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        filterset = PurchaseOrderFilter(request.query_params, queryset=PurchaseOrder.objects.order_by('id'))
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        return export_response(filterset.qs, self.columns, fmt, 'purchase_orders', compress)
+
+# api/purchase_orders/bulk
+class PurchaseOrderBulkCreateView(APIView):
+    max_batch_size = 10000
+
+    # POST Request to create many Purchase Orders in one transaction
+    # Headers - Authorization : Token {auth_token}
+    # Usage : POST http://localhost:5000/api/purchase_orders/bulk/ [list of purchase orders]
+    #         POST http://localhost:5000/api/purchase_orders/bulk/?atomic=1 (reject the whole batch on any error)
+    def post(self, request):
+        if not isinstance(request.data, list) or not request.data:
+            return Response({"message": "Expected a non-empty list of purchase orders."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.max_batch_size:
+            return Response({"message": f"At most {self.max_batch_size} purchase orders per request."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = PurchaseOrderSerializer(data=request.data, many=True)
+        errors = []
+        if not serializer.is_valid():
+            errors = [{"index": index, "errors": item_errors} for index, item_errors in enumerate(serializer.errors) if item_errors]
+            atomic = request.query_params.get('atomic') in ('1', 'true')
+            valid_items = [item for item, item_errors in zip(request.data, serializer.errors) if not item_errors]
+            if atomic or not valid_items:
+                return Response({"message": "No purchase orders created.", "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+            serializer = PurchaseOrderSerializer(data=valid_items, many=True)
+            serializer.is_valid(raise_exception=True)
+        serializer.save()
+        res = {"message": "Created Successfully!", "created": len(serializer.data), "data": serializer.data, "errors": errors}
+        return Response(res, status=status.HTTP_207_MULTI_STATUS if errors else status.HTTP_201_CREATED)
+
+# api/purchase_orders/transitions
+class PurchaseOrderBulkTransitionView(APIView):
+    max_batch_size = 10000
+
+    # POST Request to acknowledge, complete or cancel many Purchase Orders in one transaction
+    # Vendor metrics are updated and snapshotted once per vendor instead of once per purchase order
+    # Headers - Authorization : Token {auth_token}
+    # Usage : POST http://localhost:5000/api/purchase_orders/transitions/ [{"id": 1, "action": "complete", "quality_rating": 4}, ...]
+    #         POST http://localhost:5000/api/purchase_orders/transitions/?atomic=1 (apply nothing when any transition is rejected)
+    def post(self, request):
+        if not isinstance(request.data, list) or not request.data:
+            return Response({"message": "Expected a non-empty list of transitions."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.max_batch_size:
+            return Response({"message": f"At most {self.max_batch_size} transitions per request."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = PurchaseOrderTransitionSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            errors = [{"index": index, "errors": item_errors} for index, item_errors in enumerate(serializer.errors) if item_errors]
+            return Response({"message": "No transitions applied.", "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        atomic = request.query_params.get('atomic') in ('1', 'true')
+        results = apply_transitions(serializer.validated_data, atomic=atomic)
+        applied = sum(1 for result in results if result['ok'])
+        if atomic and applied < len(results):
+            applied = 0
+        res = {"applied": applied, "results": results}
+        if not applied:
+            return Response(res, status=status.HTTP_400_BAD_REQUEST)
+        return Response(res, status=status.HTTP_207_MULTI_STATUS if applied < len(results) else status.HTTP_200_OK)
+
 # api/purchase_orders/{id}
 class PurchaseOrderRetrieveUpdateDestroyView(APIView):
-    def get_object(self, pk):
+    def get_object(self, pk, for_update=False, queryset=None):
         try:
-            return PurchaseOrder.objects.get(pk=pk)
+            purchase_orders = queryset if queryset is not None else PurchaseOrder.objects.all()
+            if for_update:
+                purchase_orders = purchase_orders.select_for_update()
+            return purchase_orders.get(pk=pk)
         except PurchaseOrder.DoesNotExist:
             return None
         
     # GET Request to fetch Purchase Order using ID
     # Headers - Authorization : Token {auth_token}
-    # Usage : GET http://localhost:5000/api/purchase_orders/{id}/
+    #           If-None-Match : {etag} (optional, 304 when unchanged)
+    # Usage : GET http://localhost:5000/api/purchase_orders/{id}/[?fields=id,status]
     def get(self, request, pk):
         # Fetch purchase order by ID
-        purchase_order = self.get_object(pk)
+        fields = PurchaseOrderSerializer.sparse_fields(request)
+        purchase_order = self.get_object(pk, queryset=PurchaseOrderSerializer.narrow_queryset(PurchaseOrder.objects.all(), fields, ETAG_FIELDS))
         if purchase_order:
-            serializer = PurchaseOrderSerializer(purchase_order)
-            return Response(serializer.data)
+            unchanged = not_modified(request, etag(purchase_order))
+            if unchanged:
+                return unchanged
+            serializer = PurchaseOrderSerializer(purchase_order, fields=fields)
+            return with_etag(Response(serializer.data), etag(purchase_order))
         else:
             return Response({"message": "Purchase order not found"}, status=status.HTTP_404_NOT_FOUND)
 
     # PUT Request to update Purchase Order details
     # Headers - Authorization : Token {auth_token}
+    #           If-Match : {etag} (optional, 412 when the purchase order changed since it was read)
     # Usage : PUT http://localhost:5000/api/purchase_orders/{id}/
     def put(self, request, pk):
-        purchase_order = self.get_object(pk)
-        if purchase_order:
-            serializer = PurchaseOrderSerializer(purchase_order, data=request.data, partial=True)
-            if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            return Response({"message": "Purchase order not found"}, status=status.HTTP_404_NOT_FOUND)
+        with transaction.atomic():
+            purchase_order = self.get_object(pk, for_update='If-Match' in request.headers)
+            if purchase_order:
+                changed = precondition_failed(request, etag(purchase_order))
+                if changed:
+                    return changed
+                serializer = PurchaseOrderSerializer(purchase_order, data=request.data, partial=True)
+                if serializer.is_valid():
+                    serializer.save()
+                    return with_etag(Response(serializer.data), etag(purchase_order))
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            else:
+                return Response({"message": "Purchase order not found"}, status=status.HTTP_404_NOT_FOUND)
 
     # DELETE Request to delete a Purchase Order
     # Headers - Authorization : Token {auth_token}
@@ -109,12 +226,8 @@ class PurchaseOrderCompletionView(APIView):
                 return Response({'message': 'Purchase order is not acknowledged.'}, status=status.HTTP_400_BAD_REQUEST)
             if purchase_order.status == 'completed':
                 return Response({'message': 'Purchase order already completed.'}, status=status.HTTP_400_BAD_REQUEST)
-            quality_rating = request.data.get('quality_rating')
-            if quality_rating is not None:
-                # Update purchase order with quality rating
-                purchase_order.quality_rating = quality_rating
-                purchase_order.save()
-            purchase_order.complete_order()  # Call the method from the model
+            # Status, completed_at and the optional quality rating are written in one save
+            purchase_order.complete_order(quality_rating=request.data.get('quality_rating'))  # Call the method from the model
             serializer = PurchaseOrderSerializer(purchase_order)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except PurchaseOrder.DoesNotExist:
@@ -0,0 +1,142 @@
+import threading
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import Sequence
+
+# Block allocating number generator.
+#
+# A process reserves SEQUENCE_BLOCK_SIZE numbers at a time by bumping the
+# Sequence row with a single atomic UPDATE, then hands them out from an
+# in-process pool. Most allocations therefore need no query, and concurrent
+# workers never share a block. Numbers left in a pool when the process exits
+# are skipped, so sequences are unique and increasing per process but may
+# have gaps.
+#
+# The spare part of a block only joins the shared pool once the reserving
+# transaction commits. Until then it is only used by the same thread, inside
+# the same transaction. If the transaction rolls back, the Sequence row rolls
+# back too and the spare numbers are dropped instead of being handed out twice.
+
+_pools = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+def block_size():
+  return getattr(settings, 'SEQUENCE_BLOCK_SIZE', 100)
+
+# Spare numbers of a block reserved by a transaction that has not committed yet
+class _PendingBlock:
+  def __init__(self, name, start, end):
+    self.name = name
+    self.start = start
+    self.end = end
+
+  def take(self, count):
+    taken = range(self.start, min(self.start + count, self.end))
+    self.start = taken.stop
+    return list(taken)
+
+  # Still waiting for the commit, i.e. the transaction (or savepoint) did not roll back
+  def alive(self):
+    return any(callback is self for _, callback, _ in transaction.get_connection().run_on_commit)
+
+  # on_commit callback
+  def __call__(self):
+    if _pending().get(self.name) is self:
+      del _pending()[self.name]
+    if self.start < self.end:
+      _release(self.name, (self.start, self.end))
+
+def _pending():
+  if not hasattr(_local, 'blocks'):
+    _local.blocks = {}
+  return _local.blocks
+
+def next_value(name, initial=None):
+  return next_values(name, 1, initial)[0]
+
+def next_values(name, count, initial=None):
+  """Allocate `count` numbers from the named sequence.
+
+  `initial` is an optional callable returning the last number already in use,
+  called once when the sequence row does not exist yet.
+  """
+  values = _take_from_pool(name, count)
+  pending = _pending().get(name)
+  if pending is not None and len(values) < count:
+    if pending.alive():
+      values.extend(pending.take(count - len(values)))
+    else:
+      del _pending()[name]
+  remaining = count - len(values)
+  if remaining:
+    size = max(remaining, block_size())
+    start = reserve(name, size, initial)
+    values.extend(range(start, start + remaining))
+    if remaining < size:
+      block = _PendingBlock(name, start + remaining, start + size)
+      if transaction.get_connection().in_atomic_block:
+        _pending()[name] = block
+      transaction.on_commit(block)  # Runs immediately in autocommit mode
+  return values
+
+def reserve(name, count, initial=None):
+  """Reserve `count` consecutive numbers in the database, returns the first one."""
+  with transaction.atomic():
+    if not Sequence.objects.filter(name=name).update(value=F('value') + count):
+      last = initial() if initial else 0
+      try:
+        with transaction.atomic():
+          Sequence.objects.create(name=name, value=last + count)
+        return last + 1
+      except IntegrityError:  # Created concurrently by another worker
+        Sequence.objects.filter(name=name).update(value=F('value') + count)
+    value = Sequence.objects.filter(name=name).values_list('value', flat=True).get()
+  return value - count + 1
+
+def advance(name, value, initial=None):
+  """Make sure numbers up to `value` are never handed out, after rows were inserted with explicit numbers."""
+  with transaction.atomic():
+    if Sequence.objects.filter(name=name).exists():
+      Sequence.objects.filter(name=name, value__lt=value).update(value=value)
+    else:
+      Sequence.objects.create(name=name, value=max(value, initial() if initial else 0))
+  with _lock:
+    _pools[name] = [(max(start, value + 1), end) for start, end in _pools.get(name, []) if end > value + 1]
+  pending = _pending().get(name)
+  if pending is not None:
+    pending.start = min(max(pending.start, value + 1), pending.end)
+
+def _take_from_pool(name, count):
+  values = []
+  with _lock:
+    pool = _pools.get(name, [])
+    while pool and len(values) < count:
+      start, end = pool[0]
+      take = min(count - len(values), end - start)
+      values.extend(range(start, start + take))
+      if start + take == end:
+        pool.pop(0)
+      else:
+        pool[0] = (start + take, end)
+  return values
+
+def _release(name, block):
+  with _lock:
+    _pools.setdefault(name, []).append(block)
+
+def highest_number(values, prefix):
+  """Largest N among the `{prefix}N` strings in values, used to seed a sequence from existing rows."""
+  highest = 0
+  for value in values:
+    suffix = value[len(prefix):] if value and value.startswith(prefix) else ''
+    if suffix.isdigit():
+      highest = max(highest, int(suffix))
+  return highest
+
+def reset():
+  """Forget every pooled block (tests, forked workers)."""
+  with _lock:
+    _pools.clear()
+  _pending().clear()
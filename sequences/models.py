@@ -0,0 +1,9 @@
+from django.db import models
+
+# Named counter handing out blocks of numbers (see sequences.allocator)
+class Sequence(models.Model):
+  name = models.CharField(max_length=50, unique=True)
+  value = models.BigIntegerField(default=0)
+
+  def __str__(self):
+    return f"{self.name} = {self.value}"
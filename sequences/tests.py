@@ -0,0 +1,45 @@
+from django.db import DatabaseError, transaction
+from django.test import TestCase, override_settings
+from vendors.models import Vendor
+from .models import Sequence
+from . import allocator
+
+@override_settings(SEQUENCE_BLOCK_SIZE=10)
+class SequenceAllocatorTestCase(TestCase):
+  def tearDown(self):
+    allocator.reset()
+
+  def test_block_is_pooled_after_commit(self):
+    with self.captureOnCommitCallbacks(execute=True):
+      self.assertEqual(allocator.next_values('test', 3), [1, 2, 3])
+    self.assertEqual(Sequence.objects.get(name='test').value, 10)
+    with self.assertNumQueries(0):
+      self.assertEqual(allocator.next_values('test', 7), [4, 5, 6, 7, 8, 9, 10])
+    with self.captureOnCommitCallbacks(execute=True):
+      self.assertEqual(allocator.next_value('test'), 11)
+    self.assertEqual(Sequence.objects.get(name='test').value, 20)
+
+  def test_uncommitted_block_is_used_by_its_transaction(self):
+    self.assertEqual(allocator.next_value('test'), 1)
+    with self.assertNumQueries(0):
+      self.assertEqual(allocator.next_values('test', 2), [2, 3])
+
+  def test_rolled_back_block_is_dropped(self):
+    try:
+      with transaction.atomic():
+        self.assertEqual(allocator.next_value('test'), 1)
+        raise DatabaseError
+    except DatabaseError:
+      pass
+    self.assertFalse(Sequence.objects.filter(name='test').exists())
+    self.assertEqual(allocator.next_value('test'), 1)
+
+  def test_reservations_do_not_overlap(self):
+    first = allocator.reserve('test', 5)
+    second = allocator.reserve('test', 5)
+    self.assertEqual((first, second), (1, 6))
+
+  def test_sequence_is_seeded_from_existing_codes(self):
+    Vendor.objects.create(name='Vendor', mobile_number='1234567890', address='Address', vendor_code='VN041')
+    vendor = Vendor.objects.create(name='Vendor', mobile_number='1234567890', address='Address')
+    self.assertEqual(vendor.vendor_code, 'VN042')
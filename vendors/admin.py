@@ -2,4 +2,6 @@ from django.contrib import admin
 from .models import *
 # Register your models here.
 admin.site.register(Vendor)
-admin.site.register(HistoricalPerformance)
\ No newline at end of file
+admin.site.register(HistoricalPerformance)
+admin.site.register(HistoricalPerformanceRollup)
+admin.site.register(RankingWeights)
@@ -0,0 +1,11 @@
+from django.urls import path
+from .async_views import *
+
+# Urls, served under api/async/vendors/
+urlpatterns = [
+    path('', AsyncVendorListView.as_view(), name='async-vendor-list'),
+    path('<int:pk>/', AsyncVendorDetailView.as_view(), name='async-vendor-detail'),
+    path('<int:pk>/performance', AsyncVendorPerformanceView.as_view(), name='async-vendor-performance'),
+    path('<int:pk>/pos', AsyncVendorPosView.as_view(), name='async-vendor-pos'),
+    path('<int:pk>/historical_perf', AsyncVendorHistoricalPerfView.as_view(), name='async-vendor-historical'),
+]
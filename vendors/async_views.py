@@ -0,0 +1,141 @@
+import asyncio
+from django.db.models import Avg, Count
+from rest_framework import status
+from purchase_orders.models import PurchaseOrder
+from purchase_orders.serializers import PurchaseOrderSerializer
+from vms.async_views import AsyncAPIView, render
+from vms.conditional import ETAG_FIELDS, etag, not_modified, with_etag
+from vms.fast_serializers import FastSerializer
+from vms.pagination import KeysetPagination, wants_stream, astreaming_response
+from .cache import get_performance, set_performance, response_key, get_response, set_response
+from .models import Vendor, HistoricalPerformance, METRIC_FIELDS
+from .serializers import VendorSerializer
+from .views import historical_rows
+
+# Async versions of the vendor read endpoints (see vendors.views)
+# Paged responses are cached apart from the synchronous ones, their cursor
+# links point at the api/async/ URLs.
+
+# api/async/vendors/
+class AsyncVendorListView(AsyncAPIView):
+  # GET Request to fetch Vendors, one page at a time
+  # Headers : Authorization : Token {auth_token}
+  # Usage : GET http://localhost:5000/api/async/vendors/?page_size=100[&stream=1][&fields=id,name]
+  async def get(self, request):
+    paginator = KeysetPagination()
+    fields = VendorSerializer.sparse_fields(request)
+    vendors = VendorSerializer.narrow_queryset(Vendor.objects.all(), fields, paginator.get_ordering(request, None, self))
+    if wants_stream(request):
+      return astreaming_response(paginator.get_ordered_queryset(vendors, request, self), VendorSerializer, serializer_kwargs={'fields': fields})
+    key = response_key('async-vendor-list', request)
+    data = get_response('async-vendor-list', key)
+    if data is None:
+      page = await paginator.apaginate_queryset(vendors, request, view=self)
+      serializer = VendorSerializer(page, many=True, fields=fields)
+      data = paginator.get_paginated_response(serializer.data).data
+      set_response(key, data)
+    return render(data)
+
+# api/async/vendors/:id
+class AsyncVendorDetailView(AsyncAPIView):
+  # GET Request to fetch Vendor details using ID
+  # Headers : Authorization : Token {auth_token}
+  #           If-None-Match : {etag} (optional, 304 when unchanged)
+  # Usage : GET http://localhost:5000/api/async/vendors/{id}/[?fields=id,name]
+  async def get(self, request, pk):
+    fields = VendorSerializer.sparse_fields(request)
+    key = response_key('vendor-detail', request, pk)
+    cached = get_response('vendor-detail', key)
+    if cached is None:
+      try:
+        vendor = await VendorSerializer.narrow_queryset(Vendor.objects.all(), fields, ETAG_FIELDS).aget(pk=pk)
+      except Vendor.DoesNotExist:
+        return render({"message":"Vendor doesn't exist!"}, status.HTTP_400_BAD_REQUEST)
+      cached = {'data': VendorSerializer(vendor, fields=fields).data, 'etag': etag(vendor)}
+      set_response(key, cached)
+    unchanged = not_modified(request, cached['etag'])
+    if unchanged:
+      return unchanged
+    return with_etag(render(cached['data']), cached['etag'])
+
+# api/async/vendors/:id/performance
+class AsyncVendorPerformanceView(AsyncAPIView):
+  # GET Request to fetch Vendor's performance metrics
+  # Headers : Authorization : Token {auth_token}
+  # Usage : GET http://localhost:5000/api/async/vendors/{id}/performance
+  async def get(self, request, pk):
+    performance_data = get_performance(pk)
+    if performance_data is None:
+      performance_data = await HistoricalPerformance.objects.filter(vendor_id=pk).aaggregate(
+        data_points=Count('id'),
+        **{field: Avg(field) for field in METRIC_FIELDS}
+      )
+      if not performance_data.pop('data_points'):
+        try:
+          performance_data = await Vendor.objects.values(*METRIC_FIELDS).aget(pk=pk)
+        except Vendor.DoesNotExist:
+          return render({'error': 'Vendor not found'}, status.HTTP_404_NOT_FOUND)
+      set_performance(pk, performance_data)
+    return render(performance_data)
+
+# api/async/vendors/:id/pos
+class AsyncVendorPosView(AsyncAPIView):
+  cursor_orderings = {'id': ('id',), 'issue_date': ('issue_date', 'id')}
+
+  # GET Request to fetch the Purchase Order's associated to Vendor, one page at a time
+  # The vendor check, the count and the page are queried concurrently
+  # Headers : Authorization : Token {auth_token}
+  # Usage : GET http://localhost:5000/api/async/vendors/{id}/pos?page_size=100[&stream=1][&exclude=items]
+  async def get(self, request, pk):
+    fields = PurchaseOrderSerializer.sparse_fields(request)
+    stream = wants_stream(request)
+    if not stream:
+      key = response_key('async-vendor-pos', request, pk)
+      res = get_response('async-vendor-pos', key)
+      if res is not None:
+        return render(res)
+    paginator = KeysetPagination()
+    pos = PurchaseOrder.objects.filter(vendor_id=pk)
+    serializer = FastSerializer(PurchaseOrderSerializer, fields)
+    rows = serializer.values(pos, paginator.get_ordering(request, None, self))
+    if stream:
+      if not await Vendor.objects.filter(pk=pk).aexists():
+        return render({'error': 'Vendor not found'}, status.HTTP_404_NOT_FOUND)
+      return astreaming_response(paginator.get_ordered_queryset(rows, request, self), serializer)
+    exists, count, page = await asyncio.gather(
+      Vendor.objects.filter(pk=pk).aexists(),
+      pos.acount(),
+      paginator.apaginate_queryset(rows, request, view=self),
+    )
+    if not exists:
+      return render({'error': 'Vendor not found'}, status.HTTP_404_NOT_FOUND)
+    res = {
+      "pos": count,
+      "next": paginator.get_next_link(),
+      "previous": paginator.get_previous_link(),
+      "data": serializer.serialize(page),
+    }
+    set_response(key, res)
+    return render(res)
+
+# api/async/vendors/:id/historical_perf
+class AsyncVendorHistoricalPerfView(AsyncAPIView):
+  # GET Request to fetch Historical Performance of Vendor, one page at a time
+  # Headers : Authorization : Token {auth_token}
+  # Usage : GET http://localhost:5000/api/async/vendors/{id}/historical_perf?from=2024-01-01[&bucket=week]
+  async def get(self, request, pk):
+    paginator = KeysetPagination()
+    try:
+      rows, serializer_class = historical_rows(pk, request.query_params, paginator)
+    except ValueError as e:
+      if not await Vendor.objects.filter(pk=pk).aexists():
+        return render({'error': 'Vendor not found'}, status.HTTP_404_NOT_FOUND)
+      return render({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    exists, page = await asyncio.gather(
+      Vendor.objects.filter(pk=pk).aexists(),
+      paginator.apaginate_queryset(rows, request, view=self),
+    )
+    if not exists:
+      return render({'error': 'Vendor not found'}, status.HTTP_404_NOT_FOUND)
+    serializer = serializer_class(page, many=True)
+    return render(paginator.get_paginated_response(serializer.data).data)
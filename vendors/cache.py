@@ -0,0 +1,79 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from vms.instrumentation import registry
+from vms.routers import reading_from_replica
+
+# Cached vendor read models, invalidated from the vendor / purchase order signals
+#
+# API responses are cached under keys embedding a generation number: one per
+# vendor (detail, POs) and one for the vendor list. Invalidation bumps the
+# generations instead of hunting down every cached page, the stale entries
+# are simply never read again and expire after VENDOR_CACHE_TIMEOUT.
+
+LIST_GENERATION_KEY = 'vendor-list-generation'
+
+def cache_timeout():
+  timeout = getattr(settings, 'VENDOR_CACHE_TIMEOUT', 300)
+  if reading_from_replica():
+    # Computed from a replica that may lag behind the write that invalidated
+    # the previous entry, keep it no longer than the replication lag allowance
+    return min(timeout, settings.REPLICA_STICKY_SECONDS)
+  return timeout
+
+def performance_key(vendor_id):
+  return f'vendor-performance:{vendor_id}'
+
+def get_performance(vendor_id):
+  return cache.get(performance_key(vendor_id))
+
+def set_performance(vendor_id, data):
+  cache.set(performance_key(vendor_id), data, cache_timeout())
+
+def generation_key(vendor_id):
+  return f'vendor-generation:{vendor_id}'
+
+def _generation(key):
+  generation = cache.get(key)
+  if generation is None:
+    cache.add(key, time.time_ns(), None)
+    generation = cache.get(key)
+  return generation
+
+def _bump_generation(key):
+  try:
+    cache.incr(key)
+  except ValueError:  # Missing or evicted, restart from a value no cached entry uses
+    cache.set(key, time.time_ns(), None)
+
+def response_key(scope, request, vendor_id=None):
+  """Cache key of a vendor API response, scoped by vendor (or the list) and query string (page)."""
+  generation = _generation(LIST_GENERATION_KEY if vendor_id is None else generation_key(vendor_id))
+  query = hashlib.md5(request.GET.urlencode().encode(), usedforsecurity=False).hexdigest() if request.GET else ''
+  return f'vendor-response:{scope}:{vendor_id or "all"}:{generation}:{query}'
+
+def get_response(scope, key):
+  data = cache.get(key)
+  registry.inc('vms_response_cache_requests_total', 'Vendor API response cache lookups.', cache=scope, result='miss' if data is None else 'hit')
+  return data
+
+def set_response(key, data):
+  cache.set(key, data, cache_timeout())
+
+# Drop every cached entry of a vendor, now and again once the surrounding
+# transaction commits so a concurrent reader cannot re-cache stale rows
+def invalidate_vendor(vendor_id):
+  _delete_vendor_entries(vendor_id)
+  transaction.on_commit(lambda: _delete_vendor_entries(vendor_id))
+
+def _delete_vendor_entries(vendor_id):
+  cache.delete(performance_key(vendor_id))
+  _bump_generation(generation_key(vendor_id))
+  _bump_generation(LIST_GENERATION_KEY)
+
+# Drop the cached vendor list pages (and ranking), now and once the surrounding transaction commits
+def invalidate_vendor_list():
+  _bump_generation(LIST_GENERATION_KEY)
+  transaction.on_commit(lambda: _bump_generation(LIST_GENERATION_KEY))
@@ -0,0 +1,15 @@
+from django_filters import rest_framework as filters
+from .models import HistoricalPerformance
+
+# Filters of the historical performance export
+# Usage : GET /api/vendors/historical_perf/export?vendor=3&date_after=2024-01-01
+# vendor (with or without the date range) is served by the (vendor, date) unique index.
+
+class HistoricalPerformanceFilter(filters.FilterSet):
+  vendor = filters.NumberFilter(field_name='vendor_id')
+  # ?date_after= / ?date_before= (ISO 8601, inclusive)
+  date = filters.IsoDateTimeFromToRangeFilter()
+
+  class Meta:
+    model = HistoricalPerformance
+    fields = []
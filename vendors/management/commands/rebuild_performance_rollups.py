@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from vendors.rollups import rebuild_rollups
+
+# Rebuild the HistoricalPerformance rollups from the raw snapshots
+# Usage : python manage.py rebuild_performance_rollups [--vendor 1 --vendor 2]
+class Command(BaseCommand):
+  help = 'Recompute the daily, weekly and monthly HistoricalPerformance rollups from the raw snapshots.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--vendor', type=int, action='append', dest='vendors', help='Only rebuild this vendor id (repeatable).')
+
+  def handle(self, *args, **options):
+    created = rebuild_rollups(options['vendors'])
+    self.stdout.write(self.style.SUCCESS(f'Created {created} rollup row(s).'))
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.4 on 2026-10-18 15:17
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Vendor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('mobile_number', models.CharField(max_length=20, validators=[django.core.validators.RegexValidator(message='Please enter a valid phone number (10-15 digits)', regex='\\d{10,15}')])),
+                ('address', models.TextField()),
+                ('vendor_code', models.CharField(default='', max_length=20, unique=True)),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('on_time_delivery_rate', models.FloatField(default=0)),
+                ('quality_rating_avg', models.FloatField(default=0)),
+                ('average_response_time', models.FloatField(default=0)),
+                ('fulfillment_rate', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HistoricalPerformance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('on_time_delivery_rate', models.FloatField()),
+                ('quality_rating_avg', models.FloatField()),
+                ('average_response_time', models.FloatField()),
+                ('fulfillment_rate', models.FloatField()),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vendors.vendor')),
+            ],
+            options={
+                'unique_together': {('vendor', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 5.0.4 on 2026-10-18 15:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+
+
+# Counters and metrics of the existing vendors, from their purchase orders
+# (purchase_orders.metrics, as of this migration), so the first incremental
+# update applies its delta on top of the vendor's real totals
+def backfill_counters(apps, schema_editor):
+    Vendor = apps.get_model('vendors', 'Vendor')
+    PurchaseOrder = apps.get_model('purchase_orders', 'PurchaseOrder')
+    rated = Q(status='completed', quality_rating__isnull=False)
+    acknowledged = Q(acknowledgment_date__isnull=False)
+    response_time = ExpressionWrapper(F('acknowledgment_date') - F('issue_date'), output_field=DurationField())
+    rows = PurchaseOrder.objects.order_by().values('vendor_id').annotate(
+        total_pos=Count('id'),
+        completed_pos=Count('id', filter=Q(status='completed')),
+        on_time_pos=Count('id', filter=Q(status='completed', delivery_date__gte=F('completed_at'))),
+        quality_rating_sum=Sum('quality_rating', filter=rated),
+        quality_rating_count=Count('id', filter=rated),
+        response_time_sum=Sum(response_time, filter=acknowledged),
+        response_time_count=Count('id', filter=acknowledged),
+    )
+    vendors = []
+    for row in rows.iterator():
+        vendor = Vendor(pk=row['vendor_id'])
+        vendor.total_pos, vendor.completed_pos, vendor.on_time_pos = row['total_pos'], row['completed_pos'], row['on_time_pos']
+        vendor.quality_rating_sum = float(row['quality_rating_sum'] or 0)
+        vendor.quality_rating_count = row['quality_rating_count']
+        vendor.response_time_sum = row['response_time_sum'].total_seconds() / 60 if row['response_time_sum'] else 0.0
+        vendor.response_time_count = row['response_time_count']
+        completed, rated_count, acknowledged_count = vendor.completed_pos, vendor.quality_rating_count, vendor.response_time_count
+        vendor.on_time_delivery_rate = vendor.on_time_pos / completed if completed else 0.0
+        vendor.quality_rating_avg = vendor.quality_rating_sum / rated_count if rated_count else 0.0
+        vendor.average_response_time = vendor.response_time_sum / acknowledged_count if acknowledged_count else 0.0
+        vendor.fulfillment_rate = completed / vendor.total_pos
+        vendors.append(vendor)
+    fields = [
+        'total_pos', 'completed_pos', 'on_time_pos', 'quality_rating_sum', 'quality_rating_count', 'response_time_sum', 'response_time_count',
+        'on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate',
+    ]
+    Vendor.objects.bulk_update(vendors, fields, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0001_initial'),
+        ('purchase_orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendor',
+            name='total_pos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='completed_pos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='on_time_pos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='quality_rating_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='quality_rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='response_time_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='response_time_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='HistoricalPerformanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('day', 'Daily'), ('week', 'Weekly'), ('month', 'Monthly')], max_length=5)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('last_date', models.DateTimeField()),
+                ('on_time_delivery_rate_min', models.FloatField()),
+                ('on_time_delivery_rate_max', models.FloatField()),
+                ('on_time_delivery_rate_sum', models.FloatField()),
+                ('on_time_delivery_rate_last', models.FloatField()),
+                ('quality_rating_avg_min', models.FloatField()),
+                ('quality_rating_avg_max', models.FloatField()),
+                ('quality_rating_avg_sum', models.FloatField()),
+                ('quality_rating_avg_last', models.FloatField()),
+                ('average_response_time_min', models.FloatField()),
+                ('average_response_time_max', models.FloatField()),
+                ('average_response_time_sum', models.FloatField()),
+                ('average_response_time_last', models.FloatField()),
+                ('fulfillment_rate_min', models.FloatField()),
+                ('fulfillment_rate_max', models.FloatField()),
+                ('fulfillment_rate_sum', models.FloatField()),
+                ('fulfillment_rate_last', models.FloatField()),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vendors.vendor')),
+            ],
+            options={
+                'unique_together': {('vendor', 'resolution', 'bucket_start')},
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.4 on 2026-10-18 16:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+# Scores of the existing vendors under the default weights (vendors.ranking, as of this migration)
+def score_vendors(apps, schema_editor):
+    Vendor = apps.get_model('vendors', 'Vendor')
+    scale = 24 * 60.0
+    vendors = []
+    for vendor in Vendor.objects.only('on_time_delivery_rate', 'quality_rating_avg', 'fulfillment_rate', 'average_response_time', 'response_time_count').iterator():
+        response = scale / (scale + vendor.average_response_time) if vendor.response_time_count else 0.0
+        vendor.score = 0.35 * vendor.on_time_delivery_rate + 0.3 * vendor.quality_rating_avg / 5 + 0.2 * vendor.fulfillment_rate + 0.15 * response
+        vendors.append(vendor)
+    Vendor.objects.bulk_update(vendors, ['score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0003_vendor_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingWeights',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('on_time_delivery_rate', models.FloatField(default=0.35, validators=[django.core.validators.MinValueValidator(0)])),
+                ('quality_rating_avg', models.FloatField(default=0.3, validators=[django.core.validators.MinValueValidator(0)])),
+                ('fulfillment_rate', models.FloatField(default=0.2, validators=[django.core.validators.MinValueValidator(0)])),
+                ('average_response_time', models.FloatField(default=0.15, validators=[django.core.validators.MinValueValidator(0)])),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['-score', 'id'], name='vendor_score_idx'),
+        ),
+        migrations.RunPython(score_vendors, migrations.RunPython.noop),
+    ]
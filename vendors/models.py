@@ -1,6 +1,29 @@
 from django.db import models
-from django.core.validators import RegexValidator
+from django.core.validators import MinValueValidator, RegexValidator
 from django.utils import timezone
+from sequences.allocator import advance, next_value, highest_number
+
+# Performance metrics of a vendor
+METRIC_FIELDS = (
+  'on_time_delivery_rate',
+  'quality_rating_avg',
+  'average_response_time',
+  'fulfillment_rate',
+)
+
+# Running counters maintained incrementally by purchase_orders.metrics
+METRIC_COUNTER_FIELDS = (
+  'total_pos',
+  'completed_pos',
+  'on_time_pos',
+  'quality_rating_sum',
+  'quality_rating_count',
+  'response_time_sum',
+  'response_time_count',
+)
+
+# Columns written only by the metric writers (F() deltas, recomputes, rankings)
+DERIVED_FIELDS = (*METRIC_FIELDS, *METRIC_COUNTER_FIELDS, 'score')
 
 # Vendor Model
 class Vendor(models.Model):
@@ -13,24 +36,82 @@ class Vendor(models.Model):
   quality_rating_avg = models.FloatField(default=0)
   average_response_time = models.FloatField(default=0)
   fulfillment_rate = models.FloatField(default=0)
+  # Metric counters
+  total_pos = models.IntegerField(default=0)
+  completed_pos = models.IntegerField(default=0)
+  on_time_pos = models.IntegerField(default=0)
+  quality_rating_sum = models.FloatField(default=0)
+  quality_rating_count = models.IntegerField(default=0)
+  response_time_sum = models.FloatField(default=0)
+  response_time_count = models.IntegerField(default=0)
+  # Weighted ranking score, maintained with the metrics (vendors.ranking)
+  score = models.FloatField(default=0, editable=False)
+  # Bumped on every write, the ETag is derived from it (vms.conditional)
+  version = models.PositiveIntegerField(default=1, editable=False)
+  updated_at = models.DateTimeField(auto_now=True)
+
+  class Meta:
+    indexes = [
+      # Leaderboard, best first (api/vendors/ranking)
+      models.Index(fields=['-score', 'id'], name='vendor_score_idx'),
+    ]
 
   # On save method
   def save(self, *args, **kwargs):
     # Automatically generate vendor_code if not provided
     if not self.vendor_code:
       self.vendor_code = self.generate_vendor_code()
+    elif self._state.adding or 'vendor_code' in (kwargs.get('update_fields') or ['vendor_code']):
+      # An explicit code in the generated format must never be generated again
+      number = highest_number([self.vendor_code], 'VN')
+      if number:
+        advance('vendor_code', number, initial=Vendor.last_vendor_number)
+    if not self._state.adding:
+      self.version += 1
+      update_fields = kwargs.get('update_fields')
+      if update_fields is None and not kwargs.get('force_insert'):
+        # The metric columns may have moved since this instance was loaded,
+        # a full save must not write its stale copies over them
+        update_fields = [
+          field.name for field in self._meta.concrete_fields
+          if not field.primary_key and field.name not in DERIVED_FIELDS
+        ]
+      if update_fields is not None:
+        kwargs['update_fields'] = {*update_fields, 'version', 'updated_at'}
     super().save(*args, **kwargs)
 
   # Generate Vendor Code
   def generate_vendor_code(self):
-    # Get the count of existing vendors
-    count = Vendor.objects.count() + 1
+    # Take the next number from the vendor_code sequence
+    number = next_value('vendor_code', initial=Vendor.last_vendor_number)
     # Format the vendor code
-    return f'VN{count:03d}'
+    return f'VN{number:03d}'
+
+  # Highest vendor code number in use, seeds the sequence the first time it is used
+  @staticmethod
+  def last_vendor_number():
+    return highest_number(Vendor.objects.values_list('vendor_code', flat=True).iterator(), 'VN')
   
   def __str__(self):
     return f"{self.vendor_code} - {self.name}"
 
+# Weights of the ranking score per metric, a single row (pk=1).
+# Saving it recomputes the score of every vendor (vendors.signals).
+class RankingWeights(models.Model):
+  on_time_delivery_rate = models.FloatField(default=0.35, validators=[MinValueValidator(0)])
+  quality_rating_avg = models.FloatField(default=0.3, validators=[MinValueValidator(0)])
+  fulfillment_rate = models.FloatField(default=0.2, validators=[MinValueValidator(0)])
+  average_response_time = models.FloatField(default=0.15, validators=[MinValueValidator(0)])
+  updated_at = models.DateTimeField(auto_now=True)
+
+  # The stored weights, or unsaved defaults until they are first changed
+  @classmethod
+  def current(cls):
+    return cls.objects.filter(pk=1).first() or cls(pk=1)
+
+  def __str__(self):
+    return ', '.join(f'{field}={getattr(self, field)}' for field in METRIC_FIELDS)
+
 # Historical Performance Model
 class HistoricalPerformance(models.Model):
   vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
@@ -44,4 +125,40 @@ class HistoricalPerformance(models.Model):
     unique_together = ('vendor', 'date')
 
   def __str__(self):
-    return f"{self.vendor.vendor_code} - {self.date.strftime('%Y-%m-%d')}"
\ No newline at end of file
+    return f"{self.vendor.vendor_code} - {self.date.strftime('%Y-%m-%d')}"
+# Historical Performance Rollup Model
+# Downsampled HistoricalPerformance: min/max/sum/last of every metric per vendor and time bucket,
+# maintained incrementally by vendors.rollups as snapshots arrive
+class HistoricalPerformanceRollup(models.Model):
+  RESOLUTIONS = (
+    ('day', 'Daily'),
+    ('week', 'Weekly'),
+    ('month', 'Monthly'),
+  )
+  vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+  resolution = models.CharField(max_length=5, choices=RESOLUTIONS)
+  bucket_start = models.DateTimeField()
+  count = models.IntegerField(default=0)
+  last_date = models.DateTimeField()
+  on_time_delivery_rate_min = models.FloatField()
+  on_time_delivery_rate_max = models.FloatField()
+  on_time_delivery_rate_sum = models.FloatField()
+  on_time_delivery_rate_last = models.FloatField()
+  quality_rating_avg_min = models.FloatField()
+  quality_rating_avg_max = models.FloatField()
+  quality_rating_avg_sum = models.FloatField()
+  quality_rating_avg_last = models.FloatField()
+  average_response_time_min = models.FloatField()
+  average_response_time_max = models.FloatField()
+  average_response_time_sum = models.FloatField()
+  average_response_time_last = models.FloatField()
+  fulfillment_rate_min = models.FloatField()
+  fulfillment_rate_max = models.FloatField()
+  fulfillment_rate_sum = models.FloatField()
+  fulfillment_rate_last = models.FloatField()
+
+  class Meta:
+    unique_together = ('vendor', 'resolution', 'bucket_start')
+
+  def __str__(self):
+    return f"{self.vendor_id} - {self.resolution} - {self.bucket_start.strftime('%Y-%m-%d')}"
@@ -0,0 +1,68 @@
+from django.db.models import Case, F, FloatField, Subquery, Value, When
+from django.db.models.functions import Coalesce, NullIf
+from .models import Vendor, RankingWeights, METRIC_FIELDS
+
+# Vendor ranking score
+#
+# score = sum(weight * metric scaled to 0..1, higher is better) / sum(weights)
+#
+# The quality rating is divided by 5, the average response time maps to
+# SCALE / (SCALE + minutes) (0.5 for one day, 0 without acknowledged POs),
+# the rates are used as they are. ranking_score() builds the expression for
+# an UPDATE; the weights are read from RankingWeights inside the statement,
+# so every write uses the weights current at that moment, and a weights
+# change is followed by recompute_scores() over all vendors.
+
+RESPONSE_TIME_SCALE = 24 * 60.0  # Minutes
+
+def normalize(metrics):
+  """Metrics scaled to 0..1 from a dict with METRIC_FIELDS and response_time_count."""
+  return {
+    'on_time_delivery_rate': metrics['on_time_delivery_rate'],
+    'quality_rating_avg': metrics['quality_rating_avg'] / 5,
+    'fulfillment_rate': metrics['fulfillment_rate'],
+    'average_response_time': RESPONSE_TIME_SCALE / (RESPONSE_TIME_SCALE + metrics['average_response_time']) if metrics['response_time_count'] else 0.0,
+  }
+
+def _normalized_columns():
+  return {
+    'on_time_delivery_rate': F('on_time_delivery_rate'),
+    'quality_rating_avg': F('quality_rating_avg') / Value(5.0),
+    'fulfillment_rate': F('fulfillment_rate'),
+    'average_response_time': Case(
+      When(response_time_count=0, then=Value(0.0)),
+      default=Value(RESPONSE_TIME_SCALE) / (Value(RESPONSE_TIME_SCALE) + F('average_response_time')),
+      output_field=FloatField(),
+    ),
+  }
+
+def _weight(field):
+  stored = Subquery(RankingWeights.objects.filter(pk=1).values(field)[:1], output_field=FloatField())
+  return Coalesce(stored, Value(RankingWeights._meta.get_field(field).default), output_field=FloatField())
+
+def ranking_score(metrics=None):
+  """Score expression of the metrics being written (dict), or of the stored metric columns."""
+  if metrics is None:
+    terms = _normalized_columns()
+  else:
+    terms = {field: Value(float(value), output_field=FloatField()) for field, value in normalize(metrics).items()}
+  weighted = sum((_weight(field) * terms[field] for field in METRIC_FIELDS[1:]), _weight(METRIC_FIELDS[0]) * terms[METRIC_FIELDS[0]])
+  total = sum((_weight(field) for field in METRIC_FIELDS[1:]), _weight(METRIC_FIELDS[0]))
+  return Coalesce(weighted / NullIf(total, Value(0.0)), Value(0.0), output_field=FloatField())
+
+def current_weights():
+  """Weights per metric, the field defaults while RankingWeights has no row."""
+  stored = RankingWeights.objects.filter(pk=1).values(*METRIC_FIELDS).first()
+  return stored or {field: RankingWeights._meta.get_field(field).default for field in METRIC_FIELDS}
+
+def compute_score(metrics, weights):
+  """ranking_score() of the metrics (dict) evaluated in Python, weights from current_weights()."""
+  total = sum(weights[field] for field in METRIC_FIELDS)
+  if not total:
+    return 0.0
+  terms = normalize(metrics)
+  return sum(weights[field] * terms[field] for field in METRIC_FIELDS) / total
+
+# Full recompute, after the weights changed
+def recompute_scores():
+  return Vendor.objects.update(score=ranking_score())
@@ -0,0 +1,94 @@
+import datetime
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DateTimeField, F, FloatField, Value, When
+from django.db.models.functions import Greatest, Least
+from .models import HistoricalPerformance, HistoricalPerformanceRollup, METRIC_FIELDS
+
+# Daily / weekly / monthly rollups of HistoricalPerformance
+
+RESOLUTIONS = [resolution for resolution, _ in HistoricalPerformanceRollup.RESOLUTIONS]
+
+def bucket_start(date, resolution):
+  """Start of the UTC day, week (Monday) or month containing date."""
+  day = date.astimezone(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+  if resolution == 'week':
+    return day - datetime.timedelta(days=day.weekday())
+  if resolution == 'month':
+    return day.replace(day=1)
+  return day
+
+def _new_rollup(snapshot, resolution):
+  rollup = HistoricalPerformanceRollup(
+    vendor_id=snapshot.vendor_id,
+    resolution=resolution,
+    bucket_start=bucket_start(snapshot.date, resolution),
+    count=1,
+    last_date=snapshot.date,
+  )
+  for field in METRIC_FIELDS:
+    value = getattr(snapshot, field)
+    for suffix in ('min', 'max', 'sum', 'last'):
+      setattr(rollup, f'{field}_{suffix}', value)
+  return rollup
+
+# Fold a new snapshot into its day, week and month buckets with set-based updates
+def add_snapshot(snapshot):
+  date = Value(snapshot.date, output_field=DateTimeField())
+  updates = {'count': F('count') + 1, 'last_date': Greatest('last_date', date)}
+  for field in METRIC_FIELDS:
+    value = Value(getattr(snapshot, field), output_field=FloatField())
+    updates[f'{field}_min'] = Least(f'{field}_min', value)
+    updates[f'{field}_max'] = Greatest(f'{field}_max', value)
+    updates[f'{field}_sum'] = F(f'{field}_sum') + value
+    updates[f'{field}_last'] = Case(When(last_date__lte=date, then=value), default=F(f'{field}_last'))
+  with transaction.atomic():
+    for resolution in RESOLUTIONS:
+      rollups = HistoricalPerformanceRollup.objects.filter(
+        vendor_id=snapshot.vendor_id, resolution=resolution, bucket_start=bucket_start(snapshot.date, resolution),
+      )
+      if rollups.update(**updates):
+        continue
+      try:
+        with transaction.atomic():
+          _new_rollup(snapshot, resolution).save()
+      except IntegrityError:  # Bucket created concurrently
+        rollups.update(**updates)
+
+# Rebuild the rollups from the raw snapshots, one vendor at a time
+def rebuild_rollups(vendor_ids=None):
+  snapshots = HistoricalPerformance.objects.order_by('vendor_id', 'date')
+  rollups = HistoricalPerformanceRollup.objects.all()
+  if vendor_ids is not None:
+    snapshots = snapshots.filter(vendor_id__in=vendor_ids)
+    rollups = rollups.filter(vendor_id__in=vendor_ids)
+  created = 0
+  with transaction.atomic():
+    rollups.delete()
+    buckets = {}
+    vendor_id = None
+    for snapshot in snapshots.iterator(chunk_size=2000):
+      if snapshot.vendor_id != vendor_id:
+        created += _flush(buckets)
+        vendor_id = snapshot.vendor_id
+      for resolution in RESOLUTIONS:
+        key = (resolution, bucket_start(snapshot.date, resolution))
+        rollup = buckets.get(key)
+        if rollup is None:
+          buckets[key] = _new_rollup(snapshot, resolution)
+          continue
+        rollup.count += 1
+        rollup.last_date = snapshot.date
+        for field in METRIC_FIELDS:
+          value = getattr(snapshot, field)
+          setattr(rollup, f'{field}_min', min(getattr(rollup, f'{field}_min'), value))
+          setattr(rollup, f'{field}_max', max(getattr(rollup, f'{field}_max'), value))
+          setattr(rollup, f'{field}_sum', getattr(rollup, f'{field}_sum') + value)
+          setattr(rollup, f'{field}_last', value)
+    created += _flush(buckets)
+  return created
+
+def _flush(buckets):
+  count = len(buckets)
+  HistoricalPerformanceRollup.objects.bulk_create(buckets.values(), batch_size=500)
+  buckets.clear()
+  return count
@@ -1,14 +1,52 @@
 from rest_framework import serializers
-from .models import Vendor, HistoricalPerformance
+from vms.serializers import SparseFieldsMixin
+from .models import Vendor, HistoricalPerformance, HistoricalPerformanceRollup, RankingWeights, METRIC_FIELDS, METRIC_COUNTER_FIELDS
 
 # Vendor Serializer
-class VendorSerializer(serializers.ModelSerializer):
+class VendorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
   class Meta:
     model = Vendor
-    fields = '__all__'
+    exclude = (*METRIC_COUNTER_FIELDS, 'score')
+    read_only_fields = METRIC_FIELDS  # Derived from the purchase orders
+
+# Vendor Ranking Serializer, one leaderboard entry
+class VendorRankingSerializer(serializers.ModelSerializer):
+  class Meta:
+    model = Vendor
+    fields = ('id', 'vendor_code', 'name', 'score', *METRIC_FIELDS)
+
+# Ranking Weights Serializer
+class RankingWeightsSerializer(serializers.ModelSerializer):
+  class Meta:
+    model = RankingWeights
+    fields = (*METRIC_FIELDS, 'updated_at')
+
+  def validate(self, data):
+    weights = {field: data.get(field, getattr(self.instance, field, 0)) for field in METRIC_FIELDS}
+    if not sum(weights.values()):
+      raise serializers.ValidationError('At least one weight must be positive.')
+    return data
 
 # Historical Performance Serializer
 class HistoricalPerformanceSerializer(serializers.ModelSerializer):
   class Meta:
     model = HistoricalPerformance
     fields = '__all__'
+
+# Historical Performance Rollup Serializer
+# Every metric is returned as {"min", "max", "avg", "last"} for the bucket
+class HistoricalPerformanceRollupSerializer(serializers.ModelSerializer):
+  class Meta:
+    model = HistoricalPerformanceRollup
+    fields = ('vendor', 'resolution', 'bucket_start', 'count', 'last_date')
+
+  def to_representation(self, instance):
+    data = super().to_representation(instance)
+    for field in METRIC_FIELDS:
+      data[field] = {
+        'min': getattr(instance, f'{field}_min'),
+        'max': getattr(instance, f'{field}_max'),
+        'avg': getattr(instance, f'{field}_sum') / instance.count,
+        'last': getattr(instance, f'{field}_last'),
+      }
+    return data
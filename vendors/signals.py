@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Vendor, HistoricalPerformance, RankingWeights
+from .cache import invalidate_vendor, invalidate_vendor_list
+from .ranking import recompute_scores
+from .rollups import add_snapshot
+
+# Signals keeping the vendor caches and rollups fresh
+
+@receiver([post_save, post_delete], sender=Vendor)
+def handle_vendor_change(sender, instance, **kwargs):
+  invalidate_vendor(instance.pk)
+
+@receiver([post_save, post_delete], sender=HistoricalPerformance)
+def handle_historical_performance_change(sender, instance, **kwargs):
+  invalidate_vendor(instance.vendor_id)
+
+# Fold new snapshots into the daily / weekly / monthly rollups
+@receiver(post_save, sender=HistoricalPerformance)
+def handle_historical_performance_created(sender, instance, created, **kwargs):
+  if created:
+    add_snapshot(instance)
+
+# New weights, rank every vendor again
+@receiver(post_save, sender=RankingWeights)
+def handle_ranking_weights_change(sender, instance, **kwargs):
+  recompute_scores()
+  invalidate_vendor_list()
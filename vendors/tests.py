@@ -1,5 +1,13 @@
-from django.test import TestCase
-from .models import Vendor, HistoricalPerformance
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import tempfile
+from unittest import mock
+from vms.instrumentation import registry
+from django.utils import timezone
+from .models import Vendor, HistoricalPerformance, RankingWeights
+from .views import VendorRetrieveUpdateDestroyView
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -7,6 +15,8 @@ from purchase_orders.models import PurchaseOrder
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
 import datetime
+from io import StringIO
+from django.core.management import call_command
 
 # Model Test Cases
 # Vendor Model Test Cases
@@ -22,6 +32,19 @@ class VendorModelTestCase(TestCase):
     self.assertEqual(vendor.address, 'Test Address')
     self.assertEqual(vendor.email, 'test@example.com')
 
+  def test_save_keeps_concurrent_metric_writes(self):
+    vendor = Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address')
+    stale = Vendor.objects.get(pk=vendor.pk)
+    # A purchase order lands while the vendor is being edited
+    PurchaseOrder.objects.create(vendor=vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1, status='completed', completed_at=timezone.now(), quality_rating=4)
+    stale.name = 'Renamed'
+    stale.save()
+    vendor.refresh_from_db()
+    self.assertEqual(vendor.name, 'Renamed')
+    self.assertEqual(vendor.total_pos, 1)
+    self.assertEqual(vendor.quality_rating_avg, 4)
+    self.assertGreater(vendor.score, 0)
+
 # Historical Performance Model Test Cases
 class HistoricalPerformanceModelTestCase(TestCase):
   def setUp(self):
@@ -57,6 +80,16 @@ class VendorListCreateViewTestCase(TestCase):
     self.assertEqual(Vendor.objects.count(), 1)
     self.assertEqual(Vendor.objects.get().name, 'Test Vendor')
 
+  def test_create_vendor_after_explicit_code(self):
+    url = reverse('vendor-list-create')
+    data = {'name': 'Test Vendor', 'mobile_number': '1234567890', 'address': 'Test Address'}
+    codes = []
+    for explicit in ({}, {'vendor_code': 'VN002'}, {}, {}):
+      response = self.client.post(url, {**data, **explicit}, format='json')
+      self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+      codes.append(response.data['vendor_code'])
+    self.assertEqual(codes, ['VN001', 'VN002', 'VN003', 'VN004'])
+
   def test_get_vendors(self):
       Vendor.objects.create(name='Vendor 1', mobile_number='1234567890', address='Address 1')
       Vendor.objects.create(name='Vendor 2', mobile_number='9876543210', address='Address 2')
@@ -65,7 +98,18 @@ class VendorListCreateViewTestCase(TestCase):
       response = self.client.get(url)
 
       self.assertEqual(response.status_code, status.HTTP_200_OK)
-      self.assertEqual(len(response.data), 2)
+      self.assertEqual(len(response.data['results']), 2)
+
+  def test_get_vendors_paginated(self):
+      for i in range(3):
+        Vendor.objects.create(name=f'Vendor {i}', mobile_number='1234567890', address='Address')
+
+      url = reverse('vendor-list-create')
+      response = self.client.get(url, {'page_size': 2})
+      self.assertEqual([v['name'] for v in response.data['results']], ['Vendor 0', 'Vendor 1'])
+      response = self.client.get(response.data['next'])
+      self.assertEqual([v['name'] for v in response.data['results']], ['Vendor 2'])
+      self.assertIsNone(response.data['next'])
 
 # Vendor update views test cases
 class VendorRetrieveUpdateDestroyViewTestCase(TestCase):
@@ -91,6 +135,21 @@ class VendorRetrieveUpdateDestroyViewTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(Vendor.objects.get(pk=self.vendor.pk).name, 'Updated Vendor')
 
+    def test_update_keeps_concurrent_metric_writes(self):
+        url = reverse('vendor-retrieve-update-destroy', kwargs={'pk': self.vendor.pk})
+        get_object = VendorRetrieveUpdateDestroyView.get_object
+        def load_then_create_po(view, *args, **kwargs):
+            vendor = get_object(view, *args, **kwargs)
+            PurchaseOrder.objects.create(vendor=self.vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1)
+            return vendor
+        with mock.patch.object(VendorRetrieveUpdateDestroyView, 'get_object', load_then_create_po):
+            response = self.client.put(url, {'name': 'Updated Vendor', 'fulfillment_rate': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        vendor = Vendor.objects.get(pk=self.vendor.pk)
+        self.assertEqual(vendor.name, 'Updated Vendor')
+        self.assertEqual(vendor.total_pos, 1)
+        self.assertEqual(vendor.fulfillment_rate, 0)  # Derived, not writable
+
     def test_delete_vendor(self):
         url = reverse('vendor-retrieve-update-destroy', kwargs={'pk': self.vendor.pk})
         response = self.client.delete(url)
@@ -99,6 +158,32 @@ class VendorRetrieveUpdateDestroyViewTestCase(TestCase):
         self.assertFalse(Vendor.objects.filter(pk=self.vendor.pk).exists())
 
 # Vendor performance view test cases
+
+    def test_conditional_get(self):
+        url = reverse('vendor-retrieve-update-destroy', kwargs={'pk': self.vendor.pk})
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        # Metric writes from the purchase order signals change the ETag too
+        PurchaseOrder.objects.create(vendor=self.vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_update_with_if_match(self):
+        url = reverse('vendor-retrieve-update-destroy', kwargs={'pk': self.vendor.pk})
+        etag = self.client.get(url)['ETag']
+        response = self.client.put(url, {'name': 'First'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['version'], 2)
+        # A second writer still holding the old ETag is rejected
+        response = self.client.put(url, {'name': 'Second'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(Vendor.objects.get(pk=self.vendor.pk).name, 'First')
+
 class VendorPerformanceViewTestCase(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -118,7 +203,113 @@ class VendorPerformanceViewTestCase(TestCase):
         self.assertEqual(response.data['average_response_time'], 2.5)
         self.assertEqual(response.data['fulfillment_rate'], 0.95)
 
+    def test_performance_is_cached_and_read_only(self):
+        url = reverse('vendor-performance', kwargs={'pk': self.vendor.pk})
+        self.client.get(url)
+        with self.assertNumQueries(0):  # Cached token, no aggregate and no vendor write
+            response = self.client.get(url)
+        self.assertEqual(response.data['quality_rating_avg'], 4.5)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.quality_rating_avg, 0)
+
+    def test_new_history_invalidates_cache(self):
+        url = reverse('vendor-performance', kwargs={'pk': self.vendor.pk})
+        self.client.get(url)
+        HistoricalPerformance.objects.create(vendor=self.vendor, on_time_delivery_rate=0.5, quality_rating_avg=3.5, average_response_time=1.5, fulfillment_rate=0.75)
+        response = self.client.get(url)
+        self.assertAlmostEqual(response.data['on_time_delivery_rate'], 0.7)
+        self.assertAlmostEqual(response.data['quality_rating_avg'], 4.0)
+
+    def test_vendor_without_history_returns_current_metrics(self):
+        vendor = Vendor.objects.create(name='New Vendor', mobile_number='1234567890', address='Address', fulfillment_rate=0.5)
+        response = self.client.get(reverse('vendor-performance', kwargs={'pk': vendor.pk}))
+        self.assertEqual(response.data['fulfillment_rate'], 0.5)
+        response = self.client.get(reverse('vendor-performance', kwargs={'pk': 999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 # Vendor Po's view test cases
+class VendorResponseCacheTestCase(TestCase):
+  def setUp(self):
+    cache.clear()
+    self.client = APIClient()
+    self.user = User.objects.create_user(username='testuser', password='testpassword')
+    self.token = Token.objects.create(user=self.user)
+    self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+    self.vendor = Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address')
+
+  def create_po(self):
+    return PurchaseOrder.objects.create(vendor=self.vendor, order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1)
+
+  def test_vendor_list_cached_until_vendor_changes(self):
+    url = reverse('vendor-list-create')
+    self.client.get(url)
+    with self.assertNumQueries(0):  # Cached token and response
+      response = self.client.get(url)
+    self.assertEqual(len(response.data['results']), 1)
+    # Each page has its own entry
+    self.assertEqual(self.client.get(url, {'page_size': 5}).status_code, status.HTTP_200_OK)
+    Vendor.objects.create(name='Other Vendor', mobile_number='1234567890', address='Test Address')
+    self.assertEqual(len(self.client.get(url).data['results']), 2)
+    self.create_po()  # Metric write
+    response = self.client.get(url)
+    self.assertEqual(response.data['results'][0]['version'], 2)
+
+  def test_vendor_detail_cached_with_etag(self):
+    url = reverse('vendor-retrieve-update-destroy', kwargs={'pk': self.vendor.pk})
+    etag = self.client.get(url)['ETag']
+    with self.assertNumQueries(0):
+      response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    self.client.put(url, {'name': 'Renamed'}, format='json')
+    response = self.client.get(url)
+    self.assertEqual(response.data['name'], 'Renamed')
+    self.assertNotEqual(response['ETag'], etag)
+
+  def test_vendor_pos_invalidated_by_po_writes(self):
+    url = reverse('vendor-pos', kwargs={'pk': self.vendor.pk})
+    self.assertEqual(self.client.get(url).data['pos'], 0)
+    po = self.create_po()
+    self.assertEqual(self.client.get(url).data['pos'], 1)
+    with self.assertNumQueries(0):
+      self.client.get(url)
+    # No metric change, the cached page must still be dropped
+    po.quantity = 7
+    po.save()
+    self.assertEqual(self.client.get(url).data['data'][0]['quantity'], 7)
+    self.vendor.delete()
+    self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+  def test_sparse_fields(self):
+    response = self.client.get(reverse('vendor-list-create'), {'fields': 'id,vendor_code'})
+    self.assertEqual(response.data['results'], [{'id': self.vendor.pk, 'vendor_code': self.vendor.vendor_code}])
+    response = self.client.get(reverse('vendor-retrieve-update-destroy', kwargs={'pk': self.vendor.pk}), {'exclude': 'address,email'})
+    self.assertNotIn('address', response.data)
+    self.assertEqual(response.data['name'], 'Test Vendor')
+    self.create_po()
+    response = self.client.get(reverse('vendor-pos', kwargs={'pk': self.vendor.pk}), {'fields': 'po_number'})
+    self.assertEqual(response.data['data'], [{'po_number': 'PO-001'}])
+    response = self.client.get(reverse('vendor-retrieve-update-destroy', kwargs={'pk': self.vendor.pk}), {'fields': 'total_pos'})
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+  def test_file_based_backend(self):
+    with tempfile.TemporaryDirectory() as location:
+      with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}):
+        url = reverse('vendor-list-create')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+          self.client.get(url)
+        Vendor.objects.create(name='Other Vendor', mobile_number='1234567890', address='Test Address')
+        self.assertEqual(len(self.client.get(url).data['results']), 2)
+
+  def test_hit_and_miss_counters(self):
+    registry.reset()
+    url = reverse('vendor-retrieve-update-destroy', kwargs={'pk': self.vendor.pk})
+    self.client.get(url)
+    self.client.get(url)
+    body = self.client.get(reverse('metrics')).content.decode()
+    self.assertIn('vms_response_cache_requests_total{cache="vendor-detail",result="hit"} 1', body)
+    self.assertIn('vms_response_cache_requests_total{cache="vendor-detail",result="miss"} 1', body)
+
 class VendorPosViewTestCase(TestCase):
   def setUp(self):
     self.client = APIClient()
@@ -139,3 +330,127 @@ class VendorPosViewTestCase(TestCase):
     self.assertEqual(len(response.data['data']), 1)
     self.assertEqual(response.data['data'][0]['po_number'], 'PO-001')
     self.assertEqual(response.data['data'][0]['status'], 'completed')
+
+# Vendor historical performance view test cases
+class VendorHistoricalPerfViewTestCase(TestCase):
+  def setUp(self):
+    self.client = APIClient()
+    self.user = User.objects.create_user(username='testuser', password='testpassword')
+    self.token = Token.objects.create(user=self.user)
+    self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+    self.vendor = Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address')
+    self.url = reverse('vendor-historical', kwargs={'pk': self.vendor.pk})
+    # Monday 2024-05-06 and Tuesday 2024-05-07, then the next week
+    for day, rate in ((6, 0.2), (7, 0.6), (7, 0.4), (14, 1.0)):
+      date = datetime.datetime(2024, 5, day, 12, int(rate * 10), tzinfo=datetime.timezone.utc)
+      HistoricalPerformance.objects.create(vendor=self.vendor, date=date, on_time_delivery_rate=rate, quality_rating_avg=4, average_response_time=10, fulfillment_rate=1)
+
+  def test_weekly_buckets(self):
+    response = self.client.get(self.url, {'bucket': 'week'})
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    weeks = response.data['results']
+    self.assertEqual([week['count'] for week in weeks], [3, 1])
+    self.assertEqual(weeks[0]['bucket_start'], '2024-05-06T00:00:00Z')
+    first_week = weeks[0]['on_time_delivery_rate']
+    self.assertAlmostEqual(first_week['min'], 0.2)
+    self.assertAlmostEqual(first_week['max'], 0.6)
+    self.assertAlmostEqual(first_week['avg'], 0.4)
+    self.assertAlmostEqual(first_week['last'], 0.6)
+
+  def test_rebuild_matches_incremental_rollups(self):
+    before = self.client.get(self.url, {'bucket': 'day'}).data['results']
+    call_command('rebuild_performance_rollups', stdout=StringIO())
+    after = self.client.get(self.url, {'bucket': 'day'}).data['results']
+    self.assertEqual(before, after)
+    self.assertEqual(len(after), 3)
+
+  def test_date_range(self):
+    response = self.client.get(self.url, {'from': '2024-05-07', 'to': '2024-05-07'})
+    self.assertEqual(len(response.data['results']), 2)
+    response = self.client.get(self.url, {'from': '2024-05-08', 'bucket': 'month'})
+    self.assertEqual(response.data['results'][0]['count'], 4)
+    response = self.client.get(self.url, {'bucket': 'year'})
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    response = self.client.get(self.url, {'from': 'yesterday'})
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class VendorRankingTestCase(TestCase):
+  def setUp(self):
+    cache.clear()
+    self.client = APIClient()
+    self.user = User.objects.create(username='testuser', password='testpassword')
+    self.token = Token.objects.create(user=self.user)
+    self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+    now = timezone.now()
+    self.vendors = [Vendor.objects.create(name=f'Vendor {index}', mobile_number='1234567890', address='Test Address') for index in range(3)]
+    # Vendor 0: on time, rated 5 / vendor 1: late, rated 2 / vendor 2: no orders
+    for vendor, rating, delivery in ((self.vendors[0], 5, now + datetime.timedelta(days=1)), (self.vendors[1], 2, now - datetime.timedelta(days=1))):
+      po = PurchaseOrder.objects.create(vendor=vendor, order_date=now, delivery_date=delivery, items={'item1': 1}, quantity=1, status='acknowledged', acknowledgment_date=now)
+      po.complete_order(quality_rating=rating)
+
+  def ranking(self, **params):
+    response = self.client.get(reverse('vendor-ranking'), params)
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    return response.data
+
+  def test_scores_follow_metric_updates(self):
+    data = self.ranking()
+    self.assertEqual([row['id'] for row in data['results']], [vendor.pk for vendor in self.vendors])
+    # 0.35 * 1 + 0.3 * 5/5 + 0.2 * 1 + 0.15 * 1440 / (1440 + ~0)
+    self.assertAlmostEqual(data['results'][0]['score'], 1.0, places=4)
+    self.assertEqual(data['results'][2]['score'], 0)
+    self.assertEqual([row['id'] for row in self.ranking(ordering='-score')['results']], [vendor.pk for vendor in reversed(self.vendors)])
+
+    # A cancelled order lowers vendor 0's fulfillment rate, the cached page is dropped
+    PurchaseOrder.objects.create(vendor=self.vendors[0], order_date=timezone.now(), delivery_date=timezone.now(), items={'item1': 1}, quantity=1, status='cancelled')
+    self.assertAlmostEqual(self.ranking()['results'][0]['score'], 0.9, places=4)
+
+  def test_pagination(self):
+    first = self.ranking(page_size=2)
+    self.assertEqual(len(first['results']), 2)
+    second = self.client.get(first['next']).data
+    self.assertEqual([row['id'] for row in second['results']], [self.vendors[2].pk])
+
+  def test_pagination_through_tied_scores(self):
+    # Vendors without purchase orders all score 0, more of them than DRF's offset_cutoff (1000)
+    Vendor.objects.bulk_create([
+      Vendor(name=f'Idle {index}', mobile_number='1234567890', address='Test Address', vendor_code=f'ID{index:04d}')
+      for index in range(1100)
+    ])
+    expected = list(Vendor.objects.order_by('-score', 'id').values_list('id', flat=True))
+    data = self.ranking(page_size=100)
+    ids = [row['id'] for row in data['results']]
+    while data['next']:
+      self.assertLess(len(ids), len(expected))
+      data = self.client.get(data['next']).data
+      ids.extend(row['id'] for row in data['results'])
+    self.assertEqual(ids, expected)
+
+  def test_weights_change_recomputes_scores(self):
+    response = self.client.put(reverse('vendor-ranking-weights'), {'on_time_delivery_rate': 0, 'quality_rating_avg': 0, 'fulfillment_rate': 0, 'average_response_time': 1}, format='json')
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    scores = dict(Vendor.objects.values_list('pk', 'score'))
+    self.assertAlmostEqual(scores[self.vendors[0].pk], 1, places=4)
+    self.assertAlmostEqual(scores[self.vendors[1].pk], 1, places=4)
+    self.assertEqual(scores[self.vendors[2].pk], 0)
+    self.assertEqual({row['id']: row['score'] for row in self.ranking()['results']}, scores)
+
+    response = self.client.put(reverse('vendor-ranking-weights'), {'average_response_time': 0}, format='json')
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    response = self.client.put(reverse('vendor-ranking-weights'), {'quality_rating_avg': -1}, format='json')
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+  def test_get_weights_does_not_write(self):
+    with CaptureQueriesContext(connection) as queries:
+      response = self.client.get(reverse('vendor-ranking-weights'))
+    self.assertEqual(response.data['quality_rating_avg'], 0.3)
+    self.assertFalse(RankingWeights.objects.exists())
+    self.assertFalse([query for query in queries.captured_queries if not query['sql'].startswith('SELECT')])
+    response = self.client.put(reverse('vendor-ranking-weights'), {'quality_rating_avg': 0.5}, format='json')
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    self.assertEqual(RankingWeights.objects.get().quality_rating_avg, 0.5)
+    self.assertEqual(response.data['on_time_delivery_rate'], 0.35)
+
+  def test_score_not_exposed_by_vendor_api(self):
+    response = self.client.get(reverse('vendor-retrieve-update-destroy', kwargs={'pk': self.vendors[0].pk}))
+    self.assertNotIn('score', response.data)
@@ -4,6 +4,9 @@ from .views import *
 # Urls
 urlpatterns = [
     path('', VendorListCreateView.as_view(), name='vendor-list-create'),
+    path('ranking', VendorRankingView.as_view(), name='vendor-ranking'),
+    path('ranking/weights', RankingWeightsView.as_view(), name='vendor-ranking-weights'),
+    path('historical_perf/export', HistoricalPerformanceExportView.as_view(), name='vendor-historical-export'),
     path('<int:pk>/', VendorRetrieveUpdateDestroyView.as_view(), name='vendor-retrieve-update-destroy'),
     path('<int:pk>/performance',VendorPerformanceView.as_view(), name='vendor-performance'),
     path('<int:pk>/pos',VendorPosView.as_view(), name='vendor-pos'),
@@ -1,20 +1,44 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Vendor, HistoricalPerformance
-from .serializers import VendorSerializer, HistoricalPerformanceSerializer
+import datetime
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Vendor, HistoricalPerformance, HistoricalPerformanceRollup, RankingWeights, METRIC_FIELDS
+from .serializers import VendorSerializer, HistoricalPerformanceSerializer, HistoricalPerformanceRollupSerializer, VendorRankingSerializer, RankingWeightsSerializer
+from .rollups import RESOLUTIONS, bucket_start
+from .cache import get_performance, set_performance, response_key, get_response, set_response
+from django.db.models import Avg, Count
 from purchase_orders.models import PurchaseOrder
 from purchase_orders.serializers import PurchaseOrderSerializer
+from django.db import transaction
+from vms.pagination import KeysetPagination, wants_stream, streaming_response
+from vms.fast_serializers import FastSerializer
+from vms.conditional import ETAG_FIELDS, etag, not_modified, precondition_failed, with_etag
+from vms.exports import export_options, export_response
+from .filters import HistoricalPerformanceFilter
 
 # api/vendors/
 class VendorListCreateView(APIView):
-  # GET Request to fetch Vendors
+  # GET Request to fetch Vendors, one page at a time
   # Headers : Authorization : Token {auth_token}
-  # Usage : GET http://localhost:5000/api/vendors/
+  # Usage : GET http://localhost:5000/api/vendors/?page_size=100
+  #         GET http://localhost:5000/api/vendors/?stream=1 (all vendors as a streamed JSON array)
+  #         GET http://localhost:5000/api/vendors/?fields=id,name,vendor_code (or ?exclude=address)
   def get(self, request):
-    vendors = Vendor.objects.all()
-    serializer = VendorSerializer(vendors, many=True)
-    return Response(serializer.data)
+    paginator = KeysetPagination()
+    fields = VendorSerializer.sparse_fields(request)
+    vendors = VendorSerializer.narrow_queryset(Vendor.objects.all(), fields, paginator.get_ordering(request, None, self))
+    if wants_stream(request):
+      return streaming_response(paginator.get_ordered_queryset(vendors, request, self), VendorSerializer, serializer_kwargs={'fields': fields})
+    key = response_key('vendor-list', request)
+    data = get_response('vendor-list', key)
+    if data is None:
+      page = paginator.paginate_queryset(vendors, request, view=self)
+      serializer = VendorSerializer(page, many=True, fields=fields)
+      data = paginator.get_paginated_response(serializer.data).data
+      set_response(key, data)
+    return Response(data)
 
   # POST Request to create new Vendor
   # Headers : Authorization : Token {auth_token}
@@ -26,38 +50,94 @@ class VendorListCreateView(APIView):
       return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# api/vendors/ranking
+class VendorRankingView(APIView):
+  # Best score first, ?ordering=-score for the lowest first (index vendor_score_idx)
+  cursor_orderings = {'score': ('-score', 'id')}
+
+  # GET Request to fetch Vendors ranked by their weighted performance score, one page at a time
+  # Headers : Authorization : Token {auth_token}
+  # Usage : GET http://localhost:5000/api/vendors/ranking?page_size=50
+  def get(self, request):
+    key = response_key('vendor-ranking', request)
+    data = get_response('vendor-ranking', key)
+    if data is None:
+      paginator = KeysetPagination()
+      serializer = FastSerializer(VendorRankingSerializer)
+      rows = serializer.values(Vendor.objects.all(), paginator.get_ordering(request, None, self))
+      page = paginator.paginate_queryset(rows, request, view=self)
+      data = paginator.get_paginated_response(serializer.serialize(page)).data
+      set_response(key, data)
+    return Response(data)
+
+# api/vendors/ranking/weights
+class RankingWeightsView(APIView):
+  # GET Request to fetch the weights of the ranking score
+  # Headers : Authorization : Token {auth_token}
+  # Usage : GET http://localhost:5000/api/vendors/ranking/weights
+  def get(self, request):
+    return Response(RankingWeightsSerializer(RankingWeights.current()).data)
+
+  # PUT Request to change the weights, every vendor's score is recomputed
+  # Headers : Authorization : Token {auth_token}
+  # Usage : PUT http://localhost:5000/api/vendors/ranking/weights {"on_time_delivery_rate": 0.5, ...}
+  def put(self, request):
+    with transaction.atomic():
+      serializer = RankingWeightsSerializer(RankingWeights.current(), data=request.data, partial=True)
+      if serializer.is_valid():
+        serializer.save()
+        return Response(serializer.data)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 # api/vendors/:id
 class VendorRetrieveUpdateDestroyView(APIView):
   # Get Object using id
-  def get_object(self, pk):
+  def get_object(self, pk, for_update=False, queryset=None):
     try:
-      return Vendor.objects.get(pk=pk)
+      vendors = queryset if queryset is not None else Vendor.objects.all()
+      if for_update:
+        vendors = vendors.select_for_update()
+      return vendors.get(pk=pk)
     except Vendor.DoesNotExist:
       raise 'Http404'
 
   # GET Request to fetch Vendor details using ID
   # Headers : Authorization : Token {auth_token}
-  # Usage : GET http://localhost:5000/api/vendors/{id}
+  #           If-None-Match : {etag} (optional, 304 when unchanged)
+  # Usage : GET http://localhost:5000/api/vendors/{id}[?fields=id,name]
   def get(self, request, pk):
+    fields = VendorSerializer.sparse_fields(request)
     try:
-      vendor = self.get_object(pk)
-      serializer = VendorSerializer(vendor)
-      return Response(serializer.data)
+      key = response_key('vendor-detail', request, pk)
+      cached = get_response('vendor-detail', key)
+      if cached is None:
+        vendor = self.get_object(pk, queryset=VendorSerializer.narrow_queryset(Vendor.objects.all(), fields, ETAG_FIELDS))
+        cached = {'data': VendorSerializer(vendor, fields=fields).data, 'etag': etag(vendor)}
+        set_response(key, cached)
+      unchanged = not_modified(request, cached['etag'])
+      if unchanged:
+        return unchanged
+      return with_etag(Response(cached['data']), cached['etag'])
     except:
       res = {"message":"Vendor doesn't exist!"}
       return Response(res,status=status.HTTP_400_BAD_REQUEST)
 
   # PUT Request to update vendor details
   # Headers : Authorization : Token {auth_token}
+  #           If-Match : {etag} (optional, 412 when the vendor changed since it was read)
   # Usage : PUT http://localhost:5000/api/vendors/{id} data-to-update
   def put(self, request, pk):
     try:
-      vendor = self.get_object(pk)
-      serializer = VendorSerializer(vendor, data=request.data, partial=True)
-      if serializer.is_valid():
-        serializer.save()
-        return Response(serializer.data)
-      return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+      with transaction.atomic():
+        vendor = self.get_object(pk, for_update='If-Match' in request.headers)
+        changed = precondition_failed(request, etag(vendor))
+        if changed:
+          return changed
+        serializer = VendorSerializer(vendor, data=request.data, partial=True)
+        if serializer.is_valid():
+          serializer.save()
+          return with_etag(Response(serializer.data), etag(vendor))
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except:
       res = {"message":"Vendor doesn't exist!"}
       return Response(res,status=status.HTTP_400_BAD_REQUEST)
@@ -79,71 +159,135 @@ class VendorRetrieveUpdateDestroyView(APIView):
 # api/vendors/:id/performance
 class VendorPerformanceView(APIView):
   # GET Request to fetch Vendor's performance metrics
+  # Averages of the vendor's historical performance, or its current metrics when it has no history yet
   # Headers : Authorization : Token {auth_token}
   # Usage : GET http://localhost:5000/api/vendors/{id}/performance
   def get(self, request, pk):
-    try:
-      vendor = Vendor.objects.get(pk=pk)
-    except Vendor.DoesNotExist:
-      raise 'Http404'
-
-    # Check if historical data exists for the vendor
-    historical_data = HistoricalPerformance.objects.filter(vendor=vendor)
-    if historical_data.exists():
-        # Calculate average metrics from historical data
-        total_on_time_delivery_rate = 0
-        total_quality_rating_avg = 0
-        total_average_response_time = 0
-        total_fulfillment_rate = 0
-        num_data_points = historical_data.count()
-        for data_point in historical_data:
-            total_on_time_delivery_rate += data_point.on_time_delivery_rate
-            total_quality_rating_avg += data_point.quality_rating_avg
-            total_average_response_time += data_point.average_response_time
-            total_fulfillment_rate += data_point.fulfillment_rate
-
-        # Update vendor's performance metrics
-        vendor.on_time_delivery_rate = total_on_time_delivery_rate / num_data_points
-        vendor.quality_rating_avg = total_quality_rating_avg / num_data_points
-        vendor.average_response_time = total_average_response_time / num_data_points
-        vendor.fulfillment_rate = total_fulfillment_rate / num_data_points
-        vendor.save()
-
-    # Return vendor's performance metrics
-    performance_data = {
-        'on_time_delivery_rate': vendor.on_time_delivery_rate,
-        'quality_rating_avg': vendor.quality_rating_avg,
-        'average_response_time': vendor.average_response_time,
-        'fulfillment_rate': vendor.fulfillment_rate,
-    }
+    performance_data = get_performance(pk)
+    if performance_data is None:
+      performance_data = HistoricalPerformance.objects.filter(vendor_id=pk).aggregate(
+        data_points=Count('id'),
+        **{field: Avg(field) for field in METRIC_FIELDS}
+      )
+      if not performance_data.pop('data_points'):
+        try:
+          performance_data = Vendor.objects.values(*METRIC_FIELDS).get(pk=pk)
+        except Vendor.DoesNotExist:
+          return Response({'error': 'Vendor not found'}, status=status.HTTP_404_NOT_FOUND)
+      set_performance(pk, performance_data)
     return Response(performance_data)
 
 # api/vendors/:id/pos
 class VendorPosView(APIView):
-  # GET Request to fetch all Purchase Order's associated to Vendor
+  cursor_orderings = {'id': ('id',), 'issue_date': ('issue_date', 'id')}
+
+  # GET Request to fetch the Purchase Order's associated to Vendor, one page at a time
   # Headers : Authorization : Token {auth_token}
-  # Usage : GET http://localhost:5000/api/vendors/{id}/pos
+  # Usage : GET http://localhost:5000/api/vendors/{id}/pos?page_size=100
+  #         GET http://localhost:5000/api/vendors/{id}/pos?stream=1 (all POs as a streamed JSON array)
+  #         GET http://localhost:5000/api/vendors/{id}/pos?exclude=items
   def get(self, request, pk):
-    try:
-      vendor = Vendor.objects.get(pk=pk)
-    except Vendor.DoesNotExist:
+    fields = PurchaseOrderSerializer.sparse_fields(request)
+    stream = wants_stream(request)
+    if not stream:
+      key = response_key('vendor-pos', request, pk)
+      res = get_response('vendor-pos', key)
+      if res is not None:
+        return Response(res)
+    if not Vendor.objects.filter(pk=pk).exists():
       return Response({'error': 'Vendor not found'}, status=status.HTTP_404_NOT_FOUND)
-    pos = PurchaseOrder.objects.filter(vendor=vendor)
-    serializer = PurchaseOrderSerializer(pos, many=True)
-    res = {"pos":pos.count(),"data":serializer.data}
+    paginator = KeysetPagination()
+    pos = PurchaseOrder.objects.filter(vendor_id=pk)
+    serializer = FastSerializer(PurchaseOrderSerializer, fields)
+    rows = serializer.values(pos, paginator.get_ordering(request, None, self))
+    if stream:
+      return streaming_response(paginator.get_ordered_queryset(rows, request, self), serializer)
+    page = paginator.paginate_queryset(rows, request, view=self)
+    res = {
+      "pos": pos.count(),
+      "next": paginator.get_next_link(),
+      "previous": paginator.get_previous_link(),
+      "data": serializer.serialize(page),
+    }
+    set_response(key, res)
     return Response(res)
   
 # api/vendors/:id/historical_perf
 class VendorHistoricalPerfView(APIView):
-  # GET Request to fetch Historical Performance of Vendor
+  # GET Request to fetch Historical Performance of Vendor, one page at a time
   # Headers : Authorization : Token {auth_token}
-  # Usage : GET http://localhost:5000/api/vendors/{id}/historical_perf
+  # Usage : GET http://localhost:5000/api/vendors/{id}/historical_perf?from=2024-01-01&to=2024-12-31
+  #         GET http://localhost:5000/api/vendors/{id}/historical_perf?from=2024-01-01&bucket=week (min/max/avg/last per week)
   def get(self, request, pk):
-    try:
-      vendor = Vendor.objects.get(pk=pk)
-      historicPerformance = HistoricalPerformance.objects.filter(vendor=vendor)
-      serializer = HistoricalPerformanceSerializer(historicPerformance, many=True)
-      return Response(serializer.data,status=status.HTTP_200_OK)
-    except Vendor.DoesNotExist:
+    if not Vendor.objects.filter(pk=pk).exists():
       return Response({'error': 'Vendor not found'}, status=status.HTTP_404_NOT_FOUND)
-    
+    paginator = KeysetPagination()
+    try:
+      rows, serializer_class = historical_rows(pk, request.query_params, paginator)
+    except ValueError as e:
+      return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    page = paginator.paginate_queryset(rows, request, view=self)
+    serializer = serializer_class(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+# api/vendors/historical_perf/export
+class HistoricalPerformanceExportView(APIView):
+  columns = ('id', 'vendor', 'date', *METRIC_FIELDS)
+
+  # GET Request to download the Historical Performance of all Vendors as CSV or NDJSON, streamed
+  # Headers : Authorization : Token {auth_token}
+  # Usage : GET http://localhost:5000/api/vendors/historical_perf/export?output=csv|ndjson[&compress=gzip][&vendor=1&date_after=2024-01-01&date_before=2024-02-01]
+  def get(self, request):
+    try:
+      fmt, compress = export_options(request.query_params)
+    except ValueError as e:
+      return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    filterset = HistoricalPerformanceFilter(request.query_params, queryset=HistoricalPerformance.objects.order_by('vendor_id', 'date'))
+    if not filterset.is_valid():
+      return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+    return export_response(filterset.qs, self.columns, fmt, 'historical_performance', compress)
+
+# Snapshots (or ?bucket= rollups) of a vendor within ?from= / ?to=, and their serializer.
+# Sets the paginator's ordering, raises ValueError for invalid parameters.
+def historical_rows(pk, params, paginator):
+  date_from, date_to = parse_date_range(params)
+  bucket = params.get('bucket')
+  if bucket:
+    if bucket not in RESOLUTIONS:
+      raise ValueError(f"bucket must be one of {', '.join(RESOLUTIONS)}")
+    rows = HistoricalPerformanceRollup.objects.filter(vendor_id=pk, resolution=bucket)
+    if date_from:
+      rows = rows.filter(bucket_start__gte=bucket_start(date_from, bucket))
+    if date_to:
+      rows = rows.filter(bucket_start__lte=date_to)
+    paginator.orderings = {'bucket_start': ('bucket_start',)}
+    return rows, HistoricalPerformanceRollupSerializer
+  rows = HistoricalPerformance.objects.filter(vendor_id=pk)
+  if date_from:
+    rows = rows.filter(date__gte=date_from)
+  if date_to:
+    rows = rows.filter(date__lte=date_to)
+  paginator.orderings = {'date': ('date',)}
+  return rows, HistoricalPerformanceSerializer
+
+# Parse the optional ?from= / ?to= parameters (ISO dates or datetimes, UTC when naive)
+def parse_date_range(params):
+  bounds = []
+  for name, end_of_day in (('from', False), ('to', True)):
+    value = params.get(name)
+    if not value:
+      bounds.append(None)
+      continue
+    try:
+      day = parse_date(value)
+      parsed = parse_datetime(value) if day is None else None
+    except ValueError:
+      day = parsed = None
+    if day is not None:
+      parsed = datetime.datetime.combine(day, datetime.time.max if end_of_day else datetime.time.min)
+    if parsed is None:
+      raise ValueError(f'Invalid {name} date: {value}')
+    if timezone.is_naive(parsed):
+      parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+    bounds.append(parsed)
+  return bounds
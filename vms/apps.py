@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class VmsConfig(AppConfig):
+    name = 'vms'
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import checks, signals
+        from .authentication import token_cache
+        from .db import configure_sqlite
+        from .instrumentation import registry
+        connection_created.connect(configure_sqlite, dispatch_uid='vms.db.configure_sqlite')
+        registry.register_gauge('vms_auth_token_cache_entries', 'Tokens in the in-process authentication cache.', lambda: len(token_cache))
@@ -0,0 +1,57 @@
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.authentication import get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from .authentication import token_cache
+from .renderers import FastJSONRenderer
+
+# Async read endpoints, served under api/async/
+#
+# DRF's APIView is synchronous: under ASGI every request holds a thread while
+# it waits for the database. AsyncAPIView is a plain async Django view doing
+# what APIView does for the read endpoints: token authentication through the
+# async ORM, query parameters through DRF's Request and rendering with the
+# API's JSON renderer, so the responses match the synchronous endpoints.
+
+async def authenticate(request):
+  """The user of the request's `Authorization: Token <key>` header, as CachedTokenAuthentication resolves it."""
+  auth = get_authorization_header(request).split()
+  if not auth or auth[0].lower() != b'token':
+    raise exceptions.NotAuthenticated()
+  if len(auth) != 2:
+    raise exceptions.AuthenticationFailed('Invalid token header.')
+  try:
+    key = auth[1].decode()
+  except UnicodeError:
+    raise exceptions.AuthenticationFailed('Invalid token.')
+  token = token_cache.get(key)
+  if token is not None:
+    return token.user
+  try:
+    token = await Token.objects.select_related('user').aget(key=key)
+  except Token.DoesNotExist:
+    raise exceptions.AuthenticationFailed('Invalid token.')
+  if not token.user.is_active:
+    raise exceptions.AuthenticationFailed('User inactive or deleted.')
+  token_cache.set(key, token)
+  return token.user
+
+def render(data, status=status.HTTP_200_OK, headers=None):
+  return HttpResponse(FastJSONRenderer().render(data), status=status, headers=headers, content_type='application/json')
+
+class AsyncAPIView(View):
+  http_method_names = ['get', 'options']
+
+  async def dispatch(self, request, *args, **kwargs):
+    try:
+      user = await authenticate(request)
+    except (exceptions.NotAuthenticated, exceptions.AuthenticationFailed) as e:
+      return render({'detail': e.detail}, e.status_code, {'WWW-Authenticate': 'Token'})
+    request = Request(request)
+    request.user = user
+    try:
+      return await super().dispatch(request, *args, **kwargs)
+    except exceptions.ValidationError as e:
+      return render(e.detail, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,93 @@
+import collections
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from . import instrumentation  # Module import, instrumentation loads DRF views which load this module
+
+# Token authentication without the per-request Token + User query.
+#
+# Resolved tokens (with their user) are kept in an in-process LRU for
+# AUTH_TOKEN_CACHE_TTL seconds and, with AUTH_TOKEN_CACHE_SHARED, in the
+# default cache shared by the processes of a deployment. vms.signals drops
+# the entries of deleted tokens and of deleted or changed (e.g. deactivated)
+# users; other processes' in-process entries expire within the TTL.
+
+def shared_key(key):
+  return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+class TokenCache:
+  def __init__(self):
+    self.entries = collections.OrderedDict()  # key -> (token, expires)
+    self.lock = threading.Lock()
+
+  def __len__(self):
+    return len(self.entries)
+
+  def get(self, key):
+    """The cached Token (user attached) of a key, None when it has to be looked up."""
+    now = time.monotonic()
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is not None and entry[1] > now:
+        self.entries.move_to_end(key)
+        token = entry[0]
+      else:
+        token = None
+        if entry is not None:
+          del self.entries[key]
+    instrumentation.registry.inc('vms_auth_token_cache_requests_total', 'Token authentication cache lookups.', layer='local', result='miss' if token is None else 'hit')
+    if token is None and settings.AUTH_TOKEN_CACHE_SHARED:
+      token = cache.get(shared_key(key))
+      instrumentation.registry.inc('vms_auth_token_cache_requests_total', 'Token authentication cache lookups.', layer='shared', result='miss' if token is None else 'hit')
+      if token is not None:
+        self.store(key, token)
+    return token
+
+  def set(self, key, token):
+    self.store(key, token)
+    if settings.AUTH_TOKEN_CACHE_SHARED:
+      cache.set(shared_key(key), token, settings.AUTH_TOKEN_CACHE_SHARED_TTL)
+
+  def store(self, key, token):
+    with self.lock:
+      self.entries[key] = (token, time.monotonic() + settings.AUTH_TOKEN_CACHE_TTL)
+      self.entries.move_to_end(key)
+      while len(self.entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+        self.entries.popitem(last=False)
+
+  def invalidate(self, keys):
+    keys = list(keys)
+    with self.lock:
+      for key in keys:
+        self.entries.pop(key, None)
+    if settings.AUTH_TOKEN_CACHE_SHARED:
+      cache.delete_many([shared_key(key) for key in keys])
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+
+token_cache = TokenCache()
+
+# Drop cached tokens now and again once the surrounding transaction commits,
+# so a concurrent request cannot re-cache the old state in between
+def invalidate_tokens(keys):
+  keys = list(keys)
+  if keys:
+    token_cache.invalidate(keys)
+    transaction.on_commit(lambda: token_cache.invalidate(keys))
+
+class CachedTokenAuthentication(TokenAuthentication):
+  """TokenAuthentication serving repeated tokens from token_cache."""
+
+  def authenticate_credentials(self, key):
+    token = token_cache.get(key)
+    if token is not None:
+      return (token.user, token)
+    user, token = super().authenticate_credentials(key)
+    token_cache.set(key, token)
+    return (user, token)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends whose entries are not seen by the other processes
+PROCESS_LOCAL_CACHES = (
+  'django.core.cache.backends.locmem.LocMemCache',
+  'django.core.cache.backends.dummy.DummyCache',
+)
+
+# The sticky-primary marks of vms.routers live in the default cache: with a
+# per-process backend, the next request of a client that just wrote may land
+# on another process and read from the lagging replica.
+@register()
+def check_replica_cache(app_configs, **kwargs):
+  if getattr(settings, 'REPLICA_DATABASE', None) is None:
+    return []
+  backend = settings.CACHES['default']['BACKEND']
+  if backend not in PROCESS_LOCAL_CACHES:
+    return []
+  return [Error(
+    f'REPLICA_DATABASE needs a default cache shared by all processes, {backend} is per process.',
+    hint="Set VMS_CACHE=file for the processes of one host, or configure a shared cache (Redis, Memcached).",
+    id='vms.E001',
+  )]
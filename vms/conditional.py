@@ -0,0 +1,47 @@
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+# Conditional requests for resources carrying `version` and `updated_at`.
+#
+# The strong ETag is built from the primary key, the version and the update
+# time, so it is known as soon as the row is loaded: a matching If-None-Match
+# is answered with 304 before anything is serialized, and If-Match on writes
+# gives optimistic concurrency without hashing response bodies.
+
+# Columns etag() reads, to keep when narrowing a query with only()
+ETAG_FIELDS = ('version', 'updated_at')
+
+def etag(instance):
+  return f'"{instance.pk}-{instance.version}-{int(instance.updated_at.timestamp() * 1000000)}"'
+
+def _matches(header, current, weak):
+  etags = parse_etags(header)
+  if etags == ['*']:
+    return True
+  if weak:
+    etags = [value.removeprefix('W/') for value in etags]
+  return current in etags
+
+# The helpers below take the current ETag (etag(instance)), which may also
+# come from a cached response
+
+def not_modified(request, current):
+  """304 response when If-None-Match (weak comparison) matches the current ETag, else None."""
+  header = request.headers.get('If-None-Match')
+  if header and _matches(header, current, weak=True):
+    return with_etag(HttpResponseNotModified(), current)
+  return None
+
+def precondition_failed(request, current):
+  """412 response when If-Match (strong comparison) does not match the current ETag, else None."""
+  header = request.headers.get('If-Match')
+  if header and not _matches(header, current, weak=False):
+    response = Response({'error': 'Precondition failed, the resource has changed'}, status=status.HTTP_412_PRECONDITION_FAILED)
+    return with_etag(response, current)
+  return None
+
+def with_etag(response, current):
+  response['ETag'] = current
+  return response
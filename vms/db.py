@@ -0,0 +1,14 @@
+from django.conf import settings
+
+# Per connection database setup, connected to connection_created in VmsConfig.ready()
+
+def configure_sqlite(sender, connection, **kwargs):
+  """Apply settings.SQLITE_PRAGMAS to a new SQLite connection."""
+  if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+    return
+  with connection.cursor() as cursor:
+    for name, value in settings.SQLITE_PRAGMAS.items():
+      # journal_mode=WAL is persistent and has no effect on in-memory databases
+      if name == 'journal_mode' and connection.is_in_memory_db():
+        continue
+      cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,88 @@
+import datetime
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Read-only fast path for list endpoints.
+#
+# A ModelSerializer with many=True copies its field objects for every row and
+# walks them through get_attribute() / to_representation(). FastSerializer
+# inspects the serializer once, fetches the matching columns with values()
+# and converts each row with a precompiled converter per field (datetimes,
+# floats; everything the database already returns in its JSON form is
+# passed through). The output matches the serializer's, and rendered with
+# the same JSON settings it is byte-identical.
+
+# Field types whose database value already is their representation
+_PASSTHROUGH = (
+  serializers.IntegerField,
+  serializers.CharField,
+  serializers.ChoiceField,
+)
+
+class FastSerializer:
+  def __init__(self, serializer_class, fields=None):
+    serializer = serializer_class(fields=fields) if fields is not None else serializer_class()
+    self.columns = []
+    for name, field in serializer.fields.items():
+      if field.write_only:
+        continue
+      if field.source == '*' or '.' in field.source:
+        raise TypeError(f'{serializer_class.__name__}.{name}: only model columns are supported by FastSerializer.')
+      self.columns.append((name, field.source, field))
+    self.sources = tuple(dict.fromkeys(source for _, source, _ in self.columns))
+
+  def values(self, queryset, also=()):
+    """The queryset as values() rows holding the serialized columns plus `also` (e.g. ordering fields)."""
+    extra = tuple(name.lstrip('-') for name in also)
+    return queryset.values(*dict.fromkeys(self.sources + extra))
+
+  def converters(self):
+    """[(name, column, converter or None)], resolved for the active time zone."""
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    return [(name, source, _converter(field, tz)) for name, source, field in self.columns]
+
+  def serialize(self, rows):
+    """Representations of values() rows, equal to serializer_class(instances, many=True).data."""
+    converters = self.converters()
+    return [
+      {name: value if (value := row[source]) is None or convert is None else convert(value) for name, source, convert in converters}
+      for row in rows
+    ]
+
+def _converter(field, tz):
+  if isinstance(field, serializers.DateTimeField):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_tz = getattr(field, 'timezone', tz)
+    if output_format is None or output_format.lower() != ISO_8601 or field_tz is None:
+      return field.to_representation
+    return _iso_datetime(field_tz)
+  if isinstance(field, serializers.FloatField):
+    return float
+  if isinstance(field, serializers.JSONField):
+    return field.to_representation if field.binary else None
+  if isinstance(field, serializers.PrimaryKeyRelatedField):
+    if field.pk_field is not None:
+      raise TypeError(f'{field.field_name}: pk_field is not supported by FastSerializer.')
+    return None  # values() already returns the related primary key
+  if isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField, serializers.BaseSerializer, serializers.SerializerMethodField)):
+    raise TypeError(f'{field.field_name}: {type(field).__name__} is not supported by FastSerializer.')
+  if isinstance(field, _PASSTHROUGH):
+    return None
+  return field.to_representation
+
+def _iso_datetime(tz):
+  if tz is datetime.timezone.utc or getattr(tz, 'key', None) == 'UTC':
+    # Database values usually are UTC already, skip the conversion
+    utc = datetime.timezone.utc
+    def convert_utc(value):
+      if value.tzinfo is not utc:
+        value = value.astimezone(utc) if timezone.is_aware(value) else value.replace(tzinfo=utc)
+      return value.isoformat()[:-6] + 'Z'
+    return convert_utc
+
+  def convert(value):
+    value = value.astimezone(tz).isoformat() if timezone.is_aware(value) else timezone.make_aware(value, tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+  return convert
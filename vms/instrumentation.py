@@ -0,0 +1,232 @@
+import bisect
+import contextvars
+import functools
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.views import APIView
+
+# Per-route request instrumentation served in the Prometheus text format.
+#
+# RequestMetricsMiddleware times every request, counts its SQL queries and SQL
+# time through connection.execute_wrapper, and collects the time spent in
+# signal handlers decorated with @timed_signal. Aggregates live in memory per
+# process and are exposed by MetricsView at /metrics.
+
+logger = logging.getLogger('vms.slow_queries')
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = contextvars.ContextVar('vms_request_stats', default=None)
+
+# Counters of the request being served
+class RequestStats:
+  __slots__ = ('queries', 'sql_time', 'signal_time', 'slow_threshold')
+
+  def __init__(self, slow_threshold=None):
+    self.queries = 0
+    self.sql_time = 0.0
+    self.signal_time = 0.0
+    self.slow_threshold = slow_threshold
+
+  def __call__(self, execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+      return execute(sql, params, many, context)
+    finally:
+      elapsed = time.perf_counter() - started
+      self.queries += 1
+      self.sql_time += elapsed
+      if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+        logger.warning('Slow query (%.1f ms) on %s: %s', elapsed * 1000, context['connection'].alias, sql)
+
+# Aggregates per (route, method)
+class RouteMetrics:
+  __slots__ = ('buckets', 'count', 'latency', 'queries', 'sql_time', 'signal_time', 'errors')
+
+  def __init__(self):
+    self.buckets = [0] * len(LATENCY_BUCKETS)
+    self.count = 0
+    self.latency = 0.0
+    self.queries = 0
+    self.sql_time = 0.0
+    self.signal_time = 0.0
+    self.errors = 0
+
+class Registry:
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.routes = {}
+    self.signals = {}
+    self.gauges = []
+    self.counters = {}
+
+  def observe_request(self, route, method, status_code, latency, stats):
+    with self.lock:
+      metrics = self.routes.get((route, method))
+      if metrics is None:
+        metrics = self.routes[(route, method)] = RouteMetrics()
+      index = bisect.bisect_left(LATENCY_BUCKETS, latency)
+      if index < len(LATENCY_BUCKETS):
+        metrics.buckets[index] += 1
+      metrics.count += 1
+      metrics.latency += latency
+      metrics.queries += stats.queries
+      metrics.sql_time += stats.sql_time
+      metrics.signal_time += stats.signal_time
+      if status_code >= 500:
+        metrics.errors += 1
+
+  def observe_signal(self, handler, elapsed):
+    with self.lock:
+      calls, total = self.signals.get(handler, (0, 0.0))
+      self.signals[handler] = (calls + 1, total + elapsed)
+
+  # Free-form labelled counter, e.g. inc('vms_cache_requests_total', 'help', cache='x', result='hit')
+  def inc(self, name, help_text, amount=1, **labels):
+    key = tuple(sorted(labels.items()))
+    with self.lock:
+      _, values = self.counters.setdefault(name, (help_text, {}))
+      values[key] = values.get(key, 0) + amount
+
+  # Gauge computed at scrape time, func returns a number
+  def register_gauge(self, name, help_text, func):
+    self.gauges.append((name, help_text, func))
+
+  def reset(self):
+    with self.lock:
+      self.routes.clear()
+      self.signals.clear()
+      self.counters.clear()
+
+  def render(self):
+    with self.lock:
+      routes = sorted(self.routes.items())
+      signals = sorted(self.signals.items())
+      counters = [(name, help_text, sorted(values.items())) for name, (help_text, values) in sorted(self.counters.items())]
+    lines = []
+
+    def header(name, kind, help_text):
+      lines.append(f'# HELP {name} {help_text}')
+      lines.append(f'# TYPE {name} {kind}')
+
+    header('vms_http_request_duration_seconds', 'histogram', 'Request latency per route.')
+    for (route, method), metrics in routes:
+      labels = f'route="{route}",method="{method}"'
+      cumulative = 0
+      for bound, count in zip(LATENCY_BUCKETS, metrics.buckets):
+        cumulative += count
+        lines.append(f'vms_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+      lines.append(f'vms_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {metrics.count}')
+      lines.append(f'vms_http_request_duration_seconds_sum{{{labels}}} {metrics.latency}')
+      lines.append(f'vms_http_request_duration_seconds_count{{{labels}}} {metrics.count}')
+    for name, attribute, help_text in (
+      ('vms_http_sql_queries_total', 'queries', 'SQL queries issued per route.'),
+      ('vms_http_sql_seconds_total', 'sql_time', 'Time spent executing SQL per route.'),
+      ('vms_http_signal_seconds_total', 'signal_time', 'Time spent in instrumented signal handlers per route.'),
+      ('vms_http_server_errors_total', 'errors', 'Responses with a 5xx status per route.'),
+    ):
+      header(name, 'counter', help_text)
+      for (route, method), metrics in routes:
+        lines.append(f'{name}{{route="{route}",method="{method}"}} {getattr(metrics, attribute)}')
+    header('vms_signal_handler_calls_total', 'counter', 'Calls of instrumented signal handlers.')
+    for handler, (calls, _) in signals:
+      lines.append(f'vms_signal_handler_calls_total{{handler="{handler}"}} {calls}')
+    header('vms_signal_handler_seconds_total', 'counter', 'Time spent in instrumented signal handlers.')
+    for handler, (_, total) in signals:
+      lines.append(f'vms_signal_handler_seconds_total{{handler="{handler}"}} {total}')
+    for name, help_text, values in counters:
+      header(name, 'counter', help_text)
+      for labels, value in values:
+        label_text = ','.join(f'{label}="{label_value}"' for label, label_value in labels)
+        lines.append(f'{name}{{{label_text}}} {value}')
+    for name, help_text, func in self.gauges:
+      header(name, 'gauge', help_text)
+      lines.append(f'{name} {func()}')
+    return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+# Decorator timing a signal receiver, attributed to the current request if any
+def timed_signal(handler):
+  @functools.wraps(handler)
+  def wrapper(*args, **kwargs):
+    started = time.perf_counter()
+    try:
+      return handler(*args, **kwargs)
+    finally:
+      elapsed = time.perf_counter() - started
+      registry.observe_signal(handler.__name__, elapsed)
+      stats = _current.get()
+      if stats is not None:
+        stats.signal_time += elapsed
+  return wrapper
+
+def slow_query_threshold():
+  threshold_ms = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+  return threshold_ms / 1000 if threshold_ms is not None else None
+
+class RequestMetricsMiddleware:
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    if iscoroutinefunction(get_response):
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if iscoroutinefunction(self):
+      return self.__acall__(request)
+    stats = RequestStats(slow_query_threshold())
+    token = _current.set(stats)
+    started = time.perf_counter()
+    try:
+      with ExitStack() as stack:
+        _wrap_connections(stack, stats)
+        response = self.get_response(request)
+    finally:
+      _current.reset(token)
+    self.observe(request, response, time.perf_counter() - started, stats)
+    return response
+
+  async def __acall__(self, request):
+    stats = RequestStats(slow_query_threshold())
+    token = _current.set(stats)
+    started = time.perf_counter()
+    try:
+      # Async ORM calls run on the request's sync thread, the connections to
+      # wrap are that thread's
+      stack = ExitStack()
+      await sync_to_async(_wrap_connections)(stack, stats)
+      try:
+        response = await self.get_response(request)
+      finally:
+        await sync_to_async(stack.close)()
+    finally:
+      _current.reset(token)
+    self.observe(request, response, time.perf_counter() - started, stats)
+    return response
+
+  def observe(self, request, response, latency, stats):
+    match = request.resolver_match
+    route = (match.url_name or match.view_name) if match else 'unmatched'
+    registry.observe_request(route, request.method, response.status_code, latency, stats)
+
+def _wrap_connections(stack, stats):
+  for connection in connections.all():
+    stack.enter_context(connection.execute_wrapper(stats))
+
+# metrics
+class MetricsView(APIView):
+  # GET Request to fetch the request metrics of this process in Prometheus text format
+  # Headers : Authorization : Token {auth_token}
+  # Usage : GET http://localhost:5000/metrics
+  def get(self, request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
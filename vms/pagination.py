@@ -0,0 +1,268 @@
+import datetime
+import functools
+import json
+import operator
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+# Keyset (cursor) pagination for the list endpoints
+# Usage : GET /api/purchase_orders/?page_size=50&ordering=-issue_date
+# The response carries opaque `next` / `previous` links holding the cursor.
+#
+# DRF's CursorPagination keeps only the first ordering field in the cursor and
+# falls back to an offset (capped at offset_cutoff) between equal values. Here
+# the cursor holds the values of every ordering field, and a page continues
+# with (a > x) OR (a = x AND b > y) OR ..., so ties of any length page
+# correctly as long as the last field (id) is unique. NULLs of nullable fields
+# sort after every value (ascending) or before (descending), as PostgreSQL
+# orders them by default.
+
+def reverse_ordering(fields):
+  # Reverse every field, orderings may mix directions (e.g. ('-score', 'id'))
+  return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in fields)
+
+def _nullable(model, name):
+  return model._meta.get_field(name).null
+
+def order_expressions(model, ordering):
+  """order_by() arguments of an ordering, NULLs last ascending and first descending."""
+  expressions = []
+  for field in ordering:
+    name = field.lstrip('-')
+    if not _nullable(model, name):
+      expressions.append(field)
+    elif field.startswith('-'):
+      expressions.append(F(name).desc(nulls_first=True))
+    else:
+      expressions.append(F(name).asc(nulls_last=True))
+  return expressions
+
+def keyset_filter(model, ordering, position):
+  """Q of the rows following position in ordering: (a > x) | (a = x & b > y) | ..."""
+  branches = []
+  equal = Q()
+  for field, value in zip(ordering, position):
+    name, descending = field.lstrip('-'), field.startswith('-')
+    nullable = _nullable(model, name)
+    if value is None:
+      # Only descending orderings have rows after NULL: every non-null value
+      after = Q(**{f'{name}__isnull': False}) if descending else None
+      same = Q(**{f'{name}__isnull': True})
+    else:
+      after = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+      if nullable and not descending:
+        after |= Q(**{f'{name}__isnull': True})
+      same = Q(**{name: value})
+    if after is not None:
+      branches.append(equal & after)
+    equal &= same
+  if not branches:
+    return Q(pk__in=[])
+  return leading_bound(model, ordering[0], position[0]) & functools.reduce(operator.or_, branches)
+
+# Redundant range on the first field (a >= x), lets the database seek into the
+# (a, id) index instead of scanning for the OR of the keyset branches
+def leading_bound(model, field, value):
+  name, descending = field.lstrip('-'), field.startswith('-')
+  if value is None:
+    return Q() if descending else Q(**{f'{name}__isnull': True})
+  if descending:
+    return Q(**{f'{name}__lte': value})
+  bound = Q(**{f'{name}__gte': value})
+  return bound | Q(**{f'{name}__isnull': True}) if _nullable(model, name) else bound
+
+class KeysetPagination(CursorPagination):
+  page_size_query_param = 'page_size'
+  ordering_param = 'ordering'
+  max_page_size = 1000
+  # Orderings a view accepts by default, views override with `cursor_orderings`
+  orderings = {'id': ('id',)}
+  # Rows fetched per database round trip in streaming mode
+  stream_chunk_size = 2000
+
+  def get_ordering(self, request, queryset, view):
+    orderings = getattr(view, 'cursor_orderings', self.orderings)
+    requested = request.query_params.get(self.ordering_param)
+    if not requested:
+      return orderings[next(iter(orderings))]
+    fields = orderings.get(requested.lstrip('-'))
+    if fields is None:
+      raise ValidationError({self.ordering_param: [f"Unsupported ordering. Choose from: {', '.join(orderings)}."]})
+    return reverse_ordering(fields) if requested.startswith('-') else fields
+
+  def get_ordered_queryset(self, queryset, request, view):
+    return queryset.order_by(*order_expressions(queryset.model, self.get_ordering(request, queryset, view)))
+
+  def paginate_queryset(self, queryset, request, view=None):
+    self.request = request
+    self.page_size = self.get_page_size(request)
+    if not self.page_size:
+      return None
+    self.base_url = request.build_absolute_uri()
+    self.ordering = self.get_ordering(request, queryset, view)
+    self.cursor = self.decode_cursor(request)
+    ordering = self.ordering
+    if self.cursor is not None:
+      position = self.cursor.position
+      if len(position) != len(ordering):
+        raise NotFound(self.invalid_cursor_message)
+      try:
+        position = [
+          None if value is None else queryset.model._meta.get_field(field.lstrip('-')).to_python(value)
+          for field, value in zip(ordering, position)
+        ]
+      except (DjangoValidationError, FieldDoesNotExist):
+        raise NotFound(self.invalid_cursor_message)
+      if self.cursor.reverse:
+        ordering = reverse_ordering(ordering)
+      queryset = queryset.filter(keyset_filter(queryset.model, ordering, position))
+    queryset = queryset.order_by(*order_expressions(queryset.model, ordering))
+    rows = list(queryset[:self.page_size + 1])
+    has_more = len(rows) > self.page_size
+    self.page = rows[:self.page_size]
+    if self.cursor is not None and self.cursor.reverse:
+      self.page.reverse()
+      self.has_previous, self.has_next = has_more, True
+    else:
+      self.has_previous, self.has_next = self.cursor is not None, has_more
+    self.display_page_controls = self.has_previous or self.has_next
+    return self.page
+
+  def get_next_link(self):
+    if not self.has_next:
+      return None
+    position = self.position(self.page[-1]) if self.page else self.cursor.position
+    return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+  def get_previous_link(self):
+    if not self.has_previous:
+      return None
+    position = self.position(self.page[0]) if self.page else self.cursor.position
+    return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+  def position(self, row):
+    """Values of the ordering fields of a row (values() dict or instance), JSON encodable."""
+    values = []
+    for field in self.ordering:
+      value = row[field.lstrip('-')] if isinstance(row, dict) else getattr(row, field.lstrip('-'))
+      values.append(value.isoformat() if isinstance(value, (datetime.date, datetime.time)) else value)
+    return values
+
+  def decode_cursor(self, request):
+    encoded = request.query_params.get(self.cursor_query_param)
+    if encoded is None:
+      return None
+    try:
+      tokens = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+      reverse, position = bool(tokens.get('r')), tokens['p']
+    except (TypeError, ValueError, KeyError, AttributeError):
+      raise NotFound(self.invalid_cursor_message)
+    if not isinstance(position, list) or not all(value is None or isinstance(value, (str, int, float)) for value in position):
+      raise NotFound(self.invalid_cursor_message)
+    return Cursor(offset=0, reverse=reverse, position=position)
+
+  def encode_cursor(self, cursor):
+    tokens = {'p': cursor.position, **({'r': 1} if cursor.reverse else {})}
+    encoded = urlsafe_b64encode(json.dumps(tokens, separators=(',', ':')).encode()).decode('ascii')
+    return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+  async def apaginate_queryset(self, queryset, request, view=None):
+    """paginate_queryset() running the page query with the async ORM."""
+    # First pass: let paginate_queryset() build the page query, then fetch it.
+    # Second pass: replay it on the fetched rows to compute the cursors.
+    try:
+      self.paginate_queryset(_PageQuery(queryset), request, view)
+    except _PageQuery.Fetch as fetch:
+      rows = [row async for row in fetch.queryset]
+    else:
+      return None  # Pagination disabled
+    return self.paginate_queryset(_PageQuery(queryset, rows), request, view)
+
+# Queryset stand-in for apaginate_queryset(): forwards ordering and filtering,
+# slicing either hands the sliced queryset out to be fetched or returns the
+# rows fetched for it
+class _PageQuery:
+  class Fetch(Exception):
+    def __init__(self, queryset):
+      self.queryset = queryset
+
+  def __init__(self, queryset, rows=None):
+    self.queryset = queryset
+    self.rows = rows
+
+  @property
+  def model(self):
+    return self.queryset.model
+
+  def order_by(self, *fields):
+    return _PageQuery(self.queryset.order_by(*fields), self.rows)
+
+  def filter(self, *args, **kwargs):
+    return _PageQuery(self.queryset.filter(*args, **kwargs), self.rows)
+
+  def __getitem__(self, key):
+    if self.rows is None:
+      raise self.Fetch(self.queryset[key])
+    return self.rows
+
+# Opt-in streaming mode, ?stream=1
+def wants_stream(request):
+  return request.query_params.get('stream') in ('1', 'true')
+
+def _chunk_encoder(serializer_class, serializer_kwargs):
+  serializer_kwargs = serializer_kwargs or {}
+  serialize_rows = getattr(serializer_class, 'serialize', None)
+  encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+  def encode(chunk):
+    items = serialize_rows(chunk) if serialize_rows else (serializer_class(obj, **serializer_kwargs).data for obj in chunk)
+    return ','.join(encoder.encode(item) for item in items)
+  return encode
+
+def stream_json_array(queryset, serializer_class, chunk_size=KeysetPagination.stream_chunk_size, serializer_kwargs=None):
+  """Yield a JSON array of the serialized queryset without holding it in memory.
+
+  serializer_class may also be a vms.fast_serializers.FastSerializer, which
+  then converts each chunk of values() rows at once.
+  """
+  encode = _chunk_encoder(serializer_class, serializer_kwargs)
+  yield '['
+  first = True
+  chunk = []
+  for obj in queryset.iterator(chunk_size=chunk_size):
+    chunk.append(obj)
+    if len(chunk) == chunk_size:
+      yield encode(chunk) if first else ',' + encode(chunk)
+      first = False
+      chunk = []
+  if chunk:
+    yield encode(chunk) if first else ',' + encode(chunk)
+  yield ']'
+
+def streaming_response(queryset, serializer_class, chunk_size=KeysetPagination.stream_chunk_size, serializer_kwargs=None):
+  return StreamingHttpResponse(stream_json_array(queryset, serializer_class, chunk_size, serializer_kwargs), content_type='application/json')
+
+async def astream_json_array(queryset, serializer_class, chunk_size=KeysetPagination.stream_chunk_size, serializer_kwargs=None):
+  """stream_json_array() reading the queryset with async iteration."""
+  encode = _chunk_encoder(serializer_class, serializer_kwargs)
+  yield '['
+  first = True
+  chunk = []
+  async for obj in queryset.aiterator(chunk_size=chunk_size):
+    chunk.append(obj)
+    if len(chunk) == chunk_size:
+      yield encode(chunk) if first else ',' + encode(chunk)
+      first = False
+      chunk = []
+  if chunk:
+    yield encode(chunk) if first else ',' + encode(chunk)
+  yield ']'
+
+def astreaming_response(queryset, serializer_class, chunk_size=KeysetPagination.stream_chunk_size, serializer_kwargs=None):
+  return StreamingHttpResponse(astream_json_array(queryset, serializer_class, chunk_size, serializer_kwargs), content_type='application/json')
@@ -0,0 +1,117 @@
+import contextvars
+import hashlib
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+# Read replica routing
+#
+# ReplicaRoutingMiddleware marks GET / HEAD / OPTIONS requests as replica
+# reads, ReplicaRouter then sends their queries to settings.REPLICA_DATABASE.
+# Writes, and everything outside a request (signals of writes, management
+# commands, workers), use the primary. After a write a client stays on the
+# primary for REPLICA_STICKY_SECONDS, so it reads its own writes while the
+# replica catches up. Clients are told apart by their Authorization header,
+# the sticky marks live in the default cache, which has to be shared by every
+# process serving the API (checked by vms.checks).
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_from_replica = contextvars.ContextVar('vms_read_from_replica', default=False)
+
+def replica_alias():
+  return getattr(settings, 'REPLICA_DATABASE', None)
+
+def reading_from_replica():
+  """True while serving a request whose reads go to the replica."""
+  return _read_from_replica.get() and replica_alias() is not None
+
+def sticky_key(request):
+  client = request.headers.get('Authorization') or request.META.get('REMOTE_ADDR', '')
+  return 'db-sticky:' + hashlib.sha256(client.encode()).hexdigest()
+
+class ReplicaRouter:
+  def db_for_read(self, model, **hints):
+    if reading_from_replica():
+      return replica_alias()
+    return 'default'
+
+  def db_for_write(self, model, **hints):
+    return 'default'
+
+  def allow_relation(self, obj1, obj2, **hints):
+    # Primary and replica hold the same rows
+    return True
+
+  def allow_migrate(self, db, app_label, model_name=None, **hints):
+    # The replica receives its schema from the primary
+    return db != replica_alias()
+
+class ReplicaRoutingMiddleware:
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    if iscoroutinefunction(get_response):
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if iscoroutinefunction(self):
+      return self.__acall__(request)
+    if replica_alias() is None:
+      return self.get_response(request)
+    use_replica = self.use_replica(request)
+    token = _read_from_replica.set(use_replica)
+    try:
+      response = self.get_response(request)
+    finally:
+      _read_from_replica.reset(token)
+    return self.process_response(request, response, use_replica)
+
+  async def __acall__(self, request):
+    if replica_alias() is None:
+      return await self.get_response(request)
+    use_replica = self.use_replica(request)
+    token = _read_from_replica.set(use_replica)
+    try:
+      response = await self.get_response(request)
+    finally:
+      _read_from_replica.reset(token)
+    return self.process_response(request, response, use_replica)
+
+  def use_replica(self, request):
+    return request.method in SAFE_METHODS and not cache.get(sticky_key(request))
+
+  def process_response(self, request, response, use_replica):
+    if request.method not in SAFE_METHODS:
+      cache.set(sticky_key(request), True, settings.REPLICA_STICKY_SECONDS)
+    if response.streaming:
+      # ?stream=1 bodies are queried while the server iterates them
+      routed = _arouted if response.is_async else _routed
+      response.streaming_content = routed(response.streaming_content, use_replica)
+    return response
+
+async def _arouted(content, use_replica):
+  iterator = aiter(content)
+  while True:
+    token = _read_from_replica.set(use_replica)
+    try:
+      chunk = await anext(iterator)
+    except StopAsyncIteration:
+      return
+    finally:
+      _read_from_replica.reset(token)
+    yield chunk
+
+def _routed(content, use_replica):
+  iterator = iter(content)
+  while True:
+    token = _read_from_replica.set(use_replica)
+    try:
+      chunk = next(iterator)
+    except StopIteration:
+      return
+    finally:
+      _read_from_replica.reset(token)
+    yield chunk
@@ -0,0 +1,56 @@
+from rest_framework.exceptions import ValidationError
+
+# Sparse fieldsets, ?fields=a,b or ?exclude=c
+#
+# A serializer using SparseFieldsMixin accepts `fields` / `exclude` keyword
+# arguments narrowing its output. narrow_queryset() narrows the matching
+# query with only(), so columns nobody asked for (e.g. the purchase order
+# `items` JSON) are not even read from the database.
+class SparseFieldsMixin:
+  fields_param = 'fields'
+  exclude_param = 'exclude'
+
+  def __init__(self, *args, fields=None, exclude=None, **kwargs):
+    super().__init__(*args, **kwargs)
+    if fields is not None:
+      for name in set(self.fields) - set(fields):
+        self.fields.pop(name)
+    for name in exclude or ():
+      self.fields.pop(name, None)
+
+  @classmethod
+  def sparse_fields(cls, request):
+    """Names of the fields requested by ?fields= / ?exclude=, None when the request does not narrow them."""
+    requested = request.query_params.get(cls.fields_param)
+    excluded = request.query_params.get(cls.exclude_param)
+    if not requested and not excluded:
+      return None
+    available = list(cls().fields)
+    selected = available
+    for param, value in ((cls.fields_param, requested), (cls.exclude_param, excluded)):
+      if not value:
+        continue
+      names = [name.strip() for name in value.split(',') if name.strip()]
+      unknown = [name for name in names if name not in available]
+      if unknown:
+        raise ValidationError({param: [f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(available)}."]})
+      if param == cls.fields_param:
+        selected = [name for name in selected if name in names]
+      else:
+        selected = [name for name in selected if name not in names]
+    return tuple(selected)
+
+  @classmethod
+  def narrow_queryset(cls, queryset, fields, also=()):
+    """Load only the columns behind `fields` (plus `also`, e.g. ordering fields) when narrowing."""
+    if fields is None:
+      return queryset
+    model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+    serializer_fields = cls().fields
+    columns = {name.lstrip('-') for name in also}
+    for name in fields:
+      source = serializer_fields[name].source.split('.')[0]
+      if source not in model_fields:  # Computed or nested field, keep every column
+        return queryset
+      columns.add(source)
+    return queryset.only(*columns)
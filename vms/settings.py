@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -32,13 +33,18 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'sequences',
     'vendors',
     'purchase_orders',
     'rest_framework',
-    'rest_framework.authtoken'
+    'rest_framework.authtoken',
+    'django_filters',
+    'vms',
 ]
 
 MIDDLEWARE = [
+    'vms.instrumentation.RequestMetricsMiddleware',
+    'vms.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,27 +75,128 @@ TEMPLATES = [
 WSGI_APPLICATION = 'vms.wsgi.application'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'vms.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'vms.renderers.FastJSONRenderer',
     ],
+    # Keyset pagination used by the list endpoints
+    'DEFAULT_PAGINATION_CLASS': 'vms.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
 }
 
+# Vendor metrics mode
+# 'sync' - metrics are updated inside the request that saved the purchase order
+# 'deferred' - the request only marks the vendor dirty and `process_metrics_queue` recomputes it
+VENDOR_METRICS_MODE = 'sync'
+
+# Log SQL queries slower than this many milliseconds to the 'vms.slow_queries' logger (None disables it)
+SLOW_QUERY_THRESHOLD_MS = None
+
+# Numbers reserved per round trip by the po_number / vendor_code sequences
+SEQUENCE_BLOCK_SIZE = 100
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# VMS_DB selects the profile:
+#  'sqlite' (default): SQLite tuned for concurrent writers, see SQLITE_PRAGMAS
+#  'sqlite-plain': SQLite with the library defaults, a baseline for benchmark_db_writes
+#  'postgres': PostgreSQL with persistent, health checked connections
+# VMS_DB_CONN_MAX_AGE is the lifetime of persistent connections in seconds (0 closes them after each request).
+CONN_MAX_AGE = int(os.environ.get('VMS_DB_CONN_MAX_AGE', 60))
+DATABASE_PROFILES = {
+    'sqlite': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'NAME': os.environ.get('VMS_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    'sqlite-plain': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('VMS_DB_NAME', BASE_DIR / 'db.sqlite3'),
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('VMS_DB_NAME', 'vms'),
+        'USER': os.environ.get('VMS_DB_USER', 'vms'),
+        'PASSWORD': os.environ.get('VMS_DB_PASSWORD', ''),
+        'HOST': os.environ.get('VMS_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('VMS_DB_PORT', '5432'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        # Behind a transaction pooling PgBouncer (VMS_DB_POOLER=1) server side
+        # cursors do not survive between transactions, iterator() falls back to
+        # client side chunks
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('VMS_DB_POOLER') == '1',
+    },
 }
+DATABASE_PROFILE = os.environ.get('VMS_DB', 'sqlite')
+DATABASES = {
+    'default': DATABASE_PROFILES[DATABASE_PROFILE],
+}
+
+# Optional read replica: VMS_DB_REPLICA_NAME (SQLite file or database name),
+# VMS_DB_REPLICA_HOST and VMS_DB_REPLICA_PORT override the primary's settings.
+# Safe-method requests read from it through vms.routers, see also sync_replica.
+REPLICA_OVERRIDES = {
+    key: os.environ[f'VMS_DB_REPLICA_{key}'] for key in ('NAME', 'HOST', 'PORT') if os.environ.get(f'VMS_DB_REPLICA_{key}')
+}
+if REPLICA_OVERRIDES:
+    DATABASES['replica'] = {**DATABASES['default'], **REPLICA_OVERRIDES, 'TEST': {'MIRROR': 'default'}}
+REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else None
+DATABASE_ROUTERS = ['vms.routers.ReplicaRouter']
+# Seconds a client reads from the primary after a write, should exceed the replication lag
+REPLICA_STICKY_SECONDS = int(os.environ.get('VMS_DB_REPLICA_STICKY_SECONDS', 5))
+
+# PRAGMAs run on every new SQLite connection by vms.db (sqlite profile only):
+# WAL lets readers run next to the writer, writers wait up to busy_timeout ms
+# for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'cache_size': -64000,  # KiB
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+} if DATABASE_PROFILE == 'sqlite' else {}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# VMS_CACHE selects the backend: 'locmem' (per process) or 'file' (shared by the processes of a host)
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('VMS_CACHE_DIR', BASE_DIR / 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('VMS_CACHE', 'locmem')],
+}
+
+# Seconds a cached vendor read (/performance, list, detail and POs pages) may be served before it is recomputed.
+# Entries are also invalidated by the purchase order and vendor signals.
+VENDOR_CACHE_TIMEOUT = 300
+
+# Token authentication cache (vms.authentication): entries kept per process, seconds
+# an entry is trusted without a lookup, and whether resolved tokens are also shared
+# through the default cache (for AUTH_TOKEN_CACHE_SHARED_TTL seconds).
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = 60
+AUTH_TOKEN_CACHE_SHARED = os.environ.get('VMS_AUTH_TOKEN_CACHE_SHARED') == '1'
+AUTH_TOKEN_CACHE_SHARED_TTL = 300
 
 
 # Password validation
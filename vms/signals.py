@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import invalidate_tokens
+
+# Signals keeping the token authentication cache fresh
+
+@receiver(post_delete, sender=Token)
+def handle_token_delete(sender, instance, **kwargs):
+  invalidate_tokens([instance.key])
+
+# Deactivated or otherwise changed users; deleting a user deletes its token
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def handle_user_change(sender, instance, created, **kwargs):
+  if not created:
+    invalidate_tokens(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
@@ -0,0 +1,307 @@
+from django.contrib.auth.models import User
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncClient, Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+import datetime
+import os
+import tempfile
+from django.utils import timezone as django_timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from vendors.models import Vendor, HistoricalPerformance, METRIC_FIELDS
+from purchase_orders.models import PurchaseOrder
+from purchase_orders.serializers import PurchaseOrderSerializer
+from .instrumentation import registry
+from .fast_serializers import FastSerializer
+from .renderers import FastJSONRenderer
+from .routers import ReplicaRouter, ReplicaRoutingMiddleware
+from .checks import check_replica_cache
+from .authentication import token_cache
+from vendors.cache import cache_timeout
+
+class MetricsViewTestCase(TestCase):
+  def setUp(self):
+    registry.reset()
+    self.client = APIClient()
+    self.user = User.objects.create_user(username='testuser', password='testpassword')
+    self.token = Token.objects.create(user=self.user)
+    self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+    self.vendor = Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address')
+
+  def test_requests_are_recorded_per_route(self):
+    self.client.get(reverse('vendor-list-create'))
+    self.client.post(reverse('pos-list-create'), {
+      'vendor': self.vendor.pk, 'order_date': timezone.now(), 'delivery_date': timezone.now(), 'items': {'item1': 1}, 'quantity': 1,
+    }, format='json')
+    response = self.client.get(reverse('metrics'))
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    self.assertTrue(response['Content-Type'].startswith('text/plain'))
+    body = response.content.decode()
+    self.assertIn('vms_http_request_duration_seconds_count{route="vendor-list-create",method="GET"} 1', body)
+    self.assertIn('vms_http_sql_queries_total{route="vendor-list-create",method="GET"} 2', body)
+    self.assertIn('vms_signal_handler_calls_total{handler="handle_purchase_order_save"} 1', body)
+    self.assertIn('vms_metrics_queue_depth 0', body)
+    signal_time = [line for line in body.splitlines() if line.startswith('vms_http_signal_seconds_total{route="pos-list-create"')]
+    self.assertGreater(float(signal_time[0].split()[-1]), 0)
+
+  def test_metrics_require_authentication(self):
+    response = APIClient().get(reverse('metrics'))
+    self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+  @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+  def test_slow_query_log(self):
+    with self.assertLogs('vms.slow_queries', level='WARNING') as logs:
+      self.client.get(reverse('vendor-list-create'))
+    self.assertIn('vendors_vendor', '\n'.join(logs.output))
+
+
+class FastSerializerTestCase(TestCase):
+  def setUp(self):
+    self.vendor = Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address')
+    now = timezone.now()
+    PurchaseOrder.objects.create(vendor=self.vendor, order_date=now, delivery_date=now + datetime.timedelta(days=2), items={'item1': 1}, quantity=1)
+    PurchaseOrder.objects.create(
+      vendor=self.vendor, order_date=now.replace(microsecond=0), delivery_date=now, quantity=3, status='completed',
+      items={'Größe': 'ü\u2028é', 'nested': [1.5, None, True]}, quality_rating=4.0,
+      acknowledgment_date=now, completed_at=now + datetime.timedelta(hours=1),
+    )
+
+  def assert_identical(self, fields=None):
+    queryset = PurchaseOrder.objects.order_by('id')
+    expected = JSONRenderer().render(PurchaseOrderSerializer(queryset, many=True, fields=fields).data)
+    serializer = FastSerializer(PurchaseOrderSerializer, fields)
+    self.assertEqual(FastJSONRenderer().render(serializer.serialize(serializer.values(queryset))), expected)
+
+  def test_byte_identical_output(self):
+    self.assert_identical()
+    self.assert_identical(('id', 'status', 'completed_at', 'vendor'))
+    with django_timezone.override('Asia/Kolkata'):
+      self.assert_identical()
+
+  def test_list_endpoint_matches_serializer(self):
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='testuser', password='testpassword'))
+    response = client.get(reverse('pos-list-create'))
+    expected = PurchaseOrderSerializer(PurchaseOrder.objects.order_by('id'), many=True).data
+    self.assertEqual(response.content, JSONRenderer().render({'next': None, 'previous': None, 'results': expected}))
+
+  def test_indented_rendering_falls_back(self):
+    data = {'a': [1, 'é']}
+    self.assertEqual(FastJSONRenderer().render(data, 'application/json; indent=2'), JSONRenderer().render(data, 'application/json; indent=2'))
+
+  def test_unsupported_fields(self):
+    class ComputedSerializer(PurchaseOrderSerializer):
+      total = serializers.SerializerMethodField()
+
+      def get_total(self, obj):
+        return obj.quantity
+
+    with self.assertRaises(TypeError):
+      FastSerializer(ComputedSerializer)
+
+
+class DatabaseProfileTestCase(TestCase):
+  def pragma(self, wrapper, name):
+    with wrapper.cursor() as cursor:
+      cursor.execute(f'PRAGMA {name}')
+      return cursor.fetchone()[0]
+
+  def test_sqlite_pragmas(self):
+    self.assertEqual(self.pragma(connection, 'busy_timeout'), settings.SQLITE_PRAGMAS['busy_timeout'])
+    self.assertEqual(self.pragma(connection, 'synchronous'), 1)  # NORMAL
+    self.assertEqual(self.pragma(connection, 'cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+
+  def test_file_database_uses_wal(self):
+    with tempfile.TemporaryDirectory() as directory:
+      wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(directory, 'vms.sqlite3')}, alias='wal')
+      try:
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+      finally:
+        wrapper.close()
+      with override_settings(SQLITE_PRAGMAS={}):
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(directory, 'plain.sqlite3')}, alias='plain')
+        try:
+          self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        finally:
+          wrapper.close()
+
+
+@override_settings(REPLICA_DATABASE='replica', REPLICA_STICKY_SECONDS=5, VENDOR_CACHE_TIMEOUT=300)
+class ReplicaRoutingTestCase(TestCase):
+  def setUp(self):
+    cache.clear()
+    self.factory = RequestFactory()
+    self.router = ReplicaRouter()
+    self.routed = []
+
+  def view(self, request):
+    self.routed.append((self.router.db_for_read(Vendor), self.router.db_for_write(Vendor), cache_timeout()))
+    return HttpResponse()
+
+  def call(self, method, token='a', view=None):
+    request = getattr(self.factory, method)('/api/vendors/', HTTP_AUTHORIZATION=f'Token {token}')
+    return ReplicaRoutingMiddleware(view or self.view)(request)
+
+  def test_reads_go_to_replica(self):
+    self.call('get')
+    self.assertEqual(self.routed, [('replica', 'default', 5)])
+    # Outside a request everything uses the primary
+    self.assertEqual(self.router.db_for_read(Vendor), 'default')
+    self.assertEqual(cache_timeout(), 300)
+    self.assertFalse(self.router.allow_migrate('replica', 'vendors'))
+    self.assertTrue(self.router.allow_migrate('default', 'vendors'))
+
+  def test_reads_stick_to_primary_after_write(self):
+    self.call('post')
+    self.call('get')
+    self.call('get', token='b')
+    self.assertEqual([read for read, _, _ in self.routed], ['default', 'default', 'replica'])
+    cache.clear()  # Sticky window over
+    self.call('get')
+    self.assertEqual(self.routed[-1][0], 'replica')
+
+  def test_replica_requires_shared_cache(self):
+    self.assertEqual([error.id for error in check_replica_cache(None)], ['vms.E001'])
+    with override_settings(CACHES={'default': settings.CACHE_BACKENDS['file']}):
+      self.assertEqual(check_replica_cache(None), [])
+    with override_settings(REPLICA_DATABASE=None):
+      self.assertEqual(check_replica_cache(None), [])
+
+  def test_streamed_reads_go_to_replica(self):
+    def stream():
+      yield self.router.db_for_read(Vendor)
+    response = self.call('get', view=lambda request: StreamingHttpResponse(stream()))
+    self.assertEqual(b''.join(response.streaming_content), b'replica')
+
+  @override_settings(REPLICA_DATABASE=None)
+  def test_no_replica(self):
+    self.call('get')
+    self.assertEqual(self.routed, [('default', 'default', 300)])
+
+
+class AsyncViewTestCase(TestCase):
+  def setUp(self):
+    self.vendor = Vendor.objects.create(name='Test Vendor', mobile_number='1234567890', address='Test Address')
+    now = timezone.now()
+    for day in range(3):
+      PurchaseOrder.objects.create(vendor=self.vendor, order_date=now, delivery_date=now + datetime.timedelta(days=day), items={'item1': day}, quantity=1)
+      HistoricalPerformance.objects.create(vendor=self.vendor, date=now - datetime.timedelta(days=day), **{field: day for field in METRIC_FIELDS})
+    self.po = PurchaseOrder.objects.first()
+    self.headers = {'Authorization': f'Token {Token.objects.create(user=User.objects.create_user(username="testuser")).key}'}
+    self.client = Client(headers=self.headers)
+
+  def fetch_sync(self, path):
+    response = self.client.get(path)
+    return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+  async def fetch(self, path):
+    response = await AsyncClient().get(path, headers=self.headers)
+    content = b''.join([chunk async for chunk in response.streaming_content]) if response.streaming else response.content
+    return response, content
+
+  async def test_responses_match_sync_views(self):
+    pk = self.vendor.pk
+    paths = [
+      '/api/vendors/?page_size=2', f'/api/vendors/{pk}/', f'/api/vendors/{pk}/?fields=id,name', f'/api/vendors/{pk}/performance',
+      f'/api/vendors/{pk}/pos?page_size=2&exclude=items', f'/api/vendors/{pk}/pos?stream=1', f'/api/vendors/{pk}/historical_perf?page_size=2',
+      f'/api/vendors/{pk}/historical_perf?bucket=year', '/api/vendors/0/', '/api/vendors/0/pos', '/api/vendors/0/performance',
+      '/api/purchase_orders/?page_size=2&ordering=-delivery_date', '/api/purchase_orders/?stream=1&fields=id', '/api/purchase_orders/?status=shipped',
+      '/api/purchase_orders/?fields=bogus', f'/api/purchase_orders/{self.po.pk}/', '/api/purchase_orders/0/',
+    ]
+    for path in paths:
+      expected, expected_content = await sync_to_async(self.fetch_sync)(path)
+      response, content = await self.fetch(path.replace('/api/', '/api/async/'))
+      self.assertEqual(response.status_code, expected.status_code, path)
+      # Cursor links point at the async URLs
+      self.assertEqual(content, expected_content.replace(b'/api/', b'/api/async/'), path)
+      self.assertEqual(response.get('ETag'), expected.get('ETag'), path)
+
+  async def test_authentication(self):
+    response = await AsyncClient().get(reverse('async-vendor-list'))
+    self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    self.assertEqual(response['WWW-Authenticate'], 'Token')
+    response = await AsyncClient().get(reverse('async-vendor-list'), headers={'Authorization': 'Token bogus'})
+    self.assertEqual(response.json(), {'detail': 'Invalid token.'})
+    response = await AsyncClient().post(reverse('async-vendor-list'), headers=self.headers)
+    self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+  async def test_conditional_get(self):
+    response, _ = await self.fetch(reverse('async-pos-detail', args=[self.po.pk]))
+    not_modified = await AsyncClient().get(reverse('async-pos-detail', args=[self.po.pk]), headers={**self.headers, 'If-None-Match': response['ETag']})
+    self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class TokenCacheTestCase(TestCase):
+  def setUp(self):
+    token_cache.clear()
+    registry.reset()
+    cache.clear()
+    self.user = User.objects.create_user(username='testuser')
+    self.token = Token.objects.create(user=self.user)
+    self.client = APIClient()
+    self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+    self.url = reverse('vendor-list-create')  # Response cached after the first call
+
+  def tearDown(self):
+    token_cache.clear()
+
+  def test_token_lookup_is_cached(self):
+    self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+    with self.assertNumQueries(0):
+      response = self.client.get(self.url)
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    body = registry.render()
+    self.assertIn('vms_auth_token_cache_requests_total{layer="local",result="hit"} 1', body)
+    self.assertIn('vms_auth_token_cache_requests_total{layer="local",result="miss"} 1', body)
+    self.assertIn('vms_auth_token_cache_entries 1', body)
+
+  def test_deleted_token_is_rejected(self):
+    self.client.get(self.url)
+    self.token.delete()
+    self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+  def test_deactivated_user_is_rejected(self):
+    self.client.get(self.url)
+    self.user.is_active = False
+    self.user.save()
+    self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+  def test_deleted_user_is_rejected(self):
+    self.client.get(self.url)
+    self.user.delete()
+    self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+  @override_settings(AUTH_TOKEN_CACHE_TTL=0)
+  def test_expired_entries_are_looked_up(self):
+    self.client.get(self.url)
+    with self.assertNumQueries(1):
+      self.client.get(self.url)
+
+  @override_settings(AUTH_TOKEN_CACHE_SHARED=True)
+  def test_shared_cache(self):
+    self.client.get(self.url)
+    token_cache.clear()  # Another process: only the shared entry exists
+    with self.assertNumQueries(0):
+      self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+    self.assertIn('vms_auth_token_cache_requests_total{layer="shared",result="hit"} 1', registry.render())
+    self.token.delete()
+    token_cache.clear()
+    self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+  @override_settings(AUTH_TOKEN_CACHE_SIZE=2)
+  def test_least_recently_used_entries_are_evicted(self):
+    tokens = [Token.objects.create(user=User.objects.create_user(username=f'user{index}')) for index in range(3)]
+    for token in tokens:
+      token_cache.set(token.key, token)
+    self.assertEqual(len(token_cache), 2)
+    self.assertIsNone(token_cache.get(tokens[0].key))
+    self.assertEqual(token_cache.get(tokens[2].key), tokens[2])
@@ -17,10 +17,15 @@ Including another URLconf
 from django.contrib import admin
 from rest_framework.authtoken.views import obtain_auth_token
 from django.urls import path, include
+from vms.instrumentation import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/vendors/', include('vendors.urls')),
     path('api/purchase_orders/', include('purchase_orders.urls')),
+    # Async read endpoints, for ASGI deployments (vms/asgi.py)
+    path('api/async/vendors/', include('vendors.async_urls')),
+    path('api/async/purchase_orders/', include('purchase_orders.async_urls')),
     path('apiTokenAuth/', obtain_auth_token, name='api_token_auth'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]